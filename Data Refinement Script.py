@@ -5,6 +5,13 @@ import seaborn as sns
 import matplotlib.font_manager as fm
 import re
 import os
+import json
+import inspect
+import hashlib
+import tempfile
+
+from percentile import PercentileService
+from instrument import stage
 
 # ================= 設定區 (User Config) =================
 INPUT_FILE = '114_IDP_Master_Merged.csv'
@@ -12,6 +19,14 @@ OUTPUT_STATS_FILE = '114_IDP_Demographics_Report_v2.xlsx' # 輸出檔名更新
 OUTPUT_HEATMAP_FILE = '114_IDP_SchoolLevel_Heatmap_v2.png'
 FONT_PATH = '/Users/xian/R project/114-1IDP/jf-openhuninn-2.1.ttf'
 
+# Excel 輸出模式：True = 串流寫入 (xlsxwriter constant_memory，逐列寫出、記憶體用量固定)
+#                False = 舊版 pd.ExcelWriter (整本活頁簿先放在記憶體)
+EXCEL_STREAMING = True
+# 輸入指紋檔：記錄上次產生報表時的輸入內容，內容未變更時略過 Excel 輸出
+FINGERPRINT_FILE = os.path.splitext(OUTPUT_STATS_FILE)[0] + '.fingerprint'
+# Excel 每個分頁的列數上限 (含標題列)；超過時接續寫到下一個分頁
+EXCEL_MAX_ROWS = 1048576
+
 # 【修改點 1】: 角色標準化邏輯 - 簡化版
 # 策略：暫時不區分年資，統一歸類為「一般教師」，僅保留行政職的分野
 ROLE_MAPPING = {
@@ -66,13 +81,187 @@ def extract_score(text):
         return float(match.group(1))
     return np.nan
 
-def process_data():
+def compute_fingerprint():
+    """
+    輸入指紋：來源 CSV 內容 + 角色/學校層級設定 + 本腳本與 percentile.py (第 4 分頁) 的程式碼
+    任何一項改變都會讓指紋不同，重新產生報表
+    """
+    digest = hashlib.sha256()
+    with open(INPUT_FILE, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps([ROLE_MAPPING, SCHOOL_LEVEL_MAP, EXCEL_STREAMING],
+                             ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    for source in [os.path.abspath(__file__), inspect.getsourcefile(PercentileService)]:
+        with open(source, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def report_is_current(fingerprint):
+    """報表存在且指紋相同時回傳 True"""
+    if not (os.path.exists(OUTPUT_STATS_FILE) and os.path.exists(FINGERPRINT_FILE)):
+        return False
+    with open(FINGERPRINT_FILE, encoding='utf-8') as f:
+        return f.read().strip() == fingerprint
+
+def quantify(df, cols):
+    """
+    cols 欄的文字答案 -> 分數，回傳新的 DataFrame (欄位順序不變)
+    同一個答案在各欄各列重複出現，每種答案只解析一次再對應回去
+    """
+    answers = pd.unique(df[cols].to_numpy().ravel()) if cols else []
+    scores = {text: extract_score(text) for text in answers if isinstance(text, str)}
+    scored = {col: df[col].map(scores).astype(float) for col in cols}
+    return pd.DataFrame({c: scored.get(c, df[c]) for c in df.columns}, index=df.index)
+
+def temp_sibling(path):
+    """同一資料夾中的唯一暫存檔 (保留副檔名，讓 pd.ExcelWriter 判斷格式)；同時執行的程序不會互相覆蓋"""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(path) + '.',
+                                    suffix='.tmp' + os.path.splitext(path)[1])
+    os.close(fd)
+    return tmp_path
+
+def safe_sheet_name(name, used):
+    """Excel 分頁名稱：移除不合法字元、限制 31 字，並避免重複"""
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(name)).strip("'")[:31] or 'Sheet'
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f'({n})'
+        candidate = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+def report_sheets(df, score_df, scored_cols, school_summary, role_source_detail):
+    """
+    依序產生 (分頁名稱, DataFrame 或 DataFrame 片段的 iterable)
+    以 generator 逐頁產生，串流模式下每頁寫完即可釋放，不會同時持有所有學校的分頁；
+    教師個人百分位的長表 (教師 × 指標) 也依教師分段產生
+    """
+    yield '1.學校填答概況', school_summary
+    yield '2.角色與來源細節', role_source_detail
+    # 順便輸出原始資料的一個子集供檢查
+    yield '3.前50筆資料檢查', df[['School_Name', 'Role_Tag', 'Standardized_Role', 'Source_File', '教師姓名']].head(50)
+    # 教師個人百分位 (在全聯盟/教育階段/學校/身份中的相對位置)
+    yield '4.教師個人百分位', PercentileService(score_df, scored_cols).iter_long_table()
+
+    # 每校一頁：該校教師的基本資料與各指標分數 (只保留該校有填答的指標)
+    detail_cols = ['School_Level', 'School_Name', 'Role_Tag', 'Standardized_Role', 'Source_File', '教師姓名']
+    detail_cols = [c for c in detail_cols if c in score_df.columns]
+    for (_, school), group in score_df.groupby(['School_Level', 'School_Name'], sort=True):
+        answered = [c for c in scored_cols if group[c].notna().any()]
+        yield school, group[detail_cols + answered]
+
+def _excel_cell(value):
+    """NaN -> 空白儲存格；numpy 型別轉為 Python 原生型別"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and np.isnan(value):
+            return None
+    return value
+
+def sheet_chunks(sheets):
+    """
+    (分頁名稱, DataFrame 或片段的 iterable) -> (分頁鍵, 實際分頁名稱, 片段)
+    同一分頁鍵的片段依序寫在同一個分頁；超過 EXCEL_MAX_ROWS 的資料接續到「名稱 (2)」、「名稱 (3)」...
+    沒有資料列的分頁仍產生一個只有標題的片段
+    """
+    max_rows = EXCEL_MAX_ROWS - 1
+    for i, (sheet_name, content) in enumerate(sheets):
+        frames = [content] if isinstance(content, pd.DataFrame) else content
+        part, filled, empty = 1, 0, None
+        for frame in frames:
+            if empty is None:
+                empty = frame.iloc[:0]
+            start = 0
+            while start < len(frame):
+                if filled == max_rows:
+                    part, filled = part + 1, 0
+                take = min(max_rows - filled, len(frame) - start)
+                title = sheet_name if part == 1 else f'{sheet_name} ({part})'
+                yield (i, part), title, frame.iloc[start:start + take]
+                filled += take
+                start += take
+        if filled == 0 and part == 1 and empty is not None:
+            yield (i, part), sheet_name, empty
+
+def write_excel_streaming(path, sheets):
+    """
+    以 xlsxwriter 的 constant_memory 模式逐列寫出活頁簿 (path 為暫存檔，由 write_report 換上)
+    每個分頁只在寫入時佔用一列的記憶體
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    used = set()
+    n_sheets = 0
+    current = None
+    try:
+        for key, sheet_name, frame in sheet_chunks(sheets):
+            if key != current:
+                current = key
+                worksheet = workbook.add_worksheet(safe_sheet_name(sheet_name, used))
+                worksheet.write_row(0, 0, [str(c) for c in frame.columns], header_format)
+                r = 1
+                n_sheets += 1
+            for row in frame.itertuples(index=False, name=None):
+                # xlsxwriter 超出列數或欄數上限時不會報錯，只回傳 -1
+                if worksheet.write_row(r, 0, [_excel_cell(v) for v in row]) < 0:
+                    raise ValueError(f"無法寫入分頁 '{worksheet.name}' 第 {r + 1} 列 (超出 Excel 的列數或欄數上限)")
+                r += 1
+    finally:
+        workbook.close()
+    print(f"   (串流模式寫出 {n_sheets} 個分頁)")
+
+def write_report(path, sheets):
+    """先寫到同一資料夾的唯一暫存檔，完成後再以 os.replace 換上正式檔案 (寫到一半失敗時保留舊報表)"""
+    tmp_path = temp_sibling(path)
+    try:
+        if EXCEL_STREAMING:
+            write_excel_streaming(tmp_path, sheets)
+        else:
+            parts = {}
+            for key, sheet_name, frame in sheet_chunks(sheets):
+                parts.setdefault(key, (sheet_name, []))[1].append(frame)
+            used = set()
+            with pd.ExcelWriter(tmp_path) as writer:
+                for sheet_name, frames in parts.values():
+                    pd.concat(frames).to_excel(writer, sheet_name=safe_sheet_name(sheet_name, used), index=False)
+        # mkstemp 建立的檔案只有擁有者可讀，換上前改回一般檔案的權限
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def process_data(plot=True):
+    """
+    產生統計報表並回傳熱力圖資料；先比對輸入指紋，報表已是最新時不重寫活頁簿，
+    也不需要畫圖 (plot=False) 時連資料都不讀取、不數值化
+    """
     print(f"正在讀取資料: {INPUT_FILE} ...")
     if not os.path.exists(INPUT_FILE):
         print(f"❌ 錯誤: 找不到檔案 {INPUT_FILE}")
         return None
 
-    df = pd.read_csv(INPUT_FILE)
+    with stage('refine.fingerprint', workbook=OUTPUT_STATS_FILE, streaming=EXCEL_STREAMING) as s:
+        fingerprint = compute_fingerprint()
+        report_current = report_is_current(fingerprint)
+        if report_current:
+            s.hit()
+            print(f"⏭️ 輸入未變更，略過輸出: {OUTPUT_STATS_FILE}")
+        else:
+            s.miss()
+    if report_current and not plot:
+        return None
+
+    with stage('refine.read') as s:
+        df = s.output(pd.read_csv(INPUT_FILE))
 
     # 1. 基礎標籤處理
     df['School_Name'] = df['School_Name'].fillna('Unknown')
@@ -95,25 +284,25 @@ def process_data():
         ['School_Level', 'School_Name', 'Standardized_Role', 'Source_File']
     ).size().reset_index(name='人數')
     
-    # 輸出報表
-    with pd.ExcelWriter(OUTPUT_STATS_FILE) as writer:
-        school_summary.to_excel(writer, sheet_name='1.學校填答概況', index=False)
-        role_source_detail.to_excel(writer, sheet_name='2.角色與來源細節', index=False)
-        # 順便輸出原始資料的一個子集供檢查
-        check_df = df[['School_Name', 'Role_Tag', 'Standardized_Role', 'Source_File', '教師姓名']].head(50)
-        check_df.to_excel(writer, sheet_name='3.前50筆資料檢查', index=False)
-        
-    print(f"✅ 統計報表已輸出: {OUTPUT_STATS_FILE}")
-    print(f"   (請查看 '2.角色與來源細節' 分頁以確認資料來源檔案)")
-
     # 3. 資料數值化
     meta_cols = ['Source_File', 'Role_Tag', 'School_Name', 'School_Level', 'Standardized_Role', 
                  '教師姓名', '教師信箱', '學校', '職位', '科目', '提交時間']
     question_cols = [c for c in df.columns if c not in meta_cols]
     
-    score_df = df.copy()
-    for col in question_cols:
-        score_df[col] = score_df[col].apply(extract_score)
+    with stage('refine.quantify') as s:
+        score_df = s.output(quantify(s.input(df), question_cols))
+
+    # 輸出報表 (輸入與設定都沒變時略過，避免每次重寫整本活頁簿)
+    if not report_current:
+        with stage('refine.report', workbook=OUTPUT_STATS_FILE, streaming=EXCEL_STREAMING):
+            scored_cols = [c for c in question_cols if score_df[c].notna().any()]
+            sheets = report_sheets(df, score_df, scored_cols, school_summary, role_source_detail)
+            write_report(OUTPUT_STATS_FILE, sheets)
+            with open(FINGERPRINT_FILE, 'w', encoding='utf-8') as f:
+                f.write(fingerprint)
+
+            print(f"✅ 統計報表已輸出: {OUTPUT_STATS_FILE}")
+            print(f"   (請查看 '2.角色與來源細節' 分頁以確認資料來源檔案)")
 
     # 4. 準備熱力圖資料
     numeric_cols = score_df[question_cols].select_dtypes(include=[np.number]).columns
@@ -172,5 +361,7 @@ def draw_heatmap(data):
     print(f"✅ 熱力圖已輸出: {OUTPUT_HEATMAP_FILE}")
 
 if __name__ == "__main__":
-    plot_data = process_data()
-    draw_heatmap(plot_data)
\ No newline at end of file
+    with stage('refine'):
+        plot_data = process_data()
+        with stage('refine.heatmap'):
+            draw_heatmap(plot_data)
\ No newline at end of file
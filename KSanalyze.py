@@ -1,6 +1,9 @@
 import pandas as pd
 import os
 
+from dimension import rollup, rollup_report_rows
+from instrument import stage, instrumented
+
 # ================= 設定區 =================
 # 來源檔案
 FILE_QUANTIFIED = '/Users/xian/R project/114-1IDP/Analysis_KIST_Standard.csv'
@@ -9,6 +12,7 @@ FILE_QUANTIFIED = '/Users/xian/R project/114-1IDP/Analysis_KIST_Standard.csv'
 OUT_OVERALL = '1_KIST_Overall_Stats_v2.csv'
 OUT_SCHOOL = '2_KIST_School_Comparison_v2.csv'
 OUT_ROLE = '3_KIST_Role_Comparison_v2.csv'
+OUT_DIMENSION = '4_KIST_Dimension_Stats_v2.csv'
 # =========================================
 
 def generate_stats_report(df, group_col, value_cols):
@@ -30,11 +34,15 @@ def generate_stats_report(df, group_col, value_cols):
     counts_df = pd.DataFrame(counts).T
     counts_df.index = ['有效樣本數 (N)']
     
-    # 合併 (樣本數 row + 平均數 rows)
-    final_report = pd.concat([counts_df, means])
+    # 4. 面向/框架分數 (由指標平均數一次矩陣運算彙整而來，接在指標列之後)
+    dimension_rows = rollup_report_rows(means, system='KIST')
+    
+    # 合併 (樣本數 row + 平均數 rows + 面向/框架 rows)
+    final_report = pd.concat([counts_df, means, dimension_rows])
     
     return final_report
 
+@instrumented('KSanalyze')
 def main():
     # 1. 讀取資料
     if not os.path.exists(FILE_QUANTIFIED):
@@ -42,7 +50,8 @@ def main():
         return
 
     print(f"正在讀取 {FILE_QUANTIFIED} ...")
-    df_all = pd.read_csv(FILE_QUANTIFIED)
+    with stage('KSanalyze.read') as s:
+        df_all = s.output(pd.read_csv(FILE_QUANTIFIED))
     
     # 2. 資料過濾：只保留 KIST 標準體系 (排除樟湖)
     df = df_all[~df_all['School_Name'].str.contains('樟湖', na=False)].copy()
@@ -73,19 +82,32 @@ def main():
     # 分析一：總體診斷 (Descriptive Stats)
     # ==========================================
     print("\n[1/3] 計算總體診斷...")
-    overall_stats = df[numeric_cols].describe().T[['count', 'mean', 'std', 'min', 'max']]
-    overall_stats.columns = ['有效樣本數', '平均數', '標準差', '最小值', '最大值']
-    overall_stats = overall_stats.sort_values(by='平均數', ascending=False)
-    overall_stats.to_csv(OUT_OVERALL, encoding='utf-8-sig')
+    with stage('KSanalyze.overall') as s:
+        s.input(df[numeric_cols])
+        overall_stats = df[numeric_cols].describe().T[['count', 'mean', 'std', 'min', 'max']]
+        overall_stats.columns = ['有效樣本數', '平均數', '標準差', '最小值', '最大值']
+        overall_stats = s.output(overall_stats.sort_values(by='平均數', ascending=False))
+        overall_stats.to_csv(OUT_OVERALL, encoding='utf-8-sig')
     print(f"-> 已輸出: {OUT_OVERALL}")
 
+    # 面向/框架的總體診斷 (每位教師先彙整成面向分數，再做描述統計)
+    with stage('KSanalyze.dimension') as s:
+        s.input(df[numeric_cols])
+        dimension_scores = rollup(df, numeric_cols, system='KIST').dropna(axis=1, how='all')
+        dimension_stats = dimension_scores.describe().T[['count', 'mean', 'std', 'min', 'max']]
+        dimension_stats.columns = ['有效樣本數', '平均數', '標準差', '最小值', '最大值']
+        s.output(dimension_stats).to_csv(OUT_DIMENSION, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_DIMENSION}")
+
     # ==========================================
     # 分析二：校際比較 (School Comparison)
     # ==========================================
     print("\n[2/3] 計算校際比較 (含樣本數)...")
     if 'School_Name' in df.columns:
-        school_report = generate_stats_report(df, 'School_Name', numeric_cols)
-        school_report.to_csv(OUT_SCHOOL, encoding='utf-8-sig')
+        with stage('KSanalyze.school') as s:
+            s.input(df[numeric_cols])
+            school_report = s.output(generate_stats_report(df, 'School_Name', numeric_cols))
+            school_report.to_csv(OUT_SCHOOL, encoding='utf-8-sig')
         print(f"-> 已輸出: {OUT_SCHOOL}")
         
         # 顯示各校樣本數供確認
@@ -97,8 +119,10 @@ def main():
     # ==========================================
     print("\n[3/3] 計算身份比較 (含樣本數)...")
     if 'Role_Tag' in df.columns:
-        role_report = generate_stats_report(df, 'Role_Tag', numeric_cols)
-        role_report.to_csv(OUT_ROLE, encoding='utf-8-sig')
+        with stage('KSanalyze.role') as s:
+            s.input(df[numeric_cols])
+            role_report = s.output(generate_stats_report(df, 'Role_Tag', numeric_cols))
+            role_report.to_csv(OUT_ROLE, encoding='utf-8-sig')
         print(f"-> 已輸出: {OUT_ROLE}")
         
         # 顯示各身份樣本數供確認
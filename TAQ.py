@@ -2,6 +2,8 @@ import pandas as pd
 import re
 import os
 
+from instrument import stage, instrumented
+
 # ================= 設定區 =================
 INPUT_FILENAME = '/Users/xian/R project/114-1IDP/114_IDP_Master_Merged.csv'  # 來源檔案 (剛剛合併出來的那份)
 OUTPUT_FILENAME = '/Users/xian/R project/114-1IDP/114_Teaching_Ability_Quantified.csv' # 輸出檔案
@@ -39,6 +41,7 @@ def extract_score(text):
         
     return None
 
+@instrumented('TAQ')
 def main():
     # 1. 讀取合併後的檔案
     if not os.path.exists(INPUT_FILENAME):
@@ -47,7 +50,8 @@ def main():
     
     print(f"正在讀取 {INPUT_FILENAME} ...")
     try:
-        df = pd.read_csv(INPUT_FILENAME)
+        with stage('TAQ.read') as s:
+            df = s.output(pd.read_csv(INPUT_FILENAME))
     except Exception as e:
         print(f"讀取失敗: {e}")
         return
@@ -90,11 +94,16 @@ def main():
 
     # 4. 執行量化轉換
     print("正在將文字描述轉換為量化分數 (1-5)...")
-    for col in target_cols:
-        df_teaching[col] = df_teaching[col].apply(extract_score)
+    with stage('TAQ.quantify') as s:
+        s.input(df_teaching)
+        for col in target_cols:
+            df_teaching[col] = df_teaching[col].apply(extract_score)
+        s.output(df_teaching)
 
     # 5. 儲存結果
-    df_teaching.to_csv(OUTPUT_FILENAME, index=False, encoding='utf-8-sig')
+    with stage('TAQ.write') as s:
+        s.input(df_teaching)
+        df_teaching.to_csv(OUTPUT_FILENAME, index=False, encoding='utf-8-sig')
     
     print("-" * 30)
     print("處理完成！")
@@ -1,6 +1,9 @@
 import pandas as pd
 import os
 
+from dimension import rollup
+from instrument import stage, instrumented
+
 # ================= 設定區 =================
 # 來源檔案優先順序
 FILE_ZHANGHU_SPLIT = 'Analysis_Zhanghu_Teachers.csv'
@@ -8,27 +11,32 @@ FILE_QUANTIFIED = '_Teaching_Ability_Quantified.csv'
 
 # 輸出檔名
 OUTPUT_FILE = 'Zhanghu_Overall_Stats.csv'
+OUTPUT_DIMENSION_FILE = 'Zhanghu_Dimension_Stats.csv'
 # =========================================
 
+@instrumented('Zhanghuanalyze')
 def main():
     df = None
     
     # 1. 智慧讀取資料
     if os.path.exists(FILE_ZHANGHU_SPLIT):
         print(f"正在讀取分流檔 {FILE_ZHANGHU_SPLIT}...")
-        df = pd.read_csv(FILE_ZHANGHU_SPLIT)
+        with stage('Zhanghuanalyze.read', source=FILE_ZHANGHU_SPLIT) as s:
+            df = s.output(pd.read_csv(FILE_ZHANGHU_SPLIT))
     elif os.path.exists(FILE_QUANTIFIED):
         print(f"找不到分流檔，正在從總表 {FILE_QUANTIFIED} 提取樟湖資料...")
-        df_all = pd.read_csv(FILE_QUANTIFIED)
+        with stage('Zhanghuanalyze.read', source=FILE_QUANTIFIED) as s:
+            df_all = s.input(pd.read_csv(FILE_QUANTIFIED))
         
-        # 篩選邏輯：學校包含'樟湖' 且 角色不是'行政人員'
-        df = df_all[
-            (df_all['School_Name'].str.contains('樟湖', na=False)) & 
-            (df_all['Role_Tag'] != '行政人員')
-        ].copy()
+            # 篩選邏輯：學校包含'樟湖' 且 角色不是'行政人員'
+            df = df_all[
+                (df_all['School_Name'].str.contains('樟湖', na=False)) & 
+                (df_all['Role_Tag'] != '行政人員')
+            ].copy()
         
-        # 關鍵步驟：刪除所有「完全空白」的欄位 (這樣會自動移除 KIST 的標準指標)
-        df.dropna(axis=1, how='all', inplace=True)
+            # 關鍵步驟：刪除所有「完全空白」的欄位 (這樣會自動移除 KIST 的標準指標)
+            df.dropna(axis=1, how='all', inplace=True)
+            s.output(df)
     else:
         print("錯誤：找不到任何可用的數據檔案。")
         return
@@ -51,7 +59,8 @@ def main():
     print("\n正在計算統計數據...")
     
     # describe() 函數一次算出 count, mean, std, min, max 等
-    stats = df[numeric_cols].describe().T[['count', 'mean', 'std', 'min', 'max']]
+    with stage('Zhanghuanalyze.stats') as s:
+        stats = s.output(s.input(df[numeric_cols]).describe().T[['count', 'mean', 'std', 'min', 'max']])
     
     # 重新命名欄位，使其更直觀
     stats.columns = ['有效樣本數', '平均數', '標準差', '最小值', '最大值']
@@ -62,8 +71,16 @@ def main():
     # 5. 輸出結果
     stats.to_csv(OUTPUT_FILE, encoding='utf-8-sig')
     
+    # 面向/框架分數 (每位教師先彙整成面向分數，再做描述統計)
+    with stage('Zhanghuanalyze.dimension') as s:
+        dimension_scores = rollup(s.input(df), numeric_cols, system='樟湖').dropna(axis=1, how='all')
+        dimension_stats = dimension_scores.describe().T[['count', 'mean', 'std', 'min', 'max']]
+        dimension_stats.columns = ['有效樣本數', '平均數', '標準差', '最小值', '最大值']
+        s.output(dimension_stats).to_csv(OUTPUT_DIMENSION_FILE, encoding='utf-8-sig')
+    
     print("-" * 30)
     print(f"分析完成！報表已輸出至: {OUTPUT_FILE}")
+    print(f"面向/框架統計已輸出至: {OUTPUT_DIMENSION_FILE}")
     print("-" * 30)
     print("【前 5 名強項指標】")
     print(stats.head(5)[['平均數', '標準差']])
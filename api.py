@@ -0,0 +1,580 @@
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+import numpy as np
+import pandas as pd
+
+from KSanalyze import generate_stats_report
+from dimension import rollup, build_weight_matrices, DIMENSION_PREFIX, FRAMEWORK_PREFIX
+from percentile import PercentileService, SCHOOL_LEVEL_MAP
+from inbox import read_current, snapshot_folder
+from instrument import stage
+from mmapcache import read_table
+
+# 本機 JSON API：提供與儀表板相同的數字給其他行政系統，不必再去解析 CSV
+#
+#   GET /api                         資料版本與端點清單
+#   GET /api/overall?system=KIST     各指標 (與面向) 的總體描述統計 (system: KIST / 樟湖)
+#   GET /api/schools                 KIST 校際比較 (各校樣本數、指標 / 面向 / 框架平均)
+#   GET /api/roles                   KIST 身份比較
+#   GET /api/levels?system=KIST      教育階段比較
+#   GET /api/teachers?q=王&school=&role=&system=&limit=20   教師搜尋
+#   GET /api/teachers/<id>           單一教師：各指標分數、在各比較群組中的百分位與名次、面向分數、因素分數
+#
+# 資料版本載入時就把固定端點的 JSON、gzip 壓縮結果與 ETag (內容雜湊) 都算好；
+# 教師查詢的回應在第一次被請求時產生後放進 LRU 快取。之後每個請求只是查表與送出位元組，
+# 帶 If-None-Match 的輪詢在內容沒變時只回 304 (沒有內容)
+#
+# 資料夾的選擇與 dashboard 相同 (總表庫目前含分析結果的版本，否則為目前目錄)，
+# 定期檢查是否有新版本，有的話由一個請求負責載入後換上，載入期間其他請求仍以舊版本回應
+
+# ================= 設定區 =================
+# 只接受本機連線 (回應中含教師姓名)；要開放給其他主機時再改成 '0.0.0.0'
+HOST = '127.0.0.1'
+PORT = 8765
+
+# 分流後的教師資料 (教師搜尋與個人查詢)
+FILE_KIST = 'Analysis_KIST_Standard.csv'
+FILE_ZHANGHU = 'Analysis_Zhanghu_Teachers.csv'
+
+# 預先彙整好的結果檔 (KSanalyze / Zhanghuanalyze / factor 的輸出)
+OVERALL_FILES = {'KIST': '1_KIST_Overall_Stats_v2.csv', '樟湖': 'Zhanghu_Overall_Stats.csv'}
+DIMENSION_FILES = {'KIST': '4_KIST_Dimension_Stats_v2.csv', '樟湖': 'Zhanghu_Dimension_Stats.csv'}
+COMPARISON_FILES = {'schools': '2_KIST_School_Comparison_v2.csv', 'roles': '3_KIST_Role_Comparison_v2.csv'}
+FACTOR_SCORES_FILE = 'Factor_Scores.csv'
+
+# 檢查是否有新資料版本的間隔 (秒)
+RELOAD_CHECK_SECONDS = 2.0
+# 教師搜尋預設 / 最多回傳的筆數
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+# 動態回應 (教師搜尋與個人查詢) 的快取筆數
+MAX_CACHED_RESPONSES = 4096
+# 小於這個大小的回應不壓縮 (gzip 的檔頭反而讓它變大)
+GZIP_MIN_BYTES = 512
+# 允許跨來源讀取的網域 (例如其他系統的網頁前端)，None 代表不送 CORS 標頭
+CORS_ORIGIN = None
+# 是否印出每個請求 (高流量時會拖慢服務)
+ACCESS_LOG = False
+# =========================================
+
+STAT_KEYS = {'有效樣本數': 'n', '平均數': 'mean', '標準差': 'std', '最小值': 'min', '最大值': 'max'}
+
+# 路由：路徑樣式 -> (處理函數, 可用的查詢參數與預設值)
+# 未列出的查詢參數會被忽略 (例如前端為了避開瀏覽器快取加上的時間戳記)，不會產生新的快取項目
+ROUTES = [
+    (re.compile(r'/api/?$'), 'index', {}),
+    (re.compile(r'/api/overall/?$'), 'overall', {'system': 'KIST'}),
+    (re.compile(r'/api/(schools|roles)/?$'), 'comparison', {}),
+    (re.compile(r'/api/levels/?$'), 'levels', {'system': 'KIST'}),
+    (re.compile(r'/api/teachers/?$'), 'search',
+     {'q': '', 'school': '', 'role': '', 'system': '', 'limit': str(SEARCH_LIMIT)}),
+    (re.compile(r'/api/teachers/([^/]+)/?$'), 'teacher', {}),
+]
+
+Response = namedtuple('Response', ['status', 'body', 'gzip_body', 'etag'])
+
+
+class ApiError(Exception):
+    """以 JSON 錯誤訊息回應的請求錯誤"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def teacher_files():
+    """體系 -> 分流檔 (函數形式，讓 idp 覆寫的 FILE_KIST / FILE_ZHANGHU 生效)"""
+    return {'KIST': FILE_KIST, '樟湖': FILE_ZHANGHU}
+
+
+def data_folder():
+    """分析結果所在的資料夾 (與 dashboard 相同)"""
+    return snapshot_folder(read_current(), key='analysis_snapshot') or '.'
+
+
+def fingerprint(folder):
+    """資料夾中各來源檔的 (檔名, 大小, 修改時間)，任何一個改變就重新載入"""
+    names = [*OVERALL_FILES.values(), *DIMENSION_FILES.values(), *COMPARISON_FILES.values(),
+             *teacher_files().values(), FACTOR_SCORES_FILE]
+    result = [os.path.abspath(folder)]
+    for name in names:
+        try:
+            info = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        result.append((name, info.st_size, info.st_mtime_ns))
+    return tuple(result)
+
+
+def _value(x):
+    """numpy / pandas 的純量 -> JSON 可用的值 (缺值為 null)"""
+    if x is None or (isinstance(x, (float, np.floating)) and np.isnan(x)):
+        return None
+    if isinstance(x, np.integer):
+        return int(x)
+    if isinstance(x, np.floating):
+        return float(x)
+    if isinstance(x, np.bool_):
+        return bool(x)
+    return x
+
+
+def _count(x):
+    x = _value(x)
+    return None if x is None else int(x)
+
+
+def make_response(obj, status=200):
+    """JSON 本文、gzip 壓縮版本與 ETag (內容雜湊) 一次算好"""
+    body = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    # mtime=0 讓相同內容的壓縮結果也相同
+    gzip_body = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+    etag = 'W/"' + hashlib.sha256(body).hexdigest()[:24] + '"' if status == 200 else None
+    return Response(status, body, gzip_body, etag)
+
+
+def split_rows(series):
+    """KSanalyze 報表的一欄 -> 指標 / 面向 / 框架三類 (依列名前綴區分)"""
+    result = {'indicators': {}, 'dimensions': {}, 'frameworks': {}}
+    for name, v in series.items():
+        if name.startswith(DIMENSION_PREFIX):
+            result['dimensions'][name[len(DIMENSION_PREFIX):]] = _value(v)
+        elif name.startswith(FRAMEWORK_PREFIX):
+            result['frameworks'][name[len(FRAMEWORK_PREFIX):]] = _value(v)
+        else:
+            result['indicators'][name] = _value(v)
+    return result
+
+
+def comparison_json(report):
+    """KSanalyze 格式的比較表 (第一列為樣本數，其餘為指標與面向/框架列) -> 各組的 JSON"""
+    counts = report.iloc[0]
+    return [{'name': str(group), 'n': _count(counts[group]), **split_rows(report[group].iloc[1:])}
+            for group in report.columns]
+
+
+def stats_json(df):
+    """描述統計表 (列為指標，欄為 有效樣本數/平均數/...) -> JSON 清單"""
+    rows = []
+    for name, row in df.iterrows():
+        item = {'name': str(name)}
+        for col, key in STAT_KEYS.items():
+            if col in df.columns:
+                item[key] = _count(row[col]) if key == 'n' else _value(row[col])
+        rows.append(item)
+    return rows
+
+
+def teacher_ids(system, meta):
+    """
+    各教師的識別碼：體系 + (學校, 姓名) 的雜湊，重新匯入或列順序改變後同一位教師的 id 不變
+    (不使用列號)；同校同名的教師依出現順序加上 -2、-3 …
+    """
+    names = meta['教師姓名'].astype(str) if '教師姓名' in meta else pd.Series('', index=meta.index)
+    ids, seen = [], {}
+    for school, name in zip(meta['School_Name'].astype(str), names):
+        digest = hashlib.sha256('\0'.join([school, name]).encode('utf-8')).hexdigest()[:12]
+        base = f'{system}-{digest}'
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f'{base}-{seen[base]}')
+    return ids
+
+
+def plain_meta(df):
+    """映射快取把文字欄讀成 Categorical；教師資料的中繼欄位轉回一般物件欄，後續的 fillna / map 才能照常使用"""
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+class TeacherSystem:
+    """單一體系的教師資料：百分位查詢服務與每位教師的面向分數"""
+
+    def __init__(self, system, df):
+        self.system = system
+        self.df = df.reset_index(drop=True)
+        self.service = PercentileService(self.df)
+        self.meta = self.service.meta
+        self.ids = teacher_ids(system, self.meta)
+        scores = rollup(self.df, self.service.indicators, system=system)
+        dims = set(build_weight_matrices(self.service.indicators, system=system)[0].columns)
+        self.dimension_scores = scores[[c for c in scores.columns if c in dims]]
+        self.framework_scores = scores[[c for c in scores.columns if c not in dims]]
+
+
+class Dataset:
+    """
+    一個資料版本的全部回應
+    固定端點在建立時就產生好 (static)；教師搜尋與個人查詢放在有上限的 LRU 快取 (cache)
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.version = None if folder == '.' else os.path.basename(os.path.normpath(folder))
+        self.static = {}
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        with stage('api.load', folder=folder) as s:
+            self.overall = {}
+            for system, filename in OVERALL_FILES.items():
+                path = os.path.join(folder, filename)
+                if os.path.exists(path):
+                    self.overall[system] = s.input(read_table(path, index_col=0))
+            self.dimension_stats = {}
+            for system, filename in DIMENSION_FILES.items():
+                path = os.path.join(folder, filename)
+                if os.path.exists(path):
+                    self.dimension_stats[system] = read_table(path, index_col=0)
+            self.comparisons = {}
+            for kind, filename in COMPARISON_FILES.items():
+                path = os.path.join(folder, filename)
+                if os.path.exists(path):
+                    self.comparisons[kind] = s.input(read_table(path, index_col=0))
+
+            self.teachers = {}
+            for system, filename in teacher_files().items():
+                path = os.path.join(folder, filename)
+                if not os.path.exists(path):
+                    continue
+                df = plain_meta(read_table(path))
+                if system == 'KIST':
+                    # 與 KSanalyze 相同：KIST 體系排除樟湖
+                    df = df[~df['School_Name'].astype(str).str.contains('樟湖', na=False)]
+                if len(df):
+                    self.teachers[system] = TeacherSystem(system, s.input(df))
+
+            self.factor_rows = {}
+            path = os.path.join(folder, FACTOR_SCORES_FILE)
+            self.factor_scores = plain_meta(read_table(path)) if os.path.exists(path) else None
+            if self.factor_scores is not None:
+                keys = self.factor_scores[['體系', 'School_Name', 'Role_Tag', '教師姓名']].astype(str)
+                for row, key in enumerate(keys.itertuples(index=False, name=None)):
+                    self.factor_rows.setdefault(key, row)
+
+            self.teacher_rows = {tid: (system, row) for system, t in self.teachers.items()
+                                 for row, tid in enumerate(t.ids)}
+            self.search_index = self._build_search_index()
+            self._precompute()
+            s.note(version=self.version, teachers=len(self.search_index), responses=len(self.static))
+
+    def _build_search_index(self):
+        frames = []
+        for system, t in self.teachers.items():
+            meta = t.meta
+            frames.append(pd.DataFrame({
+                'id': t.ids,
+                'system': system,
+                'name': meta['教師姓名'].astype(str) if '教師姓名' in meta else '',
+                'school': meta['School_Name'].astype(str),
+                'role': meta['Role_Tag'].astype(str),
+                'position': meta['職位'] if '職位' in meta else None,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['id', 'system', 'name', 'school', 'role', 'position', 'key'])
+        index = pd.concat(frames, ignore_index=True)
+        index['key'] = index['name'].str.casefold()
+        return index
+
+    def _precompute(self):
+        """固定端點的回應 (資料版本換上前就全部產生好，換版後第一個請求也不必等待計算)"""
+        targets = [('/api', {}), ('/api/schools', {}), ('/api/roles', {}), ('/api/teachers', {})]
+        for system in set(self.overall) | set(self.teachers):
+            targets += [('/api/overall', {'system': system}), ('/api/levels', {'system': system})]
+        for path, params in targets:
+            try:
+                key, response = self._build(path, params)
+            except Exception:
+                # 產生失敗的端點不預先放入，請求時再產生並回應錯誤 (ApiError 或 500)，不影響整個版本的載入
+                continue
+            self.static[key] = response
+
+    def _route(self, path, params):
+        for pattern, name, defaults in ROUTES:
+            m = pattern.match(path)
+            if m:
+                values = tuple(params.get(k, v) for k, v in defaults.items())
+                return name, m.groups(), dict(zip(defaults, values))
+        raise ApiError(404, f"找不到端點: {path}")
+
+    def _build(self, path, params):
+        name, groups, args = self._route(path, params)
+        key = (name, groups, tuple(args.values()))
+        return key, make_response(getattr(self, 'get_' + name)(*groups, **args))
+
+    def respond(self, path, params):
+        """回傳請求對應的 Response (固定端點查表；其他先查 LRU 快取，未命中才產生)"""
+        name, groups, args = self._route(path, params)
+        key = (name, groups, tuple(args.values()))
+        response = self.static.get(key)
+        if response is not None:
+            return response
+        with self.lock:
+            response = self.cache.get(key)
+            if response is not None:
+                self.cache.move_to_end(key)
+                return response
+
+        response = make_response(getattr(self, 'get_' + name)(*groups, **args))
+        with self.lock:
+            self.cache[key] = response
+            while len(self.cache) > MAX_CACHED_RESPONSES:
+                self.cache.popitem(last=False)
+        return response
+
+    # ================= 端點 =================
+    def _system(self, system, available):
+        if system not in available:
+            raise ApiError(404, f"沒有 '{system}' 體系的資料 (可用: {', '.join(available) or '無'})")
+
+    def get_index(self):
+        return {
+            'version': self.version,
+            'systems': sorted(set(self.overall) | set(self.teachers)),
+            'teachers': {system: len(t.df) for system, t in self.teachers.items()},
+            'endpoints': ['/api/overall?system=', '/api/schools', '/api/roles', '/api/levels?system=',
+                          '/api/teachers?q=&school=&role=&system=&limit=', '/api/teachers/<id>'],
+        }
+
+    def get_overall(self, system):
+        self._system(system, self.overall)
+        result = {'system': system, 'version': self.version, 'indicators': stats_json(self.overall[system])}
+        if system in self.dimension_stats:
+            result['dimensions'] = stats_json(self.dimension_stats[system])
+        return result
+
+    def get_comparison(self, kind):
+        if kind not in self.comparisons:
+            raise ApiError(404, f"找不到 {COMPARISON_FILES[kind]}，請先執行 KSanalyze.py")
+        return {'system': 'KIST', 'version': self.version, 'groups': comparison_json(self.comparisons[kind])}
+
+    def get_levels(self, system):
+        self._system(system, self.teachers)
+        t = self.teachers[system]
+        df = t.df.assign(School_Level=t.df['School_Name'].map(SCHOOL_LEVEL_MAP).fillna('4.其他'))
+        report = generate_stats_report(df, 'School_Level', t.service.indicators)
+        return {'system': system, 'version': self.version, 'groups': comparison_json(report)}
+
+    def get_search(self, q, school, role, system, limit):
+        try:
+            limit = min(max(int(limit), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            raise ApiError(400, f"limit 必須是整數: {limit}")
+        index = self.search_index
+        mask = np.ones(len(index), dtype=bool)
+        if q:
+            mask &= index['key'].str.contains(q.casefold(), regex=False).to_numpy(dtype=bool)
+        for col, value in [('school', school), ('role', role), ('system', system)]:
+            if value:
+                mask &= (index[col] == value).to_numpy()
+        hits = index[mask].head(limit)
+        teachers = [{k: _value(v) for k, v in row.items()}
+                    for row in hits.drop(columns='key').to_dict('records')]
+        return {'version': self.version, 'total': int(mask.sum()), 'teachers': teachers}
+
+    def get_teacher(self, teacher_id):
+        if teacher_id not in self.teacher_rows:
+            raise ApiError(404, f"找不到教師: {teacher_id}")
+        system, row = self.teacher_rows[teacher_id]
+        t = self.teachers[system]
+        meta = {k: _value(v) for k, v in t.meta.iloc[row].items()}
+
+        report = t.service.teacher_report(row)
+        indicators = []
+        for _, r in report[report['分數'].notna()].iterrows():
+            peers = {axis: {'percentile': _value(r[f'{axis}_百分位']), 'rank': _count(r[f'{axis}_名次']),
+                            'n': _count(r[f'{axis}_人數'])}
+                     for axis in t.service.axes}
+            indicators.append({'name': r['指標'], 'score': _value(r['分數']), 'peers': peers})
+
+        result = {
+            'id': teacher_id, 'system': system, 'version': self.version,
+            'name': meta.get('教師姓名'), 'school': meta.get('School_Name'), 'role': meta.get('Role_Tag'),
+            'position': meta.get('職位'), 'level': SCHOOL_LEVEL_MAP.get(meta.get('School_Name'), '4.其他'),
+            'indicators': indicators,
+            'dimensions': {k: _value(v) for k, v in t.dimension_scores.iloc[row].dropna().items()},
+            'frameworks': {k: _value(v) for k, v in t.framework_scores.iloc[row].dropna().items()},
+            'factors': None,
+        }
+        key = tuple(str(meta.get(c)) for c in ['School_Name', 'Role_Tag', '教師姓名'])
+        factor_row = self.factor_rows.get((system, *key))
+        if factor_row is not None:
+            scores = self.factor_scores.iloc[factor_row]
+            result['factors'] = {c: _value(scores[c]) for c in self.factor_scores.columns
+                                 if c.startswith('因素')}
+        return result
+
+
+class ApiServer(ThreadingHTTPServer):
+    """多執行緒 HTTP 伺服器；持有目前的資料版本，定期檢查並換上新版本"""
+
+    daemon_threads = True
+
+    def __init__(self, address, folder=None):
+        super().__init__(address, ApiHandler)
+        self.fixed_folder = folder
+        self.dataset = None
+        self.fingerprint = None
+        self.checked = 0.0
+        self.reload_lock = threading.Lock()
+
+    def current_dataset(self):
+        """目前的資料版本；到了檢查時間由一個執行緒負責重新載入，其他執行緒繼續使用舊版本"""
+        if self.dataset is not None and time.monotonic() - self.checked < RELOAD_CHECK_SECONDS:
+            return self.dataset
+        if not self.reload_lock.acquire(blocking=self.dataset is None):
+            return self.dataset
+        try:
+            if self.dataset is None or time.monotonic() - self.checked >= RELOAD_CHECK_SECONDS:
+                self.reload()
+        finally:
+            self.reload_lock.release()
+        return self.dataset
+
+    def reload(self):
+        folder = self.fixed_folder or data_folder()
+        fp = fingerprint(folder)
+        if fp != self.fingerprint:
+            try:
+                dataset = Dataset(folder)
+            except Exception as e:
+                # 例如逐步執行流程正在改寫結果檔；保留舊版本，下次檢查時再試
+                print(f"警告: 無法載入 '{folder}' 的分析結果 ({e})，繼續使用目前的版本", file=sys.stderr)
+            else:
+                self.dataset, self.fingerprint = dataset, fp
+                print(f"已載入資料版本: {dataset.version or os.path.abspath(folder)} "
+                      f"({len(dataset.search_index)} 位教師)", file=sys.stderr)
+        self.checked = time.monotonic()
+
+
+def etag_matches(header, etag):
+    """If-None-Match 的弱比較 (忽略 W/ 前綴)"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    strip = lambda tag: tag.strip().removeprefix('W/')
+    return strip(etag) in {strip(tag) for tag in header.split(',')}
+
+
+def accepts_gzip(header):
+    """
+    Accept-Encoding 是否接受 gzip (q=0 代表拒絕)
+    q 值無法解析 (例如 gzip;q=abc) 時視為不接受，改回傳未壓縮的本文，不會讓例外中斷連線
+    """
+    for part in (header or '').split(','):
+        token, *params = part.strip().split(';')
+        if token.strip().lower() not in ('gzip', '*'):
+            continue
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    return False
+                return 0 < q <= 1
+        return True
+    return False
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1：連線保持開啟，輪詢的用戶端不必每次重新建立 TCP 連線
+    protocol_version = 'HTTP/1.1'
+    server_version = 'IDP-API/1.0'
+    # 標頭與本文分兩次寫出；不關閉 Nagle 的話，第二次寫出要等對方的延遲確認 (約 40 ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_api(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_api(send_body=False)
+
+    def handle_api(self, send_body):
+        url = urlsplit(self.path)
+        try:
+            dataset = self.server.current_dataset()
+            if dataset is None:
+                raise ApiError(503, "尚未有分析結果，請先執行分析流程")
+            response = dataset.respond(unquote(url.path), dict(parse_qsl(url.query)))
+        except ApiError as e:
+            response = make_response({'error': e.message}, status=e.status)
+        except Exception:
+            # 其他例外 (例如結果中有無法轉成 JSON 的無限大) 也以 JSON 回應，不讓連線直接中斷
+            print(f"錯誤: 處理請求 {self.path} 時發生例外", file=sys.stderr)
+            traceback.print_exc()
+            response = make_response({'error': '伺服器內部錯誤'}, status=500)
+
+        if response.etag and etag_matches(self.headers.get('If-None-Match'), response.etag):
+            self.send_response(304)
+            self.send_common_headers(response)
+            self.end_headers()
+            return
+
+        body = response.body
+        use_gzip = response.gzip_body is not None and accepts_gzip(self.headers.get('Accept-Encoding'))
+        if use_gzip:
+            body = response.gzip_body
+        self.send_response(response.status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_common_headers(response)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_common_headers(self, response):
+        if response.etag:
+            self.send_header('ETag', response.etag)
+            # 用戶端可以保留回應，但每次使用前都要帶 ETag 回來確認 (內容沒變時只回 304)
+            self.send_header('Cache-Control', 'no-cache')
+        if response.gzip_body is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        if CORS_ORIGIN:
+            self.send_header('Access-Control-Allow-Origin', CORS_ORIGIN)
+
+    def log_message(self, format, *args):
+        if ACCESS_LOG:
+            super().log_message(format, *args)
+
+
+def serve(host=None, port=None, folder=None):
+    """啟動 API 服務 (阻塞直到 Ctrl+C)；folder 指定時固定使用該資料夾，不跟隨總表庫的版本"""
+    server = ApiServer((host or HOST, port or PORT), folder)
+    server.current_dataset()
+    if server.dataset is None:
+        print("警告: 目前沒有可用的分析結果，資料產生後會自動載入。", file=sys.stderr)
+    print(f"IDP API 已啟動: http://{server.server_address[0]}:{server.server_address[1]}/api (Ctrl+C 結束)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止服務。")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='114 IDP 分析結果的本機 JSON API')
+    parser.add_argument('--host', default=HOST, help=f'監聽位址 (預設 {HOST}，只接受本機連線)')
+    parser.add_argument('--port', type=int, default=PORT, help=f'連接埠 (預設 {PORT})')
+    parser.add_argument('--folder', default=None, help='固定使用這個資料夾的分析結果 (預設跟隨總表庫目前的版本)')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.folder)
+
+
+if __name__ == "__main__":
+    main()
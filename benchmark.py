@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import logging
+import tracemalloc
+import contextlib
+
+# 圖表一律以非互動後端繪製 (需在匯入 matplotlib 之前設定)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# ================= 設定區 =================
+# 基準測試的工作資料夾 (模擬資料與各階段輸出都放在這裡)
+BENCH_FOLDER = 'benchmark_workdir'
+# 結果檔 (每次執行附加一行 JSON，方便跨版本比較)
+RESULTS_FILE = 'benchmark_results.jsonl'
+
+# 預設資料規模
+N_TEACHERS = 20000
+N_SCHOOLS = 200
+
+# 依序執行的階段 (後面的階段會用到前面的輸出)
+STAGES = ['datamapping', 'TAQ', 'TA_analyze', 'KSanalyze', 'Zhanghuanalyze', 'factor', 'percentile',
+          'significance', 'heatmap', 'lodheatmap', 'dashboard.load_data']
+# =========================================
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+
+def configure_paths(raw_folder):
+    """
+    把各腳本的設定區路徑改到基準測試的工作資料夾 (各腳本原本寫死本機路徑)，
+    並把模擬學校的教育階段併入依校名判斷教育階段的 SCHOOL_LEVEL_MAP
+    (figures 與 api 共用 percentile 的對照表)
+    """
+    import datamapping
+    import TAQ
+    import KSanalyze
+    import percentile
+    import peermatch
+    import significance
+    import synthdata
+
+    datamapping.SOURCE_FOLDER = raw_folder
+    datamapping.OUTPUT_FILENAME = '114_IDP_Master_Merged.csv'
+    TAQ.INPUT_FILENAME = '114_IDP_Master_Merged.csv'
+    # TA_analyze 讀取的是 _Teaching_Ability_Quantified.csv
+    TAQ.OUTPUT_FILENAME = '_Teaching_Ability_Quantified.csv'
+    KSanalyze.FILE_QUANTIFIED = 'Analysis_KIST_Standard.csv'
+
+    levels = synthdata.read_levels(raw_folder)
+    for module in (percentile, peermatch, significance):
+        module.SCHOOL_LEVEL_MAP.update(levels)
+
+
+def stage_callable(name):
+    """階段名稱 -> 要計時的函數 (匯入本身不計入時間)"""
+    if name == 'dashboard.load_data':
+        # 匯入 dashboard 會以 bare mode 執行整個頁面一次，之後每次都清除快取再重新讀取
+        with quiet():
+            import dashboard
+
+        def run():
+            dashboard.load_data.clear()
+            return dashboard.load_data()
+        return run
+    if name == 'lodheatmap':
+        # 教師層級的大型矩陣 (依教育階段分群) 與全覽圖
+        import pandas as pd
+        import figures
+
+        def run():
+            lod = figures.teacher_lod(pd.read_csv('Analysis_KIST_Standard.csv'))
+            return lod.figure(lod.view())
+        return run
+
+    module = __import__(name)
+    return module.main
+
+
+@contextlib.contextmanager
+def quiet():
+    """量測期間關閉各腳本的進度輸出與日誌警告 (如 streamlit bare mode 的 ScriptRunContext 警告)"""
+    logging.disable(logging.WARNING)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def measure(func, trace_memory=True):
+    """執行 func 並回傳 (wall 秒, CPU 秒, 記憶體峰值 MB, 錯誤訊息)"""
+    if trace_memory:
+        tracemalloc.start()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        with quiet():
+            func()
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return wall, cpu, peak, error
+
+
+def _rss_peak_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 計，macOS 以 bytes 計
+    return peak / 2 ** 20 if platform.system() == 'Darwin' else peak / 2 ** 10
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(n_teachers=N_TEACHERS, n_schools=N_SCHOOLS, stages=None, label=None,
+                  bench_folder=BENCH_FOLDER, trace_memory=True):
+    """產生模擬資料並依序測量每個階段，回傳一筆結果 (dict)"""
+    import synthdata
+
+    stages = STAGES if stages is None else stages
+    bench_folder = os.path.abspath(bench_folder)
+    raw_folder = os.path.join(bench_folder, 'raw')
+    os.makedirs(bench_folder, exist_ok=True)
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'label': label,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'n_teachers': n_teachers,
+        'n_schools': n_schools,
+        'stages': {},
+    }
+
+    print(f"[準備] 產生模擬資料：{n_schools} 所學校、{n_teachers} 位教師 ...")
+    wall, cpu, peak, error = measure(lambda: synthdata.generate(raw_folder, n_schools, n_teachers), trace_memory)
+    record['stages']['synthdata'] = _stage_result(wall, cpu, peak, error)
+    _print_stage('synthdata', record['stages']['synthdata'])
+
+    cwd = os.getcwd()
+    os.chdir(bench_folder)
+    try:
+        configure_paths(raw_folder)
+        for name in stages:
+            try:
+                func = stage_callable(name)
+            except Exception as e:
+                record['stages'][name] = _stage_result(0.0, 0.0, None, f'{type(e).__name__}: {e}')
+            else:
+                record['stages'][name] = _stage_result(*measure(func, trace_memory))
+            _print_stage(name, record['stages'][name])
+            _close_figures()
+            if name == 'datamapping' and record['stages'][name]['error'] is None:
+                record['n_schools_merged'] = merged_school_count()
+                if record['n_schools_merged'] != n_schools:
+                    # 不中止：各階段照常量測，結果中記錄學校數不符 (與其他結果比較時要注意)
+                    print(f"  ⚠️ 合併後的總表有 {record['n_schools_merged']} 個不同的 School_Name，"
+                          f"與要求的 {n_schools} 所不符")
+    finally:
+        os.chdir(cwd)
+
+    record['rss_peak_mb'] = _rss_peak_mb()
+    return record
+
+
+def merged_school_count():
+    """
+    合併後的總表中不同 School_Name 的數目；與要求的學校數不同時，
+    各階段的時間就不是在要求的學校數下量到的
+    """
+    import pandas as pd
+    import datamapping
+
+    return int(pd.read_csv(datamapping.OUTPUT_FILENAME, usecols=['School_Name'])['School_Name'].nunique())
+
+
+def _stage_result(wall, cpu, peak, error):
+    return {
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'peak_mb': None if peak is None else round(peak, 2),
+        'ok': error is None,
+        'error': error,
+    }
+
+
+def _print_stage(name, result):
+    status = '✅' if result['ok'] else f"❌ {result['error']}"
+    peak = '-' if result['peak_mb'] is None else f"{result['peak_mb']:.1f} MB"
+    print(f"  {name:<22} wall {result['wall_s']:>9.3f}s  cpu {result['cpu_s']:>9.3f}s  peak {peak:>10}  {status}")
+
+
+def _close_figures():
+    """TA_analyze 等腳本不會關閉圖表，避免累積到下一個階段的記憶體量測"""
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+
+def save_record(record, results_file=RESULTS_FILE):
+    with open(results_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def load_records(results_file):
+    if not os.path.exists(results_file):
+        return []
+    with open(results_file, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(record, baseline):
+    """列出與基準結果相比的各階段時間與記憶體倍率 (>1 代表變慢/變大)"""
+    print(f"\n【與 {baseline.get('git_commit') or '?'} ({baseline['timestamp']}) 比較】")
+    print(f"  {'階段':<22} {'基準(s)':>9} {'本次(s)':>9} {'時間倍率':>8} {'記憶體倍率':>10}")
+    for name, now in record['stages'].items():
+        old = baseline['stages'].get(name)
+        if not old or not (old['ok'] and now['ok']):
+            continue
+        time_ratio = now['wall_s'] / old['wall_s'] if old['wall_s'] else float('nan')
+        mem_ratio = (now['peak_mb'] / old['peak_mb']
+                     if now['peak_mb'] is not None and old['peak_mb'] else float('nan'))
+        print(f"  {name:<22} {old['wall_s']:>9.3f} {now['wall_s']:>9.3f} {time_ratio:>8.2f} {mem_ratio:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IDP 流程基準測試 (模擬資料)')
+    parser.add_argument('--teachers', type=int, default=N_TEACHERS, help='模擬教師人數')
+    parser.add_argument('--schools', type=int, default=N_SCHOOLS, help='模擬學校數')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='要測量的階段')
+    parser.add_argument('--label', default=None, help='此次結果的備註標籤')
+    parser.add_argument('--workdir', default=BENCH_FOLDER, help='工作資料夾')
+    parser.add_argument('--results', default=RESULTS_FILE, help='結果檔 (JSON Lines，附加寫入)')
+    parser.add_argument('--compare', default=None,
+                        help='與此結果檔中相同規模的最後一筆結果比較 (預設為 --results 本身)')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='不量測記憶體 (減少量測本身的開銷)')
+    args = parser.parse_args()
+    if args.teachers < args.schools:
+        parser.error(f'--teachers ({args.teachers}) 不可少於 --schools ({args.schools})，每所學校至少要有一位教師')
+
+    previous = load_records(args.compare or args.results)
+    record = run_benchmark(args.teachers, args.schools, args.stages, args.label,
+                           args.workdir, trace_memory=not args.no_tracemalloc)
+    save_record(record, args.results)
+    print(f"\n-> 結果已附加至: {args.results}")
+
+    same_size = [r for r in previous
+                 if r['n_teachers'] == record['n_teachers'] and r['n_schools'] == record['n_schools']]
+    if same_size:
+        compare(record, same_size[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,116 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import os
+from functools import partial
+
+import figures
+from figures import PAGES, SIGNIFICANCE_NOTE
+from lodheatmap import SUMMARIES, MAX_VISIBLE_ROWS
+from instrument import stage, current
+from inbox import read_current, snapshot_folder
 #python3 -m streamlit run dashboard.py
 # 設定頁面標題與佈局
 st.set_page_config(page_title="114學年度 教師IDP教學力分析儀表板", layout="wide")
 
 # ================= 資料讀取區 =================
-@st.cache_data
-def load_data():
-    data = {}
-    # 檔案路徑對應 (請確保這些檔案在同一目錄下)
-    files = {
-        "kist_overall": "1_KIST_Overall_Stats_v2.csv",
-        "kist_school": "2_KIST_School_Comparison_v2.csv",
-        "kist_role": "3_KIST_Role_Comparison_v2.csv",
-        "zhanghu_overall": "Zhanghu_Overall_Stats.csv"
-    }
-    
-    for key, filename in files.items():
-        if os.path.exists(filename):
-            # 讀取時將第一欄設為 Index 並命名為 '指標'
-            df = pd.read_csv(filename, index_col=0)
-            df.index.name = '指標'
-            data[key] = df
-        else:
-            st.error(f"找不到檔案: {filename}，請確認檔案是否在同一目錄下。")
-            return None
+def data_folder():
+    """
+    分析結果所在的資料夾：有總表庫 (inbox.py) 時為目前含分析結果的版本資料夾，否則為目前目錄
+    版本資料夾提交後不再變動，讀取期間有新的提交也只會在下次重新整理時換到新版本
+    """
+    return snapshot_folder(read_current(), key='analysis_snapshot') or '.'
+
+# 資料以記憶體映射讀取 (mmapcache)，並以 cache_resource 在同一行程的所有連線間共用同一份物件；
+# cache_data 會替每個連線反序列化出一份複本，等於把映射的資料又複製到行程記憶體中。
+# 映射的陣列是唯讀的 (pandas 的 copy-on-write 會在修改時自動複製)，共用不會互相影響
+@st.cache_resource
+def load_data(folder='.'):
+    # 只有快取未命中時才會執行到這裡 (快取以資料夾區分，新版本提交後自動重新讀取)
+    current().miss()
+    # 檔案路徑對應 (請確保這些檔案在同一目錄下；清單在 figures.py)
+    data, missing = figures.read_data(folder)
+    if missing:
+        st.error(f"找不到檔案: {missing}，請確認檔案是否在同一目錄下。")
     return data
 
-data = load_data()
+@st.cache_resource
+def load_optional_data(folder='.'):
+    """讀取延伸分析的結果檔 (選用，找不到時該頁面顯示提示，不影響主要分析)"""
+    current().miss()
+    return figures.read_optional_data(folder)
+
+def show_significance(axis, system='KIST'):
+    """顯示某分組方式的顯著性說明與達顯著的兩兩差異"""
+    pairs = figures.significant_pairs(optional_data, axis, system)
+    if pairs is None:
+        st.caption("提示：執行 significance.py 後，這裡會標記經檢定確認的顯著差異。")
+        return
+    st.caption(SIGNIFICANCE_NOTE)
+    with st.expander(f"查看達顯著的兩兩差異 ({len(pairs)} 組)"):
+        if pairs.empty:
+            st.write("沒有達顯著的兩兩差異。")
+        else:
+            st.dataframe(figures.pairs_table(pairs), use_container_width=True)
+
+@st.cache_resource
+def load_lod(folder, source):
+    """大型矩陣模式的 LodMatrix (分群與各層級的平均只在快取未命中時計算一次，所有連線共用)"""
+    current().miss()
+    if source == '教師':
+        return figures.teacher_lod(load_optional_data(folder)['kist_teachers'])
+    return figures.school_lod(load_data(folder)['kist_school'],
+                              figures.significant_indicators(load_optional_data(folder), '學校'))
+
+def zoom_to_selection(lod, view, chart_key, range_key):
+    """on_select 的回呼：放大到圖上框選/點選的列所涵蓋的範圍 (在頁面重新執行前更新範圍)"""
+    points = st.session_state[chart_key].selection.points
+    rows = sorted({int(round(p['y'])) for p in points if 'y' in p})
+    if rows:
+        st.session_state[range_key] = lod.zoom_range(view, rows)
+
+def show_lod_heatmap(source):
+    """
+    大型矩陣模式的熱力圖：全覽時顯示教育階段或分群的平均，框選或調整範圍放大後改顯示區段平均或個別的列
+    只有目前範圍內的格子會送到瀏覽器
+    """
+    with stage('dashboard.load_lod', folder=DATA_FOLDER, source=source) as s:
+        lod = s.cached(load_lod, DATA_FOLDER, source)
+    range_key = f'lod_range_{source}'
+    full_range = (0, lod.n_rows)
+    if range_key not in st.session_state or st.session_state[range_key][1] > lod.n_rows:
+        st.session_state[range_key] = full_range
+
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        st.slider(f"顯示範圍 (依教育階段與分群排序後的第幾{lod.unit})", 0, lod.n_rows, key=range_key)
+    with col2:
+        st.button("回到全覽", key=f'lod_reset_{source}',
+                  on_click=lambda: st.session_state.update({range_key: full_range}))
+
+    summary = SUMMARIES[0]
+    if lod.n_rows > MAX_VISIBLE_ROWS:
+        summary = st.radio("全覽時顯示：", SUMMARIES, horizontal=True, key=f'lod_summary_{source}')
+    start, end = st.session_state[range_key]
+    view = lod.view(start, max(end, start + 1), summary)
+    st.caption(f"目前層級：{view['level']} ({len(view['labels'])} 列，涵蓋第 {view['start'] + 1}–{view['end']} "
+               f"{lod.unit}，共 {lod.n_rows} {lod.unit})。在圖上框選或點選列即可放大到該範圍。")
+    # 圖表的 key 帶入範圍，放大後是新的圖表，不會殘留上一個範圍的選取
+    chart_key = f'lod_chart_{source}_{view["start"]}_{view["end"]}'
+    st.plotly_chart(lod.figure(view, title=f"各{lod.unit}教學力指標熱力圖 (數值越高越綠)"),
+                    use_container_width=True, key=chart_key, selection_mode=('box', 'points'),
+                    on_select=partial(zoom_to_selection, lod, view, chart_key, range_key))
+
+# 實際重新讀取資料時記錄讀取耗時；Streamlit 每次互動都會重跑整個頁面，
+# 命中快取的重跑不寫入紀錄，量測日誌才不會隨著使用次數無限增長
+# 兩個讀取函數使用同一個資料夾，確保頁面上的資料來自同一個版本
+DATA_FOLDER = data_folder()
+with stage('dashboard.load_data', folder=DATA_FOLDER) as s:
+    data = s.cached(load_data, DATA_FOLDER)
+    if not s.cache_misses:
+        s.discard()
+with stage('dashboard.load_optional_data', folder=DATA_FOLDER) as s:
+    optional_data = s.cached(load_optional_data, DATA_FOLDER)
+    if not s.cache_misses:
+        s.discard()
 
 if data:
     st.title("114-1 教師IDP教學力分析儀表板")
@@ -38,9 +118,11 @@ if data:
 
     # 側邊欄導航
     st.sidebar.header("分析維度選擇")
+    if DATA_FOLDER != '.':
+        st.sidebar.caption(f"資料版本: {os.path.basename(DATA_FOLDER)}")
     analysis_mode = st.sidebar.radio(
         "請選擇要查看的分析視角：",
-        ("KIST 標準分析", "樟湖指標分析")
+        PAGES
     )
 
     # ================= 頁面 1: KIST 標準體系分析 =================
@@ -49,100 +131,167 @@ if data:
         
         # 1. 總體表現概況
         st.subheader("1. 總體表現")
-        df_overall = data['kist_overall']
+        fig_top, fig_bot = figures.overall_bars(data['kist_overall'])
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("#### 高分指標 (Top 5)")
-            top5 = df_overall.sort_values(by='平均數', ascending=False).head(5)
-            fig_top = px.bar(top5, x='平均數', y=top5.index, orientation='h', 
-                             text_auto='.2f', title="平均分數最高的指標",
-                             color='平均數', color_continuous_scale='Greens')
-            fig_top.update_layout(yaxis={'categoryorder':'total ascending'})
             st.plotly_chart(fig_top, use_container_width=True)
             
         with col2:
             st.markdown("#### 待觀察指標 (Bottom 5)")
-            bot5 = df_overall.sort_values(by='平均數', ascending=True).head(5)
-            fig_bot = px.bar(bot5, x='平均數', y=bot5.index, orientation='h', 
-                             text_auto='.2f', title="平均分數較低的指標",
-                             color='平均數', color_continuous_scale='Reds_r')
-            fig_bot.update_layout(yaxis={'categoryorder':'total descending'})
             st.plotly_chart(fig_bot, use_container_width=True)
 
         st.markdown("---")
 
-        # 2. 校際比較
+        # 2. 校際比較 (熱力圖中組間差異達顯著的指標標上 ★)
         st.subheader("2. 校際比較")
-        df_school = data['kist_school']
-        
-        # 分離樣本數列與數據列
-        sample_sizes = df_school.loc[['有效樣本數 (N)']]
-        metrics_data = df_school.drop(['有效樣本數 (N)'], errors='ignore')
-        
-        # 展示樣本數
-        st.info("各校有效樣本數 (N)：" + ", ".join([f"{col}: {int(val)}" for col, val in sample_sizes.iloc[0].items()]))
-        
-        # 熱力圖
-        fig_heatmap = px.imshow(metrics_data, 
-                                text_auto='.1f',
-                                aspect="auto",
-                                color_continuous_scale="RdYlGn",
-                                title="各校教學力指標熱力圖 (數值越高越綠)")
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+        # 學校很多時預設改用大型矩陣模式 (也可以切換成教師層級的矩陣)
+        n_schools = data['kist_school'].shape[1]
+        large_matrix = st.toggle("大型矩陣模式 (WebGL 繪製，依顯示範圍切換教育階段/分群平均或個別列)",
+                                 value=n_schools > figures.LARGE_MATRIX_SCHOOLS)
+        if large_matrix:
+            sources = ['學校'] + (['教師'] if 'kist_teachers' in optional_data else [])
+            show_lod_heatmap(st.radio("矩陣的列：", sources, horizontal=True))
+        else:
+            sample_text, fig_heatmap, fig_dim = figures.school_comparison(
+                data['kist_school'], figures.significant_indicators(optional_data, '學校'))
+
+            # 展示樣本數
+            st.info(sample_text)
+            st.plotly_chart(fig_heatmap, use_container_width=True)
+
+            if fig_dim is not None:
+                st.plotly_chart(fig_dim, use_container_width=True)
+
+        show_significance('學校')
 
         st.markdown("---")
 
         # 3. 身份差異分析
         st.subheader("3. 身份/資歷差異")
-        df_role = data['kist_role']
-        
-        # 同樣分離樣本數
-        role_metrics = df_role.drop(['有效樣本數 (N)'], errors='ignore')
+        role_metrics = figures.role_metrics(data['kist_role'], figures.significant_indicators(optional_data, '身份'))
         
         # 讓使用者選擇要比較的身份
         roles = role_metrics.columns.tolist()
         selected_roles = st.multiselect("選擇要比較的身份：", roles, default=roles[:2])
         
         if selected_roles:
-            # 雷達圖比較 (如果指標太多，雷達圖會很亂，改用分組長條圖)
-            # 為了可讀性，我們只選取差異最大的前 10 個指標來畫圖
-            
-            # 計算選定角色的差異 (變異數)
-            role_metrics['variance'] = role_metrics[selected_roles].var(axis=1)
-            top_diff_metrics = role_metrics.sort_values('variance', ascending=False).head(10).index
-            
-            df_plot = role_metrics.loc[top_diff_metrics, selected_roles].reset_index().melt(id_vars='指標', var_name='身份', value_name='分數')
-            
-            fig_group = px.bar(df_plot, x='指標', y='分數', color='身份', barmode='group',
-                               title="不同身份在關鍵指標上的差異 (差異最大的前10項)", text_auto='.1f')
+            # 為了可讀性，只選取差異最大的前 10 個指標來畫圖
+            fig_group, role_table = figures.role_comparison(role_metrics, selected_roles)
             st.plotly_chart(fig_group, use_container_width=True)
             
             with st.expander("查看完整數據表"):
-                st.dataframe(role_metrics[selected_roles].style.highlight_max(axis=1, color='lightgreen'))
+                st.dataframe(role_table)
+
+        show_significance('身份')
 
     # ================= 頁面 2: 樟湖特色體系分析 =================
     elif analysis_mode == "樟湖指標分析":
         st.header("樟湖指標分析")
         
-        df_zh = data['zhanghu_overall']
+        n_teachers, zh_table, fig_zh = figures.zhanghu_overall(data['zhanghu_overall'])
         
         col1, col2 = st.columns([1, 2])
         
         with col1:
-            st.metric("分析教師人數", int(df_zh.iloc[0]['有效樣本數']))
+            st.metric("分析教師人數", n_teachers)
             st.markdown("### 指標總表")
-            st.dataframe(df_zh[['平均數', '標準差']].style.background_gradient(cmap='Greens'))
+            st.dataframe(zh_table)
             
         with col2:
             st.markdown("### 指標表現排序")
-            fig_zh = px.bar(df_zh.sort_values('平均數'), x='平均數', y=df_zh.index, orientation='h',
-                            text_auto='.2f', color='平均數', color_continuous_scale='Teal')
-            fig_zh.update_layout(height=600)
             st.plotly_chart(fig_zh, use_container_width=True)
             
         st.info("註：樟湖體系採用獨立的校本指標（如：生態哲學、人文關懷），因此獨立呈現分析結果。")
 
+    # ================= 頁面: 因素分析 =================
+    elif analysis_mode == "因素分析":
+        st.header("因素分析")
+
+        if 'factor_summary' not in optional_data:
+            st.info("尚未產生因素分析結果，請先執行 factor.py。")
+        else:
+            system = st.radio("體系：", figures.factor_systems(optional_data), horizontal=True)
+            factors, caption, summary_table, fig_load = figures.factor_overview(optional_data, system)
+
+            # 1. 潛在因素概況
+            st.subheader("1. 潛在因素")
+            st.caption(caption)
+            st.dataframe(summary_table, hide_index=True, use_container_width=True)
+
+            # 2. 負荷量熱力圖
+            st.subheader("2. 指標負荷量")
+            st.plotly_chart(fig_load, use_container_width=True)
+
+            # 3. 各組平均因素分數
+            st.subheader("3. 各組因素分數")
+            group_label = st.radio("分組方式：", ("學校", "身份"), horizontal=True, key='factor_group')
+            st.plotly_chart(figures.factor_group_scores(optional_data, system, factors, group_label),
+                            use_container_width=True)
+
+    # ================= 頁面 3: 發展目標文字分析 =================
+    elif analysis_mode == "發展目標文字分析":
+        st.header("發展目標文字分析")
+
+        if 'text_keywords' not in optional_data:
+            st.info("尚未產生文字分析結果，請先執行 textanalyze.py。")
+        else:
+            # 1. 追蹤關鍵詞提及人數
+            st.subheader("1. 關鍵詞提及人數")
+            df_kw = optional_data['text_keywords']
+            st.plotly_chart(figures.keyword_overall(df_kw), use_container_width=True)
+
+            group_label = st.radio("分組方式：", ("學校", "身份"), horizontal=True)
+            st.plotly_chart(figures.keyword_groups(df_kw, group_label), use_container_width=True)
+
+            st.markdown("---")
+
+            # 2. 各校/各身份關鍵詞
+            st.subheader("2. 各校與各身份關鍵詞")
+            col1, col2 = st.columns(2)
+            for col, key, label, group_col in [(col1, 'text_terms_school', '學校', 'School_Name'),
+                                               (col2, 'text_terms_role', '身份', 'Role_Tag')]:
+                with col:
+                    if key in optional_data:
+                        df_terms = optional_data[key]
+                        choice = st.selectbox(f"選擇{label}：", sorted(df_terms[group_col].unique()), key=key)
+                        st.dataframe(figures.top_terms(df_terms, group_col, choice), hide_index=True)
+
+            # 3. 相似目標分群
+            if 'text_clusters' in optional_data:
+                st.markdown("---")
+                st.subheader("3. 相似發展目標分群")
+                st.dataframe(optional_data['text_clusters'], hide_index=True)
+
+    # ================= 頁面 4: 教師個人百分位 =================
+    elif analysis_mode == "教師個人百分位":
+        st.header("教師個人百分位")
+
+        if 'percentiles' not in optional_data:
+            st.info("尚未產生百分位資料，請先執行 percentile.py。")
+        else:
+            df_pct = optional_data['percentiles']
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                system = st.selectbox("體系：", df_pct['體系'].unique())
+            df_sys = df_pct[df_pct['體系'] == system]
+            with col2:
+                school = st.selectbox("學校：", sorted(df_sys['School_Name'].dropna().unique()))
+            df_school_pct = df_sys[df_sys['School_Name'] == school]
+            with col3:
+                teacher = st.selectbox("教師：", df_school_pct['教師姓名'].dropna().unique())
+
+            axes = figures.percentile_axes(df_pct)
+            axis = st.radio("比較群組：", axes, horizontal=True)
+
+            df_teacher = df_school_pct[df_school_pct['教師姓名'] == teacher].sort_values(f'{axis}_百分位')
+            st.plotly_chart(figures.percentile_chart(df_teacher, axis, teacher), use_container_width=True)
+
+            with st.expander("查看完整數據表"):
+                st.dataframe(df_teacher[figures.percentile_columns(axes)], hide_index=True)
+
 else:
     st.warning("請確認 CSV 檔案已放置於正確路徑。")
\ No newline at end of file
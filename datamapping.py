@@ -2,12 +2,28 @@ import pandas as pd
 import os
 import re
 import glob
+import zipfile
+import tempfile
+
+from instrument import stage, instrumented
 
 # =================設定區=================
 # 資料夾路徑 (請確保您的 CSV 檔案都放在這個資料夾內)
 SOURCE_FOLDER = '/Users/xian/R project/114-1IDP' 
 # 輸出的檔案名稱
 OUTPUT_FILENAME = '114_IDP_Master_Merged.csv'
+# 可直接讀取的來源格式 (.zip 內的 .csv / .csv.gz / .xlsx 會直接從壓縮檔串流讀取，不解壓到磁碟)
+SOURCE_PATTERNS = ['*.csv', '*.csv.gz', '*.xlsx', '*.zip']
+# 流程本身產生的輸出檔 (與原始匯出檔放在同一個資料夾時，不可再被當成來源讀入)
+# OUTPUT_FILENAME 本身一律排除；其餘為各腳本設定區的預設輸出檔名與檔名開頭
+GENERATED_FILES = ['_Teaching_Ability_Quantified.csv', '114_Teaching_Ability_Quantified.csv',
+                   '114_Teaching_Analysis_Report.csv', '114_IDP_Demographics_Report_v2.xlsx',
+                   'Zhanghu_Overall_Stats.csv', 'Zhanghu_Dimension_Stats.csv',
+                   'Teacher_Percentiles.csv', 'Peer_Mentor_Suggestions.csv']
+GENERATED_PREFIXES = ['Analysis_', '1_KIST_', '2_KIST_', '3_KIST_', '4_KIST_', '1_Zhanghu_',
+                      'Significance_', 'Factor_', 'Dimension_', 'Text_']
+# 檔名判斷不出學校時改用表單的「學校」欄；欄位值包含這些完整校名時統一成該校名 (例如「花蓮三民國小」-> 三民國小)
+KNOWN_SCHOOLS = ['三民國小', '三民國中', '仙草實小', '樟湖生態國中小', '坪林實中', '老梅實小', '拯民國小', '峨眉國中']
 # =======================================
 
 def extract_metadata_from_filename(filename):
@@ -42,6 +58,120 @@ def extract_metadata_from_filename(filename):
     
     return school, role
 
+def school_from_column(df):
+    """
+    由表單的「學校」欄判斷學校 (檔名判斷不出學校時使用)
+    整份表單只填了一所學校時才採用，否則回傳 "Unknown"
+    """
+    if '學校' not in df.columns:
+        return "Unknown"
+    names = df['學校'].dropna().astype(str).str.strip()
+    names = names[names != ''].unique()
+    if len(names) != 1:
+        return "Unknown"
+    return next((school for school in KNOWN_SCHOOLS if school in names[0]), names[0])
+
+def source_kind(name):
+    """來源格式：'csv'、'csv.gz'、'xlsx' 或 None (不支援的檔案)"""
+    lower = name.lower()
+    for kind in ['csv.gz', 'csv', 'xlsx']:
+        if lower.endswith('.' + kind):
+            return kind
+    return None
+
+def is_junk_member(name):
+    """壓縮檔中的系統檔 (macOS 的 __MACOSX、隱藏檔、Excel 暫存檔 ~$xxx.xlsx)"""
+    basename = os.path.basename(name)
+    return name.startswith('__MACOSX/') or basename.startswith('.') or basename.startswith('~$')
+
+def is_generated_output(path):
+    """流程產生的輸出檔 (合併總表、量化檔、分流檔、統計結果、Excel 報表等)，不是原始匯出檔"""
+    basename = os.path.basename(path)
+    if basename == os.path.basename(OUTPUT_FILENAME) or basename in GENERATED_FILES:
+        return True
+    return any(basename.startswith(prefix) for prefix in GENERATED_PREFIXES)
+
+def iter_sources(folder):
+    """
+    依序產生資料夾中每個來源的 (來源名稱, 壓縮檔名稱或 None, 開啟函數)
+    開啟函數每次呼叫都回傳一個新的二進位串流 (編碼判斷失敗時可以重新讀取)
+    """
+    paths = sorted({p for pattern in SOURCE_PATTERNS for p in glob.glob(os.path.join(folder, pattern))})
+    for path in paths:
+        if is_junk_member(os.path.basename(path)) or is_generated_output(path):
+            continue
+        yield from iter_path_sources(path)
+
+def iter_path_sources(path, display_name=None):
+    """
+    單一檔案的來源：一般檔案就是它自己；zip 內的檔案以 ZipFile.open 直接串流，
+    壓縮檔在它的所有檔案讀完後才關閉。display_name 為紀錄在 Source_File 的名稱 (預設為檔名)
+    """
+    basename = display_name or os.path.basename(path)
+    if not path.lower().endswith('.zip'):
+        yield basename, None, (lambda p=path: open(p, 'rb'))
+        return
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        # 損毀的壓縮檔仍以一個來源交給呼叫端：開啟時丟出同一個錯誤，與其他讀取失敗的來源一樣計入失敗
+        def broken(error=e):
+            raise error
+        yield basename, None, broken
+        return
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or is_junk_member(info.filename) or source_kind(info.filename) is None:
+                continue
+            yield f"{basename}/{info.filename}", basename, (lambda i=info: archive.open(i))
+
+def read_xlsx(stream):
+    """
+    以 openpyxl 的唯讀模式逐列讀取第一個工作表 (Google 表單匯出的格式：第一列為題目)
+    唯讀模式不會把整本活頁簿載入記憶體
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        # 與 read_csv 相同的欄名規則：空白欄名 -> Unnamed: i，重複欄名加上 .1、.2
+        columns, seen = [], {}
+        for i, h in enumerate(header):
+            name = f'Unnamed: {i}' if h is None or str(h).strip() == '' else str(h)
+            if name in seen:
+                seen[name] += 1
+                name = f'{name}.{seen[name]}'
+            else:
+                seen[name] = 0
+            columns.append(name)
+        df = pd.DataFrame.from_records(rows, columns=columns)
+    finally:
+        workbook.close()
+    # 試算表常有格式化過但沒有內容的空白列
+    return df.dropna(how='all').reset_index(drop=True).infer_objects()
+
+def read_source(name, opener):
+    """
+    讀取單一來源，回傳 (DataFrame, 編碼)
+    CSV 先嘗試 utf-8，若失敗則嘗試 big5/cp950，這是中文csv常見問題
+    """
+    kind = source_kind(name)
+    if kind == 'xlsx':
+        with opener() as stream:
+            return read_xlsx(stream), 'xlsx'
+
+    compression = 'gzip' if kind == 'csv.gz' else None
+    try:
+        with opener() as stream:
+            return pd.read_csv(stream, encoding='utf-8', compression=compression), 'utf-8'
+    except UnicodeDecodeError:
+        with opener() as stream:
+            return pd.read_csv(stream, encoding='cp950', compression=compression), 'cp950'
+
 def clean_column_name(col_name):
     """
     關鍵函數：清洗欄位名稱以實現跨校對齊
@@ -59,69 +189,108 @@ def clean_column_name(col_name):
     # 3. 移除額外的空白
     return name.strip()
 
+def tag_source(df, source_name, archive=None):
+    """
+    在讀入的表單前面加上 Source_File / Role_Tag / School_Name，並清洗欄位名稱 (就地修改)
+    回傳 (學校, 角色)
+    """
+    # 提取並新增 Metadata 欄位 (壓縮檔內的檔名沒有學校時，改用壓縮檔名稱判斷，再不行才看表單的「學校」欄)
+    school, role = extract_metadata_from_filename(source_name)
+    if school == "Unknown" and archive:
+        school, _ = extract_metadata_from_filename(archive)
+    if school == "Unknown":
+        school = school_from_column(df)
+
+    # 為了避免欄位順序混亂，我們把 Metadata 放在最前面
+    df.insert(0, 'Source_File', source_name)
+    df.insert(1, 'Role_Tag', role)
+    df.insert(2, 'School_Name', school)
+
+    # 欄位名稱清洗 (對齊關鍵)
+    new_cols = {}
+    for c in df.columns:
+        # 保留我們剛加的 Metadata 欄位，不清洗
+        if c in ['School_Name', 'Role_Tag', 'Source_File', '教師姓名', '教師信箱', '學校', '職位', '科目', '提交時間']:
+            new_cols[c] = c
+        else:
+            new_cols[c] = clean_column_name(c)
+
+    df.rename(columns=new_cols, inplace=True)
+    return school, role
+
+def write_atomic(path, write_func):
+    """
+    先寫到同一資料夾的暫存檔，完成後再以 os.replace 換上 (同一檔案系統上為原子操作)
+    讀取的人只會看到舊檔或完整的新檔，不會讀到寫到一半的檔案
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write_func(tmp_path)
+        # mkstemp 建立的檔案只有擁有者可讀，換上前改回一般檔案的權限
+        os.chmod(tmp_path, 0o644)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@instrumented('datamapping')
 def main():
     # 檢查資料夾是否存在
     if not os.path.exists(SOURCE_FOLDER):
         print(f"錯誤: 找不到資料夾 '{SOURCE_FOLDER}'，請確認路徑。")
         return
 
-    # 搜尋所有 CSV 檔案
-    csv_files = glob.glob(os.path.join(SOURCE_FOLDER, "*.csv"))
-    
-    if not csv_files:
-        print(f"在 '{SOURCE_FOLDER}' 中找不到任何 CSV 檔案。")
-        return
-
-    print(f"找到 {len(csv_files)} 個 CSV 檔案，開始處理...")
+    print(f"開始讀取 '{SOURCE_FOLDER}' 中的 CSV / XLSX / ZIP 檔案...")
     
     all_dfs = []
-    
-    for file_path in csv_files:
-        try:
-            # 讀取 CSV (嘗試 utf-8，若失敗則嘗試 big5/cp950，這是中文csv常見問題)
+    fallback_files = 0
+    failed_files = 0
+
+    with stage('datamapping.read') as s:
+        for source_name, archive, opener in iter_sources(SOURCE_FOLDER):
             try:
-                df = pd.read_csv(file_path, encoding='utf-8')
-            except UnicodeDecodeError:
-                df = pd.read_csv(file_path, encoding='cp950')
-            
-            # 提取並新增 Metadata 欄位
-            school, role = extract_metadata_from_filename(file_path)
+                df, encoding = read_source(source_name, opener)
+                if encoding == 'cp950':
+                    fallback_files += 1
+                s.input(df)
             
-            # 為了避免欄位順序混亂，我們把 Metadata 放在最前面
-            df.insert(0, 'Source_File', os.path.basename(file_path))
-            df.insert(1, 'Role_Tag', role)
-            df.insert(2, 'School_Name', school)
+                school, role = tag_source(df, source_name, archive)
             
-            # 欄位名稱清洗 (對齊關鍵)
-            original_cols = df.columns.tolist()
-            new_cols = {}
-            for c in original_cols:
-                # 保留我們剛加的 Metadata 欄位，不清洗
-                if c in ['School_Name', 'Role_Tag', 'Source_File', '教師姓名', '教師信箱', '學校', '職位', '科目', '提交時間']:
-                    new_cols[c] = c
-                else:
-                    new_cols[c] = clean_column_name(c)
+                all_dfs.append(df)
+                print(f"成功讀取: {source_name} (學校: {school}, 角色: {role})")
             
-            df.rename(columns=new_cols, inplace=True)
-            
-            all_dfs.append(df)
-            print(f"成功讀取: {os.path.basename(file_path)} (學校: {school}, 角色: {role})")
-            
-        except Exception as e:
-            print(f"讀取失敗: {file_path}, 原因: {e}")
+            except Exception as e:
+                failed_files += 1
+                print(f"讀取失敗: {source_name}, 原因: {e}")
+
+        s.note(files=len(all_dfs) + failed_files, cp950_files=fallback_files, failed_files=failed_files)
+
+    if not all_dfs and failed_files == 0:
+        print(f"在 '{SOURCE_FOLDER}' 中找不到任何 CSV / XLSX / ZIP 檔案。")
+        return
 
     # 合併所有 DataFrames
     if all_dfs:
         # 使用 outer join 保留所有欄位，自動對齊相同名稱的欄位
-        master_df = pd.concat(all_dfs, axis=0, ignore_index=True, sort=False)
+        with stage('datamapping.concat') as s:
+            master_df = s.output(pd.concat(all_dfs, axis=0, ignore_index=True, sort=False))
         
         # 儲存結果
-        master_df.to_csv(OUTPUT_FILENAME, index=False, encoding='utf-8-sig')
+        with stage('datamapping.write') as s:
+            s.input(master_df)
+            write_atomic(OUTPUT_FILENAME, lambda path: master_df.to_csv(path, index=False, encoding='utf-8-sig'))
         print("-" * 30)
         print(f"合併完成！")
         print(f"總資料筆數: {len(master_df)}")
         print(f"總欄位數: {len(master_df.columns)}")
         print(f"檔案已輸出至: {OUTPUT_FILENAME}")
+        if failed_files:
+            print(f"注意: 有 {failed_files} 個來源讀取失敗，未併入總表 (原因見上方的「讀取失敗」訊息)")
         
         # 簡單檢查：列出幾個合併後的關鍵欄位，確認是否有對齊
         print("\n[檢查] 合併後的部分教學力指標欄位 (前10個):")
@@ -0,0 +1,231 @@
+import pandas as pd
+import numpy as np
+import os
+
+from TAQ import extract_score
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (datamapping 合併後的總表；領導力 5P 只存在於此)
+INPUT_FILENAME = '114_IDP_Master_Merged.csv'
+
+# 輸出檔名
+OUT_TEACHER = 'Dimension_Scores_Teacher.csv'
+OUT_SCHOOL = 'Dimension_School_Comparison.csv'
+OUT_ROLE = 'Dimension_Role_Comparison.csv'
+
+# 指標階層：框架 -> 面向 -> 指標
+# 指標可寫成清單 (權重皆為 1)，或 {指標: 權重} 指定權重；欄位名稱需與清洗後的欄位完全相同
+INDICATOR_HIERARCHY = {
+    'KIST 教學力': {
+        '面向 1：班級社群和文化': ['給每一個學生機會和期待', '維護公平合理的學習狀態', '建立融合的學習氛圍',
+                          '創造學習的樂趣', '打造安心無畏的空間'],
+        '面向 2：重要學習內容': ['校準課程體驗和學習目標', '掌握課程節奏', '力求課程嚴謹', '進行差異化和個人化處遇'],
+        '面向 3：學生積極主動性': ['善用提問的力量', '引導討論和對話', '拉伸學生的思考和聲音',
+                          '激發學生對學習的主動性和責任感', '拉高學生對內容的概念化理解'],
+        '面向 4：呈現學習進度': ['提供嚴謹的學習任務', '收集學習數據', '做好數據驅動的教學決定',
+                         '給出有目的性的回饋', '設計差異化的課堂'],
+    },
+    '樟湖 教學力': {
+        '1.自我與他人的關係': ['以生態哲學建立「人文關懷」的基礎', '以正向溫暖進行溝通', '培養成長心態',
+                        '保持情緒穩定', '包容差異', '主動積極'],
+        '2.班級社群和文化': ['給每一個學生機會和期待', '維護公平合理的學習狀態', '建立融合的學習氛圍',
+                       '創造學習的樂趣', '打造安心無畏的空間'],
+        '3.重要學習內容': ['校準課程體驗和學習目標', '掌握課程節奏與教學方法', '力求課程嚴謹',
+                      '進行差異化和個人化處遇', '能蒐集學習數據，驅動教學改變', '培養學生主動積極性'],
+        '4.知識': ['依照學生程度擬定教學計畫', '學科核心概念與學科地圖的熟捻',
+                 '能有計畫的夯實學生基礎知識能力', '培養學生多元觀點'],
+    },
+    # 各校領導力表單的題目寫法不同 (如樟湖版加上【策略思維】)，同一個 P 的不同寫法合併計算
+    '領導力 5P': {
+        '以終為始 Purpose': ['以終為始 Purpose', '以終為始 Purpose【策略思維】'],
+        '關鍵路徑 Path': ['關鍵路徑 Path', '關鍵路徑 Path【規劃執行力】'],
+        '要事第一 Priority': ['要事第一 Priority', '要事第一 Priority【資源管理】'],
+        '以身作則 Pinnacle': ['以身作則 Pinnacle', '以身作則 Pinnacle【以身作則】'],
+        '發展人才 People': ['發展人才 People', '發展人才 People【團隊與發展】'],
+    },
+}
+
+# 只屬於某個體系的框架 (框架 -> 體系)；兩個體系的教學力框架有同名指標，
+# 指定 system 彙整時只使用該體系的框架 (未列出的框架如領導力 5P 適用所有體系)
+FRAMEWORK_SYSTEMS = {
+    'KIST 教學力': 'KIST',
+    '樟湖 教學力': '樟湖',
+}
+
+# 面向 -> 框架 的權重 (未列出的面向權重為 1)
+DIMENSION_WEIGHTS = {}
+
+# 框架總分至少要有多少比例 (依權重) 的面向有分數才計算，避免只填部分題目的教師
+# (例如 KIST 教師只有與樟湖共用的題目) 得到不完整的框架總分
+MIN_FRAMEWORK_COVERAGE = 0.75
+
+# 報表中面向/框架列的前綴，讓它們與一般指標列區分開來
+DIMENSION_PREFIX = '[面向] '
+FRAMEWORK_PREFIX = '[總分] '
+
+META_COLS = ['School_Name', 'Role_Tag', '教師姓名', '職位', '科目', 'Source_File']
+# =========================================
+
+
+def _items(indicators):
+    """清單或 {指標: 權重} -> [(指標, 權重)]"""
+    if isinstance(indicators, dict):
+        return list(indicators.items())
+    return [(name, 1.0) for name in indicators]
+
+
+def system_hierarchy(system, hierarchy=None):
+    """某個體系適用的框架：該體系自己的框架 + 不屬於特定體系的框架；system 為 None 時為全部框架"""
+    hierarchy = INDICATOR_HIERARCHY if hierarchy is None else hierarchy
+    if system is None:
+        return hierarchy
+    return {fw: dims for fw, dims in hierarchy.items() if FRAMEWORK_SYSTEMS.get(fw, system) == system}
+
+
+def build_weight_matrices(indicator_cols, hierarchy=None, system=None):
+    """
+    依照現有的指標欄位建立兩個權重矩陣
+    W_dim: (指標 × 面向)、W_fw: (面向 × 框架)
+    完全沒有對應欄位的框架會被略過；框架內缺欄位的面向仍保留 (分數為 NaN)，
+    這樣框架總分的涵蓋率才會以完整的面向數計算
+    system: 只使用該體系適用的框架 (見 FRAMEWORK_SYSTEMS)
+    """
+    hierarchy = system_hierarchy(system, hierarchy)
+    indicator_cols = list(indicator_cols)
+    position = {c: i for i, c in enumerate(indicator_cols)}
+
+    dim_columns, fw_links = [], []
+    for framework, dimensions in hierarchy.items():
+        framework_columns = []
+        for dimension, indicators in dimensions.items():
+            weights = np.zeros(len(indicator_cols))
+            for name, w in _items(indicators):
+                if name in position:
+                    weights[position[name]] = w
+            framework_columns.append((dimension, weights))
+        if any(weights.any() for _, weights in framework_columns):
+            dim_columns.extend(framework_columns)
+            fw_links.extend((framework, dimension) for dimension, _ in framework_columns)
+
+    dim_names = [name for name, _ in dim_columns]
+    W_dim = pd.DataFrame(np.column_stack([w for _, w in dim_columns]) if dim_columns
+                         else np.zeros((len(indicator_cols), 0)),
+                         index=indicator_cols, columns=dim_names)
+
+    fw_names = list(dict.fromkeys(fw for fw, _ in fw_links))
+    W_fw = pd.DataFrame(0.0, index=dim_names, columns=fw_names)
+    for j, (framework, dimension) in enumerate(fw_links):
+        W_fw.iloc[j, fw_names.index(framework)] = DIMENSION_WEIGHTS.get(dimension, 1.0)
+    return W_dim, W_fw
+
+
+def weighted_nanmean(values, weights, min_coverage=0.0):
+    """
+    忽略缺值的加權平均：values (n × d)、weights (d × k) -> (n × k)
+    把「補零後的分數」與「填答遮罩」上下疊成一個矩陣，只做一次矩陣乘法
+    min_coverage: 有分數的權重佔該欄總權重的最低比例，不足時為 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    observed = ~np.isnan(values)
+    stacked = np.vstack([np.where(observed, values, 0.0), observed.astype(np.float64)])
+    weights = np.asarray(weights, dtype=np.float64)
+    product = stacked @ weights
+    total, weight_sum = product[:len(values)], product[len(values):]
+    enough = (weight_sum > 0) & (weight_sum >= min_coverage * weights.sum(axis=0)[None, :] - 1e-12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(enough, total / weight_sum, np.nan)
+
+
+def rollup(df, indicator_cols=None, hierarchy=None, system=None):
+    """
+    計算每一列 (教師或組別平均) 的面向分數與框架總分
+    回傳的欄位依序為各面向，再接各框架總分；system 指定體系時只彙整該體系適用的框架
+    """
+    if indicator_cols is None:
+        indicator_cols = [c for c in df.columns if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+    W_dim, W_fw = build_weight_matrices(indicator_cols, hierarchy, system)
+
+    dims = weighted_nanmean(df[list(indicator_cols)].to_numpy(dtype=np.float64), W_dim.to_numpy())
+    frameworks = weighted_nanmean(dims, W_fw.to_numpy(), MIN_FRAMEWORK_COVERAGE)
+    return pd.concat([pd.DataFrame(dims, index=df.index, columns=W_dim.columns),
+                      pd.DataFrame(frameworks, index=df.index, columns=W_fw.columns)], axis=1)
+
+
+def rollup_report_rows(means, hierarchy=None, system=None):
+    """
+    把「指標 × 組別」的平均數表 (如 KSanalyze 的校際比較) 往上彙整成面向與框架列
+    回傳的列名加上 DIMENSION_PREFIX / FRAMEWORK_PREFIX，可直接接在原報表下方 (全空的列會移除)
+    """
+    rolled = rollup(means.T, list(means.index), hierarchy, system).T.dropna(how='all')
+    W_dim, _ = build_weight_matrices(means.index, hierarchy, system)
+    rolled.index = [(DIMENSION_PREFIX if name in W_dim.columns else FRAMEWORK_PREFIX) + name
+                    for name in rolled.index]
+    return rolled
+
+
+def group_rollup(df, group_col, indicator_cols, hierarchy=None, system=None):
+    """
+    各組的面向/框架分數：先以組別指示矩陣的乘法算出各組指標平均，再一次往上彙整
+    """
+    values = df[indicator_cols].to_numpy(dtype=np.float64)
+    codes, groups = pd.factorize(df[group_col], sort=True)
+    G = np.zeros((len(groups), len(df)))
+    G[codes[codes >= 0], np.flatnonzero(codes >= 0)] = 1.0
+
+    group_means = pd.DataFrame(_group_nanmean(values, G), index=groups, columns=indicator_cols)
+    counts = pd.Series(G.sum(axis=1).astype(int), index=groups, name='有效樣本數 (N)')
+    return pd.concat([counts, rollup(group_means, indicator_cols, hierarchy, system)], axis=1)
+
+
+def _group_nanmean(values, G):
+    """(組別 × 教師) 指示矩陣 G 下的各組指標平均 (忽略缺值)"""
+    observed = ~np.isnan(values)
+    total = G @ np.where(observed, values, 0.0)
+    count = G @ observed.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+@instrumented('dimension')
+def main():
+    # 1. 讀取合併後的總表
+    if not os.path.exists(INPUT_FILENAME):
+        print(f"錯誤: 找不到檔案 '{INPUT_FILENAME}'，請先執行 datamapping 合併步驟。")
+        return
+
+    print(f"正在讀取 {INPUT_FILENAME} ...")
+    df = pd.read_csv(INPUT_FILENAME)
+
+    # 2. 只量化階層中用到的指標欄位
+    wanted = {name for dims in INDICATOR_HIERARCHY.values()
+              for indicators in dims.values() for name, _ in _items(indicators)}
+    indicator_cols = [c for c in df.columns if c in wanted]
+    print(f"階層設定涵蓋 {len(wanted)} 個指標，其中 {len(indicator_cols)} 個出現在總表中。")
+    with stage('dimension.quantify') as s:
+        for col in indicator_cols:
+            df[col] = pd.to_numeric(df[col].map(extract_score), errors='coerce')
+        s.output(df[indicator_cols])
+
+    # 3. 每位教師的面向/框架分數
+    with stage('dimension.rollup') as s:
+        scores = s.output(rollup(s.input(df[indicator_cols]), indicator_cols))
+    meta = df[[c for c in META_COLS if c in df.columns]]
+    teacher_table = pd.concat([meta, scores], axis=1)
+    teacher_table.to_csv(OUT_TEACHER, index=False, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_TEACHER} ({len(scores.columns)} 個面向/框架)")
+
+    # 4. 各校/各身份的面向/框架分數
+    for group_col, filename in [('School_Name', OUT_SCHOOL), ('Role_Tag', OUT_ROLE)]:
+        if group_col in df.columns:
+            report = group_rollup(df, group_col, indicator_cols).T
+            report.to_csv(filename, encoding='utf-8-sig')
+            print(f"-> 已輸出: {filename}")
+
+    print("\n【各框架全聯盟平均】")
+    _, W_fw = build_weight_matrices(indicator_cols)
+    print(scores[W_fw.columns].mean().round(2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,717 @@
+import os
+import json
+import html
+import shutil
+import hashlib
+import argparse
+import tempfile
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import figures
+from figures import PAGES, SIGNIFICANCE_NOTE
+from inbox import read_current, snapshot_folder
+from instrument import stage, instrumented
+
+# 把儀表板的每個頁面預先產生成靜態網站 (HTML + JSON + plotly.js)，放在任何靜態檔案伺服器上即可瀏覽，
+# 觀看人數再多也不需要為每個人執行 Python：
+#
+#   dashboard_static/index.html          所有頁面的版面、切換頁面與篩選的程式 (在瀏覽器執行)
+#   dashboard_static/plotly.min.js       圖表函式庫 (隨 plotly 套件附帶，不需連網)
+#   dashboard_static/data/<頁面>.json     該頁面所有圖表 (plotly 圖表 JSON) 與表格 (HTML)，切換到該頁時才下載
+#   dashboard_static/data/percentile/<體系>/<學校>.json   該校教師的個人百分位，選到該校時才下載
+#   dashboard_static/manifest.json       資料來源與指紋
+#
+# 圖表與表格由 figures.py 產生，與 Streamlit 儀表板的內容相同。有篩選的頁面把常用的組合都預先產生好
+# (身份比較的身份組合、因素分析的體系 × 分組方式、各校/各身份關鍵詞)；
+# 教師個人百分位的教師數多，只輸出每位教師的百分位數字 (依學校分片)，再由瀏覽器套用預先產生的圖表樣板
+#
+# 瀏覽器不允許 file:// 網頁讀取 JSON，請以靜態檔案伺服器提供，例如：
+#   python -m http.server -d dashboard_static 8000
+
+# ================= 設定區 =================
+# 輸出資料夾 (整個資料夾會被換成新產生的內容)
+OUTPUT_FOLDER = 'dashboard_static'
+# 分析結果所在的資料夾；None 代表與儀表板相同 (總表庫目前含分析結果的版本，否則為目前目錄)
+DATA_FOLDER = None
+# 身份數不超過這個數時預先產生所有身份組合 (2^n - 1 種)；超過時只產生單一身份與兩兩比較
+ROLE_COMBINATION_LIMIT = 6
+PAGE_TITLE = "114學年度 教師IDP教學力分析儀表板"
+# =========================================
+
+# 匯出格式或頁面內容有變動時遞增，讓輸入未變更的舊匯出也會重新產生
+FORMAT_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+PLOTLY_JS = 'plotly.min.js'
+# 分片檔名中要換掉的字元 (路徑分隔字元、Windows 不允許的字元與在網址中有特殊意義的字元)
+SHARD_UNSAFE_CHARS = set('/\\:*?"<>|#%')
+PAGE_IDS = dict(zip(PAGES, ['kist', 'zhanghu', 'factor', 'text', 'percentile']))
+
+
+def data_folder():
+    """與 dashboard 相同的資料夾選擇"""
+    return DATA_FOLDER or snapshot_folder(read_current(), key='analysis_snapshot') or '.'
+
+
+def source_fingerprint(folder):
+    """各結果檔的 (檔名, 大小, 修改時間) 與匯出格式版本的雜湊；內容未變更時不必重新匯出"""
+    h = hashlib.sha256(f'format={FORMAT_VERSION}'.encode())
+    for filename in sorted({*figures.DATA_FILES.values(), *figures.OPTIONAL_FILES.values()}):
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            info = os.stat(path)
+            h.update(f'{filename}|{info.st_size}|{info.st_mtime_ns}\n'.encode())
+    return h.hexdigest()
+
+
+def table_html(table, hide_index=False):
+    """
+    DataFrame 或 Styler -> HTML 表格 (缺值顯示為空白)
+    Styler 不會跳脫儲存格內容，而表格是以 innerHTML 放進頁面：文字欄與列/欄標籤一律以 HTML 跳脫
+    (數值欄保留原本的格式)
+    """
+    styler = table if not isinstance(table, pd.DataFrame) else table.style.format(precision=2, na_rep='')
+    text_cols = [c for c in styler.data.columns if not pd.api.types.is_numeric_dtype(styler.data[c])]
+    if text_cols:
+        styler = styler.format(subset=text_cols, na_rep='', escape='html')
+    styler = styler.format_index(escape='html', axis=0).format_index(escape='html', axis=1)
+    if hide_index:
+        styler = styler.hide(axis='index')
+    return styler.set_table_attributes('class="table"').to_html()
+
+
+def esc(text):
+    return html.escape(str(text))
+
+
+class Page:
+    """一個頁面的版面 (HTML) 與資料 (圖表 / 表格)"""
+
+    def __init__(self, page_id):
+        self.id = page_id
+        self.parts = []
+        self.figures = {}
+        self.tables = {}
+        # plotly 的外觀樣板 (layout.template) 每張圖都相同且佔圖表 JSON 的大部分，每頁只存一份
+        self.templates = {}
+        # 頁面專用的其他資料 (教師個人百分位)
+        self.extra = {}
+        # 另外寫成分片檔、需要時才下載的資料 {data/ 下的相對路徑: 內容}
+        self.files = {}
+
+    def add(self, markup):
+        self.parts.append(markup)
+
+    def fig_json(self, fig):
+        """圖表 JSON，layout.template 換成樣板的雜湊鍵 (瀏覽器繪圖前再換回來)"""
+        spec = json.loads(fig.to_json())
+        template = spec['layout'].pop('template', None)
+        if template is not None:
+            key = hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()[:12]
+            self.templates[key] = template
+            spec['layout']['template'] = key
+        return spec
+
+    def figure(self, key, fig, empty=''):
+        """
+        圖表位置；key 可包含 {控制項名稱}，瀏覽器會代入目前選取的值再找對應的圖表
+        fig 為 {key: 圖表}，一次登錄這個位置所有可能的圖表
+        """
+        self.figures.update({k: self.fig_json(v) for k, v in fig.items()})
+        self.add(f'<div class="plot" data-fig="{esc(key)}" data-empty="{esc(empty)}"></div>')
+
+    def table(self, key, tables, empty=''):
+        self.tables.update(tables)
+        self.add(f'<div class="table-wrap" data-html="{esc(key)}" data-empty="{esc(empty)}"></div>')
+
+    def radio(self, name, label, options, checked=None):
+        checked = options[0] if checked is None else checked
+        items = ''.join(f'<label><input type="radio" name="{esc(name)}" value="{esc(o)}"'
+                        f'{" checked" if o == checked else ""}> {esc(o)}</label>' for o in options)
+        self.add(f'<div class="control"><span>{esc(label)}</span>{items}</div>')
+
+    def checkboxes(self, name, label, options, checked):
+        items = ''.join(f'<label><input type="checkbox" name="{esc(name)}" value="{esc(o)}"'
+                        f'{" checked" if o in checked else ""}> {esc(o)}</label>' for o in options)
+        self.add(f'<div class="control"><span>{esc(label)}</span>{items}</div>')
+
+    def select(self, name, label, options):
+        items = ''.join(f'<option value="{esc(o)}">{esc(o)}</option>' for o in options)
+        self.add(f'<div class="control"><span>{esc(label)}</span><select name="{esc(name)}">{items}</select></div>')
+
+    def data(self):
+        return {'figures': self.figures, 'html': self.tables, 'templates': self.templates, **self.extra}
+
+
+# ================= 各頁面 =================
+def significance_block(page, optional_data, axis, system='KIST'):
+    """與 dashboard.show_significance 相同的說明與兩兩差異表 (展開區塊改為 <details>)"""
+    pairs = figures.significant_pairs(optional_data, axis, system)
+    if pairs is None:
+        page.add('<p class="caption">提示：執行 significance.py 後，這裡會標記經檢定確認的顯著差異。</p>')
+        return
+    page.add(f'<p class="caption">{esc(SIGNIFICANCE_NOTE)}</p>')
+    page.add(f'<details><summary>查看達顯著的兩兩差異 ({len(pairs)} 組)</summary>')
+    if pairs.empty:
+        page.add('<p>沒有達顯著的兩兩差異。</p>')
+    else:
+        page.table(f'pairs/{axis}', {f'pairs/{axis}': table_html(figures.pairs_table(pairs))})
+    page.add('</details>')
+
+
+def role_combinations(roles):
+    """預先產生的身份組合 (保持原本的身份順序)"""
+    sizes = range(1, len(roles) + 1) if len(roles) <= ROLE_COMBINATION_LIMIT else (1, 2)
+    combos = [list(c) for size in sizes for c in itertools.combinations(roles, size)]
+    if roles[:2] not in combos:
+        combos.append(roles[:2])
+    return combos
+
+
+def kist_page(data, optional_data):
+    page = Page('kist')
+    page.add('<h2>KIST 標準分析</h2><h3>1. 總體表現</h3><div class="cols cols-1-1">')
+    fig_top, fig_bot = figures.overall_bars(data['kist_overall'])
+    page.add('<div><h4>高分指標 (Top 5)</h4>')
+    page.figure('top', {'top': fig_top})
+    page.add('</div><div><h4>待觀察指標 (Bottom 5)</h4>')
+    page.figure('bottom', {'bottom': fig_bot})
+    page.add('</div></div><hr>')
+
+    page.add('<h3>2. 校際比較</h3>')
+    sample_text, fig_heatmap, fig_dim = figures.school_comparison(
+        data['kist_school'], figures.significant_indicators(optional_data, '學校'))
+    page.add(f'<div class="info">{esc(sample_text)}</div>')
+    page.figure('school', {'school': fig_heatmap})
+    if fig_dim is not None:
+        page.figure('school_dim', {'school_dim': fig_dim})
+    significance_block(page, optional_data, '學校')
+    page.add('<hr>')
+
+    page.add('<h3>3. 身份/資歷差異</h3>')
+    metrics = figures.role_metrics(data['kist_role'], figures.significant_indicators(optional_data, '身份'))
+    roles = metrics.columns.tolist()
+    page.checkboxes('roles', '選擇要比較的身份：', roles, roles[:2])
+    charts, tables = {}, {}
+    for selected in role_combinations(roles):
+        key = 'roles/' + '|'.join(selected)
+        charts[key], table = figures.role_comparison(metrics, selected)
+        tables[key] = table_html(table)
+    missing = '這個身份組合沒有預先產生，請減少勾選的身份數。'
+    page.figure('roles/{roles}', charts, empty=missing)
+    page.add('<details><summary>查看完整數據表</summary>')
+    page.table('roles/{roles}', tables)
+    page.add('</details>')
+    significance_block(page, optional_data, '身份')
+    return page
+
+
+def zhanghu_page(data, optional_data):
+    page = Page('zhanghu')
+    n_teachers, table, fig_zh = figures.zhanghu_overall(data['zhanghu_overall'])
+    page.add('<h2>樟湖指標分析</h2><div class="cols cols-1-2"><div>')
+    page.add(f'<div class="metric"><div>分析教師人數</div><strong>{n_teachers}</strong></div><h3>指標總表</h3>')
+    page.table('overall', {'overall': table_html(table)})
+    page.add('</div><div><h3>指標表現排序</h3>')
+    page.figure('bars', {'bars': fig_zh})
+    page.add('</div></div>')
+    page.add('<div class="info">註：樟湖體系採用獨立的校本指標（如：生態哲學、人文關懷），因此獨立呈現分析結果。</div>')
+    return page
+
+
+def factor_page(data, optional_data):
+    page = Page('factor')
+    page.add('<h2>因素分析</h2>')
+    if 'factor_summary' not in optional_data:
+        page.add('<div class="info">尚未產生因素分析結果，請先執行 factor.py。</div>')
+        return page
+
+    systems = figures.factor_systems(optional_data)
+    page.radio('factor_system', '體系：', systems)
+    captions, tables, loadings, groups = {}, {}, {}, {}
+    for system in systems:
+        factors, caption, table, fig_load = figures.factor_overview(optional_data, system)
+        captions[f'caption/{system}'] = f'<p class="caption">{esc(caption)}</p>'
+        tables[f'summary/{system}'] = table_html(table, hide_index=True)
+        loadings[f'loadings/{system}'] = fig_load
+        for group_label in ("學校", "身份"):
+            groups[f'groups/{system}/{group_label}'] = figures.factor_group_scores(
+                optional_data, system, factors, group_label)
+
+    page.add('<h3>1. 潛在因素</h3>')
+    page.table('caption/{factor_system}', captions)
+    page.table('summary/{factor_system}', tables)
+    page.add('<h3>2. 指標負荷量</h3>')
+    page.figure('loadings/{factor_system}', loadings)
+    page.add('<h3>3. 各組因素分數</h3>')
+    page.radio('factor_group', '分組方式：', ("學校", "身份"))
+    page.figure('groups/{factor_system}/{factor_group}', groups)
+    return page
+
+
+def text_page(data, optional_data):
+    page = Page('text')
+    page.add('<h2>發展目標文字分析</h2>')
+    if 'text_keywords' not in optional_data:
+        page.add('<div class="info">尚未產生文字分析結果，請先執行 textanalyze.py。</div>')
+        return page
+
+    df_kw = optional_data['text_keywords']
+    page.add('<h3>1. 關鍵詞提及人數</h3>')
+    page.figure('keywords', {'keywords': figures.keyword_overall(df_kw)})
+    page.radio('text_group', '分組方式：', ("學校", "身份"))
+    page.figure('keywords/{text_group}', {f'keywords/{label}': figures.keyword_groups(df_kw, label)
+                                         for label in ("學校", "身份")})
+    page.add('<hr><h3>2. 各校與各身份關鍵詞</h3><div class="cols cols-1-1">')
+    for key, label, group_col in [('text_terms_school', '學校', 'School_Name'),
+                                  ('text_terms_role', '身份', 'Role_Tag')]:
+        page.add('<div>')
+        if key in optional_data:
+            df_terms = optional_data[key]
+            choices = sorted(df_terms[group_col].unique())
+            page.select(key, f"選擇{label}：", choices)
+            page.table(f'{key}/{{{key}}}', {f'{key}/{choice}': table_html(
+                figures.top_terms(df_terms, group_col, choice), hide_index=True) for choice in choices})
+        page.add('</div>')
+    page.add('</div>')
+
+    if 'text_clusters' in optional_data:
+        page.add('<hr><h3>3. 相似發展目標分群</h3>')
+        page.table('clusters', {'clusters': table_html(optional_data['text_clusters'], hide_index=True)})
+    return page
+
+
+def _number(x, digits=None):
+    if pd.isna(x):
+        return None
+    x = float(x)
+    if digits is not None:
+        return round(x, digits)
+    return int(x) if x.is_integer() else x
+
+
+def _sort_order(values):
+    """與 pandas sort_values 相同的順序 (非缺值以 quicksort 由小到大，缺值依原順序排在最後)"""
+    missing = np.isnan(values)
+    present = np.flatnonzero(~missing)
+    return np.r_[present[values[present].argsort(kind='quicksort')], np.flatnonzero(missing)]
+
+
+def shard_name(name, taken):
+    """學校名稱 -> 分片檔名 (去掉路徑不允許的字元，重複時加上序號)"""
+    base = ''.join('_' if c in SHARD_UNSAFE_CHARS or ord(c) < 32 else c for c in str(name)).strip(' .') or '_'
+    candidate, n = base, 1
+    while candidate in taken:
+        n += 1
+        candidate = f'{base}_{n}'
+    taken.add(candidate)
+    return candidate
+
+
+def percentile_page(data, optional_data):
+    """
+    教師個人百分位：每個體系 × 比較群組只產生一個圖表樣板 (以第一位教師產生)，
+    每位教師只輸出數字 (各指標分數、百分位、名次、人數與依百分位排序的順序)，由瀏覽器代入樣板；
+    教師的數字依體系 / 學校分片 (data/percentile/<體系>/<學校>.json)，選到該校時才下載
+    """
+    page = Page('percentile')
+    page.add('<h2>教師個人百分位</h2>')
+    if 'percentiles' not in optional_data:
+        page.add('<div class="info">尚未產生百分位資料，請先執行 percentile.py。</div>')
+        return page
+
+    df_pct = optional_data['percentiles']
+    axes = figures.percentile_axes(df_pct)
+    systems, system_taken = {}, set()
+    for system in df_pct['體系'].unique():
+        df_sys = df_pct[df_pct['體系'] == system].reset_index(drop=True)
+        indicators = list(dict.fromkeys(df_sys['指標']))
+        position = {name: i for i, name in enumerate(indicators)}
+        rows = df_sys['指標'].map(position).to_numpy()
+        scores = df_sys['分數'].to_numpy()
+        columns = {axis: {key: df_sys[f'{axis}_{col}'].to_numpy() for key, col in
+                          [('pct', '百分位'), ('rank', '名次'), ('n', '人數')]} for axis in axes}
+
+        # 一次分組取得每位教師的列位置 (依出現順序)，再依學校整理
+        by_school = {}
+        for (school, teacher), idx in df_sys.groupby(['School_Name', '教師姓名'], sort=False).indices.items():
+            by_school.setdefault(school, []).append((teacher, idx))
+
+        system_dir = shard_name(system, system_taken)
+        templates, schools, school_taken = {}, {}, set()
+        for school in sorted(by_school):
+            teachers = []
+            for teacher, idx in by_school[school]:
+                entry = {'name': str(teacher), 'rows': rows[idx].tolist(),
+                         'score': [_number(v) for v in scores[idx]], 'axes': {}}
+                for axis in axes:
+                    pct = columns[axis]['pct'][idx]
+                    # 與儀表板相同的排序 (sort_values)，瀏覽器依這個順序畫圖
+                    order = _sort_order(pct)
+                    entry['axes'][axis] = {
+                        'pct': [_number(v, 1) for v in pct],
+                        'rank': [_number(v) for v in columns[axis]['rank'][idx]],
+                        'n': [_number(v) for v in columns[axis]['n'][idx]],
+                        'order': order.tolist(),
+                    }
+                    if axis not in templates:
+                        templates[axis] = page.fig_json(figures.percentile_chart(
+                            df_sys.iloc[idx[order]], axis, teacher))
+                teachers.append(entry)
+            path = f'percentile/{system_dir}/{shard_name(school, school_taken)}.json'
+            page.files[path] = {'teachers': teachers}
+            schools[str(school)] = path
+        systems[str(system)] = {'indicators': indicators, 'templates': templates, 'schools': schools}
+
+    page.extra = {'axes': axes, 'columns': figures.percentile_columns(axes), 'systems': systems}
+    page.add('<div class="cols cols-1-1-1">'
+             '<div class="control"><span>體系：</span><select id="pct-system"></select></div>'
+             '<div class="control"><span>學校：</span><select id="pct-school"></select></div>'
+             '<div class="control"><span>教師：</span><select id="pct-teacher"></select></div></div>')
+    page.radio('pct_axis', '比較群組：', axes)
+    page.add('<div class="plot" id="pct-chart"></div>'
+             '<details><summary>查看完整數據表</summary><div class="table-wrap" id="pct-table"></div></details>')
+    return page
+
+
+PAGE_BUILDERS = [kist_page, zhanghu_page, factor_page, text_page, percentile_page]
+
+# ================= 網頁 =================
+# 頁面切換與篩選的程式：切換到某頁時才下載 data/<頁面>.json；
+# data-fig / data-html 的 {名稱} 代入同一頁中該名稱控制項目前的值 (單選、下拉選單為選取的值，
+# 核取方塊為勾選的值以 | 串接)，再以結果當鍵找出預先產生的圖表或表格
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-Hant">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<script src="__PLOTLY__?v=__VERSION__"></script>
+<style>
+body { margin: 0; font-family: -apple-system, "Noto Sans TC", "Microsoft JhengHei", sans-serif; color: #262730; }
+nav { position: fixed; top: 0; bottom: 0; left: 0; width: 240px; padding: 24px 16px; background: #f0f2f6; overflow-y: auto; box-sizing: border-box; }
+nav h2 { font-size: 1.1rem; } nav label { display: block; margin: 6px 0; cursor: pointer; }
+main { margin-left: 240px; padding: 24px 40px; }
+.cols { display: grid; gap: 24px; } .cols-1-1 { grid-template-columns: 1fr 1fr; }
+.cols-1-2 { grid-template-columns: 1fr 2fr; } .cols-1-1-1 { grid-template-columns: 1fr 1fr 1fr; }
+.control { margin: 12px 0; } .control > span { margin-right: 12px; } .control label { margin-right: 16px; }
+.info { background: #e8f0fe; border-radius: 6px; padding: 12px 16px; margin: 12px 0; }
+.caption, .muted { color: #6b6f76; font-size: 0.9rem; }
+.metric strong { font-size: 2.2rem; font-weight: 400; }
+.table-wrap { overflow-x: auto; } table.table { border-collapse: collapse; font-size: 0.9rem; margin: 8px 0; }
+table.table th, table.table td { border: 1px solid #e6e9ef; padding: 4px 8px; text-align: right; }
+details { margin: 12px 0; } summary { cursor: pointer; }
+@media (max-width: 900px) { nav { position: static; width: auto; } main { margin-left: 0; padding: 16px; } .cols { grid-template-columns: 1fr; } }
+</style>
+</head>
+<body>
+<nav>
+<h2>分析維度選擇</h2>
+<p class="muted">__SOURCE__</p>
+<p>請選擇要查看的分析視角：</p>
+__NAV__
+</nav>
+<main>
+<h1>114-1 教師IDP教學力分析儀表板</h1>
+<hr>
+__SECTIONS__
+</main>
+<script>
+const VERSION = "__VERSION__";
+const PLOT_CONFIG = {responsive: true, displaylogo: false};
+const loaded = {};
+const TEMPLATES = {};
+
+function loadPage(id) {
+  if (!loaded[id]) {
+    loaded[id] = fetch(`data/${id}.json?v=${VERSION}`).then(r => {
+      if (!r.ok) throw new Error(`HTTP ${r.status}`);
+      return r.json();
+    }).then(data => {
+      Object.assign(TEMPLATES, data.templates);
+      return data;
+    });
+  }
+  return loaded[id];
+}
+
+function controlValue(section, name) {
+  const inputs = Array.from(section.querySelectorAll(`[name="${name}"]`));
+  if (!inputs.length) return '';
+  if (inputs[0].tagName === 'SELECT') return inputs[0].value;
+  return inputs.filter(i => i.checked).map(i => i.value).join('|');
+}
+
+// 代入控制項的值；任何一個控制項沒有選取時回傳 null (不顯示內容)
+function fillKey(section, template) {
+  let empty = false;
+  const key = template.replace(/\\{(\\w+)\\}/g, (_, name) => {
+    const value = controlValue(section, name);
+    if (!value) empty = true;
+    return value;
+  });
+  return empty ? null : key;
+}
+
+function plot(el, fig) {
+  const layout = Object.assign({}, fig.layout, {template: TEMPLATES[fig.layout.template]});
+  Plotly.react(el, fig.data, layout, PLOT_CONFIG);
+}
+
+function escapeHtml(value) {
+  const replace = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+  return String(value).replace(/[&<>"']/g, c => replace[c]);
+}
+
+function renderSection(section, data) {
+  section.querySelectorAll('[data-fig]').forEach(el => {
+    const key = fillKey(section, el.dataset.fig);
+    if (el.dataset.shown === key) return;
+    el.dataset.shown = key;
+    const fig = key === null ? undefined : data.figures[key];
+    if (fig) {
+      el.textContent = '';
+      plot(el, fig);
+    } else {
+      Plotly.purge(el);
+      el.textContent = key === null ? '' : el.dataset.empty;
+    }
+  });
+  section.querySelectorAll('[data-html]').forEach(el => {
+    const key = fillKey(section, el.dataset.html);
+    el.innerHTML = (key !== null && data.html[key]) || (key === null ? '' : el.dataset.empty);
+  });
+  if (section.id === 'percentile' && data.systems) renderPercentile(section, data);
+}
+
+function showPage(id) {
+  document.querySelectorAll('main > section').forEach(s => { s.hidden = s.id !== id; });
+  const section = document.getElementById(id);
+  loadPage(id)
+    .then(data => renderSection(section, data))
+    .catch(err => { section.querySelector('.error').textContent = `無法載入資料：${err.message}`; });
+}
+
+// ===== 教師個人百分位：把教師的數字代入預先產生的圖表樣板 =====
+function fillOptions(select, values, labels) {
+  const previous = select.value;
+  select.innerHTML = '';
+  values.forEach((v, i) => select.add(new Option(labels ? labels[i] : v, v)));
+  if (values.map(String).includes(previous)) select.value = previous;
+}
+
+// 各校教師的數字 (data/percentile/<體系>/<學校>.json)，選到該校時才下載
+const shards = {};
+
+function loadShard(path) {
+  if (!shards[path]) {
+    shards[path] = fetch(`data/${path}?v=${VERSION}`).then(r => {
+      if (!r.ok) throw new Error(`HTTP ${r.status}`);
+      return r.json();
+    });
+  }
+  return shards[path];
+}
+
+function renderPercentile(section, data) {
+  const sysSelect = section.querySelector('#pct-system');
+  const schoolSelect = section.querySelector('#pct-school');
+  if (!sysSelect.options.length) fillOptions(sysSelect, Object.keys(data.systems));
+  const system = data.systems[sysSelect.value];
+  fillOptions(schoolSelect, Object.keys(system.schools));
+  const path = system.schools[schoolSelect.value];
+  if (!path) { renderTeacher(section, data, system, []); return; }
+  loadShard(path)
+    .then(shard => {
+      // 下載期間又換了體系或學校時，交給新的選擇處理
+      const current = data.systems[sysSelect.value].schools[schoolSelect.value];
+      if (current === path) renderTeacher(section, data, system, shard.teachers);
+    })
+    .catch(err => { section.querySelector('.error').textContent = `無法載入資料：${err.message}`; });
+}
+
+function renderTeacher(section, data, system, teachers) {
+  const teacherSelect = section.querySelector('#pct-teacher');
+  fillOptions(teacherSelect, teachers.map((_, i) => i), teachers.map(t => t.name));
+  const teacher = teachers[teacherSelect.value];
+  const axis = controlValue(section, 'pct_axis');
+  const chart = section.querySelector('#pct-chart');
+  if (!teacher || !system.templates[axis]) { Plotly.purge(chart); return; }
+
+  const a = teacher.axes[axis];
+  const fig = JSON.parse(JSON.stringify(system.templates[axis]));
+  const trace = fig.data[0];
+  trace.x = a.order.map(i => a.pct[i]);
+  trace.y = a.order.map(i => system.indicators[teacher.rows[i]]);
+  trace.marker.color = trace.x;
+  trace.customdata = a.order.map(i => [teacher.score[i], a.rank[i], a.n[i]]);
+  fig.layout.title.text = `${teacher.name} 在「${axis}」中的百分位 (越高代表相對表現越好)`;
+  fig.layout.height = Math.max(400, 28 * a.order.length);
+  plot(chart, fig);
+
+  const cell = v => `<td>${v === null || v === undefined ? '' : escapeHtml(v)}</td>`;
+  const head = data.columns.map(c => `<th>${escapeHtml(c)}</th>`).join('');
+  const rows = a.order.map(i => {
+    const values = [system.indicators[teacher.rows[i]], teacher.score[i]];
+    data.axes.forEach(ax => { const b = teacher.axes[ax]; values.push(b.pct[i], b.rank[i], b.n[i]); });
+    return `<tr>${values.map(cell).join('')}</tr>`;
+  }).join('');
+  section.querySelector('#pct-table').innerHTML = `<table class="table"><tr>${head}</tr>${rows}</table>`;
+}
+
+document.addEventListener('change', e => {
+  if (e.target.name === 'page') {
+    location.hash = e.target.value;
+    return;
+  }
+  const section = e.target.closest('main > section');
+  if (section) loadPage(section.id).then(data => renderSection(section, data));
+});
+
+function route() {
+  const ids = Array.from(document.querySelectorAll('main > section')).map(s => s.id);
+  const id = ids.includes(location.hash.slice(1)) ? location.hash.slice(1) : ids[0];
+  document.querySelector(`input[name="page"][value="${id}"]`).checked = true;
+  showPage(id);
+}
+window.addEventListener('hashchange', route);
+route();
+</script>
+</body>
+</html>
+"""
+
+
+def render_index(pages, version, source):
+    nav = ''.join(f'<label><input type="radio" name="page" value="{PAGE_IDS[title]}"> {esc(title)}</label>'
+                  for title in PAGES)
+    sections = ''.join(f'<section id="{page.id}" hidden><p class="error"></p>{"".join(page.parts)}</section>'
+                       for page in pages)
+    replacements = {'__TITLE__': esc(PAGE_TITLE), '__PLOTLY__': PLOTLY_JS, '__VERSION__': version[:12],
+                    '__SOURCE__': esc(source), '__NAV__': nav, '__SECTIONS__': sections}
+    result = INDEX_TEMPLATE
+    for placeholder, value in replacements.items():
+        result = result.replace(placeholder, value)
+    return result
+
+
+def write_bundle(folder, pages, version, source, data_source):
+    """把網頁、各頁資料、plotly.js 與 manifest 寫入 folder"""
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    os.makedirs(os.path.join(folder, 'data'))
+    with open(os.path.join(folder, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(render_index(pages, version, source))
+    with open(os.path.join(folder, PLOTLY_JS), 'w', encoding='utf-8') as f:
+        f.write(get_plotlyjs())
+
+    sizes = {}
+    for page in pages:
+        path = os.path.join(folder, 'data', f'{page.id}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(page.data(), f, ensure_ascii=False, separators=(',', ':'))
+        sizes[page.id] = os.path.getsize(path)
+        for name, content in page.files.items():
+            path = os.path.join(folder, 'data', *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(content, f, ensure_ascii=False, separators=(',', ':'))
+            sizes[name] = os.path.getsize(path)
+
+    manifest = {'format': FORMAT_VERSION, 'fingerprint': version, 'source': data_source,
+                'plotly': plotly.__version__, 'pages': sizes}
+    with open(os.path.join(folder, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return sizes
+
+
+def read_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_folder(tmp_folder, folder):
+    """
+    以改名換上新產生的資料夾 (資料夾無法原子地取代非空資料夾，舊的先改名移開再刪除，
+    中間只有兩次改名之間的極短空窗)
+    """
+    old = None
+    if os.path.exists(folder):
+        old = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(folder)),
+                               prefix='.' + os.path.basename(folder) + '.old-')
+        os.rmdir(old)
+        os.rename(folder, old)
+    os.rename(tmp_folder, folder)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+@instrumented('export')
+def export(output=None, folder=None, force=False):
+    """產生靜態儀表板，回傳輸出資料夾；結果檔與上次匯出相同時略過 (force=True 強制重新產生)"""
+    output = output or OUTPUT_FOLDER
+    folder = folder or data_folder()
+    version = source_fingerprint(folder)
+    manifest = read_manifest(output)
+    if not force and manifest and manifest.get('fingerprint') == version:
+        print(f"'{folder}' 的分析結果與上次匯出相同，略過 (輸出: {output})")
+        return output
+
+    with stage('export.load', folder=folder) as s:
+        data, missing = figures.read_data(folder)
+        if missing:
+            print(f"錯誤：找不到檔案 '{missing}'，請先執行分析流程。")
+            return None
+        optional_data = figures.read_optional_data(folder)
+        s.note(optional=len(optional_data))
+
+    pages = []
+    for build in PAGE_BUILDERS:
+        with stage(f'export.{build.__name__}') as s:
+            page = build(data, optional_data)
+            s.note(figures=len(page.figures), tables=len(page.tables))
+        pages.append(page)
+
+    source = f"資料版本: {os.path.basename(folder)}" if folder != '.' else f"資料夾: {os.path.abspath(folder)}"
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    tmp_folder = tempfile.mkdtemp(dir=parent, prefix='.' + os.path.basename(output) + '.build-')
+    try:
+        os.chmod(tmp_folder, 0o755)
+        with stage('export.write') as s:
+            sizes = write_bundle(tmp_folder, pages, version, source, os.path.abspath(folder))
+            s.note(bytes=sum(sizes.values()), files=len(sizes))
+        publish_folder(tmp_folder, output)
+    except BaseException:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        raise
+
+    print("-" * 30)
+    print(f"靜態儀表板已輸出至: {output}")
+    for page in pages:
+        print(f"   {page.id}: {len(page.figures)} 張圖表, {len(page.tables)} 個表格, {sizes[page.id] / 1024:.0f} KB")
+        if page.files:
+            shard_sizes = [sizes[name] for name in page.files]
+            print(f"      另有 {len(shard_sizes)} 個分片檔, 共 {sum(shard_sizes) / 1024:.0f} KB "
+                  f"(最大 {max(shard_sizes) / 1024:.0f} KB)")
+    print(f"以靜態檔案伺服器提供即可瀏覽，例如: python -m http.server -d {output} 8000")
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把儀表板預先產生成靜態網站 (HTML + JSON)')
+    parser.add_argument('--output', default=None, help=f'輸出資料夾 (預設 {OUTPUT_FOLDER})')
+    parser.add_argument('--folder', default=None, help='分析結果所在的資料夾 (預設與儀表板相同)')
+    parser.add_argument('--force', action='store_true', help='結果檔未變更也重新產生')
+    args = parser.parse_args()
+    export(args.output, args.folder, args.force)
+
+
+if __name__ == "__main__":
+    main()
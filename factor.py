@@ -0,0 +1,274 @@
+import pandas as pd
+import numpy as np
+import os
+from sklearn.utils.extmath import randomized_svd
+
+from dimension import build_weight_matrices
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (TA_analyze 分流後的量化資料：教師 × 指標，找不到的體系會略過)
+FILE_KIST = 'Analysis_KIST_Standard.csv'
+FILE_ZHANGHU = 'Analysis_Zhanghu_Teachers.csv'
+
+# 輸出檔名
+OUT_LOADINGS = 'Factor_Loadings.csv'  # 指標 × 因素的負荷量與共同性
+OUT_SUMMARY = 'Factor_Summary.csv'    # 每個因素的解釋變異與代表指標
+OUT_SCORES = 'Factor_Scores.csv'      # 每位教師的因素分數
+
+# 因素數：None 代表依 Kaiser 準則 (相關矩陣特徵值 > 1) 自動決定，最多 MAX_FACTORS 個
+N_FACTORS = None
+MAX_FACTORS = 5
+# 旋轉方式：'varimax' (因素之間維持正交，較容易解讀) 或 None
+ROTATION = 'varimax'
+
+# 填答不足的指標/教師不參與估計：指標至少要有此比例的教師填答；教師至少要填答幾個指標
+MIN_INDICATOR_COVERAGE = 0.2
+MIN_ANSWERED = 3
+
+# 缺值以 EM 估計 (每位教師只使用自己有填答的指標)，負荷量的最大變化低於 TOL 時停止
+MAX_ITER = 500
+TOL = 1e-4
+# 獨特變異的下限 (避免某個指標被單一因素完全解釋時數值發散)
+MIN_UNIQUENESS = 0.005
+# EM 起點的隨機化 SVD 參數 (超取樣維度、冪迭代次數、亂數種子)
+OVERSAMPLES = 10
+POWER_ITERATIONS = 4
+RANDOM_SEED = 0
+
+# 每個因素列出的代表指標數
+TOP_INDICATORS = 3
+
+META_COLS = ['School_Name', 'Role_Tag', '教師姓名', '職位', '科目', 'Source_File',
+             'School_Level', 'Standardized_Role', '教師信箱', '學校', '提交時間']
+# =========================================
+
+
+def standardize(values):
+    """以有填答的值計算各指標的平均與標準差，回傳 (標準化後補 0 的矩陣, 填答遮罩)"""
+    observed = ~np.isnan(values)
+    with np.errstate(invalid='ignore'):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+    return np.where(observed, (values - mean) / std, 0.0), observed
+
+
+def pairwise_eigenvalues(Z, observed):
+    """
+    成對完整 (pairwise complete) 相關矩陣的特徵值 (由大到小)，供 Kaiser 準則決定因素數
+    以補 0 的標準化矩陣與遮罩各做一次矩陣乘法，一次算出所有指標配對
+    """
+    mask = observed.astype(np.float64)
+    pairs = mask.T @ mask
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.where(pairs > 1, (Z.T @ Z) / (pairs - 1), 0.0)
+    np.fill_diagonal(corr, 1.0)
+    return np.linalg.eigvalsh(corr)[::-1]
+
+
+def initial_loadings(Z, k):
+    """以補 0 矩陣的隨機化 SVD (截斷到 k 維) 作為 EM 的起點，回傳 (負荷量 W, 獨特變異 psi)"""
+    n, d = Z.shape
+    _, S, Vt = randomized_svd(Z, k, n_oversamples=max(0, min(OVERSAMPLES, d - k)),
+                              n_iter=POWER_ITERATIONS, random_state=RANDOM_SEED)
+    W = Vt.T * S / np.sqrt(n)
+    return W, np.clip(1.0 - (W ** 2).sum(axis=1), MIN_UNIQUENESS, None)
+
+
+def em_factor(Z, observed, k):
+    """
+    缺值下的因素分析 EM (z = W f + e，f ~ N(0, I)，e ~ N(0, diag(psi)))
+    每位教師只用自己有填答的指標：E 步驟的 k × k 精確度矩陣
+        M_i = I + Σ_j 填答_ij · w_j w_j^T / psi_j
+    只取決於填答型態，因此每種型態只求一次反矩陣 (表單常整段略過，型態通常遠少於教師數)，
+    所有型態一起以 (型態 × 指標) @ (指標 × k²) 的矩陣乘法建立；M 步驟同樣以遮罩做矩陣乘法彙總。
+    每輪成本 O(n·d·k²)，另加每種填答型態一次 k × k 求逆。
+    回傳 (W, psi, 因素分數 E[f], 迭代次數, 是否收斂)
+    """
+    n, d = Z.shape
+    mask = observed.astype(np.float64)
+    Z = np.where(observed, Z, 0.0)
+    n_obs = mask.sum(axis=0)
+    z_sq = (Z ** 2).sum(axis=0)
+    eye = np.eye(k)
+    patterns, pattern_of = np.unique(observed, axis=0, return_inverse=True)
+    patterns = patterns.astype(np.float64)
+    pattern_of = pattern_of.ravel()
+
+    W, psi = initial_loadings(Z, k)
+    for iteration in range(1, MAX_ITER + 1):
+        # E 步驟：每位教師的後驗平均與二階動差
+        A = W / psi[:, None]
+        precision = eye + (patterns @ (A[:, :, None] * W[:, None, :]).reshape(d, k * k)).reshape(-1, k, k)
+        cov = np.linalg.inv(precision)[pattern_of]
+        Ef = np.einsum('nab,nb->na', cov, Z @ A)
+        Eff = cov + Ef[:, :, None] * Ef[:, None, :]
+
+        # M 步驟：每個指標只以有填答的教師更新 w_j 與 psi_j
+        SzF = Z.T @ Ef
+        SFF = (mask.T @ Eff.reshape(n, k * k)).reshape(d, k, k)
+        W_new = np.linalg.solve(SFF, SzF[:, :, None])[:, :, 0]
+        psi = np.clip((z_sq - (W_new * SzF).sum(axis=1)) / n_obs, MIN_UNIQUENESS, None)
+
+        change = np.abs(W_new - W).max()
+        W = W_new
+        if change < TOL:
+            return W, psi, Ef, iteration, True
+    return W, psi, Ef, MAX_ITER, False
+
+
+def varimax(loadings, max_iter=100, tol=1e-6):
+    """Varimax 正交旋轉，回傳 (旋轉後的負荷量, 旋轉矩陣)"""
+    d, k = loadings.shape
+    R = np.eye(k)
+    objective = 0.0
+    for _ in range(max_iter):
+        L = loadings @ R
+        u, s, vt = np.linalg.svd(loadings.T @ (L ** 3 - L @ np.diag((L ** 2).sum(axis=0)) / d))
+        R = u @ vt
+        if s.sum() < objective * (1 + tol):
+            break
+        objective = s.sum()
+    return loadings @ R, R
+
+
+def fit_factors(values, n_factors=None):
+    """
+    values: (教師 × 指標) 分數矩陣 (缺值為 NaN)，已去除填答不足的列與欄
+    回傳 dict：loadings (指標 × 因素，標準化負荷量)、communality、scores (教師 × 因素)、
+    eigenvalues (成對相關矩陣的特徵值)、n_factors、iterations、converged、missing_rate
+    """
+    Z, observed = standardize(values)
+    n, d = Z.shape
+    eigenvalues = pairwise_eigenvalues(Z, observed)
+    k = int((eigenvalues > 1.0).sum()) if n_factors is None else n_factors
+    k = int(np.clip(k, 1, max(1, min(MAX_FACTORS if n_factors is None else k, d - 1, n - 1))))
+
+    W, psi, scores, iterations, converged = em_factor(Z, observed, k)
+
+    # 標準化負荷量 (指標與因素的相關)；共同性 = 可由共同因素解釋的變異比例
+    scale = np.sqrt((W ** 2).sum(axis=1) + psi)
+    loadings = W / scale[:, None]
+    if ROTATION == 'varimax' and k > 1:
+        loadings, R = varimax(loadings)
+        scores = scores @ R
+
+    # 讓負荷量總和為正 (分數越高代表整體表現越好)，並依解釋變異由大到小排序
+    signs = np.where(loadings.sum(axis=0) < 0, -1.0, 1.0)
+    loadings, scores = loadings * signs, scores * signs
+    order = np.argsort(-(loadings ** 2).sum(axis=0))
+    return {
+        'loadings': loadings[:, order],
+        'communality': (loadings ** 2).sum(axis=1),
+        'scores': scores[:, order],
+        'eigenvalues': eigenvalues,
+        'n_factors': k,
+        'iterations': iterations,
+        'converged': converged,
+        'missing_rate': float((~observed).mean()),
+    }
+
+
+def analyze_system(df, system):
+    """單一體系：挑選指標與教師、估計因素，回傳 (負荷量表, 因素摘要, 教師分數表)"""
+    df = df.reset_index(drop=True)
+    indicator_cols = [c for c in df.columns if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+    values = df[indicator_cols].to_numpy(dtype=np.float64)
+
+    coverage = (~np.isnan(values)).mean(axis=0)
+    with np.errstate(invalid='ignore'):
+        varies = np.nan_to_num(np.nanstd(values, axis=0)) > 0
+    keep_cols = (coverage >= MIN_INDICATOR_COVERAGE) & varies
+    indicators = [c for c, keep in zip(indicator_cols, keep_cols) if keep]
+    values = values[:, keep_cols]
+    answered = (~np.isnan(values)).sum(axis=1)
+    keep_rows = answered >= MIN_ANSWERED
+
+    if len(indicators) < 2 or keep_rows.sum() < 3:
+        print(f"   {system}: 可用的指標或教師太少，略過因素分析")
+        return None
+
+    with stage('factor.fit', system=system) as s:
+        s.input(values[keep_rows])
+        result = fit_factors(values[keep_rows], N_FACTORS)
+        s.note(n_factors=result['n_factors'], iterations=result['iterations'],
+               converged=result['converged'], missing_rate=round(result['missing_rate'], 4))
+    k = result['n_factors']
+    factor_names = [f'因素{i + 1}' for i in range(k)]
+    print(f"   {system}: {keep_rows.sum()} 位教師 × {len(indicators)} 個指標 (缺值 {result['missing_rate']:.1%})"
+          f" -> {k} 個因素，{result['iterations']} 輪{'收斂' if result['converged'] else '未收斂'}")
+
+    # 指標所屬的面向 (對照 dimension.py 的指標階層，方便解讀因素)；
+    # 兩個體系有同名指標，只使用該體系適用的框架
+    W_dim, _ = build_weight_matrices(indicators, system=system)
+    dimension_of = {c: (W_dim.columns[W_dim.loc[c].to_numpy().argmax()] if W_dim.loc[c].any() else '')
+                    for c in indicators}
+
+    loadings = pd.DataFrame(np.round(result['loadings'], 4), columns=factor_names)
+    loadings.insert(0, '面向', [dimension_of[c] for c in indicators])
+    loadings.insert(0, '指標', indicators)
+    loadings.insert(0, '體系', system)
+    loadings['共同性'] = np.round(result['communality'], 4)
+
+    ss = (result['loadings'] ** 2).sum(axis=0)
+    summary = pd.DataFrame({
+        '體系': system,
+        '因素': factor_names,
+        '特徵值(相關矩陣)': np.round(result['eigenvalues'][:k], 4),
+        '負荷量平方和': np.round(ss, 4),
+        '解釋變異比例': np.round(ss / len(indicators), 4),
+        '累積解釋比例': np.round(np.cumsum(ss) / len(indicators), 4),
+    })
+    top = np.argsort(-result['loadings'], axis=0)[:TOP_INDICATORS]
+    summary['代表指標'] = ['、'.join(indicators[i] for i in top[:, j]) for j in range(k)]
+    # 負荷量平方和最大的面向
+    dim_ss = W_dim.T.astype(bool).to_numpy() @ (result['loadings'] ** 2)
+    summary['主要面向'] = [W_dim.columns[dim_ss[:, j].argmax()] if dim_ss.size and dim_ss[:, j].any() else ''
+                       for j in range(k)]
+
+    meta_cols = [c for c in ['School_Name', 'Role_Tag', '教師姓名'] if c in df.columns]
+    scores = df.loc[keep_rows, meta_cols].reset_index(drop=True)
+    scores.insert(0, '體系', system)
+    scores[factor_names] = np.round(result['scores'], 4)
+    scores['有效指標數'] = answered[keep_rows]
+    return loadings, summary, scores
+
+
+@instrumented('factor')
+def main():
+    loadings_frames, summary_frames, score_frames = [], [], []
+    for system, filename in [('KIST', FILE_KIST), ('樟湖', FILE_ZHANGHU)]:
+        if not os.path.exists(filename):
+            print(f"找不到 {filename}，略過 {system} 體系。")
+            continue
+
+        print(f"正在讀取 {filename} ...")
+        result = analyze_system(pd.read_csv(filename), system)
+        if result is None:
+            continue
+        loadings, summary, scores = result
+        loadings_frames.append(loadings)
+        summary_frames.append(summary)
+        score_frames.append(scores)
+
+        print(summary[['因素', '解釋變異比例', '代表指標']].to_string(index=False))
+
+    if not loadings_frames:
+        print("錯誤：找不到任何可用的數據檔案，請先執行分流腳本。")
+        return
+
+    # 各體系的因素數可能不同，合併後把因素欄位排回共同性/有效指標數之前
+    def concat(frames, tail):
+        df = pd.concat(frames, ignore_index=True)
+        return df[[c for c in df.columns if c != tail] + [tail]]
+
+    concat(loadings_frames, '共同性').to_csv(OUT_LOADINGS, index=False, encoding='utf-8-sig')
+    pd.concat(summary_frames, ignore_index=True).to_csv(OUT_SUMMARY, index=False, encoding='utf-8-sig')
+    concat(score_frames, '有效指標數').to_csv(OUT_SCORES, index=False, encoding='utf-8-sig')
+    print("-" * 30)
+    print("因素分析完成！")
+    print(f"已輸出至: {OUT_LOADINGS}, {OUT_SUMMARY}, {OUT_SCORES}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from dimension import DIMENSION_PREFIX, FRAMEWORK_PREFIX
+from mmapcache import read_table
+from percentile import SCHOOL_LEVEL_MAP, META_COLS
+from lodheatmap import LodMatrix
+from instrument import stage
+
+# 儀表板各頁面的圖表與表格
+# dashboard.py (Streamlit) 與 export.py (靜態匯出) 共用這裡的函數，兩邊呈現的內容完全相同；
+# 這個檔案不匯入 streamlit，匯出時不必啟動 Streamlit
+
+# ================= 設定區 =================
+# 主要結果檔 (缺少任何一個時儀表板無法顯示)
+DATA_FILES = {
+    "kist_overall": "1_KIST_Overall_Stats_v2.csv",
+    "kist_school": "2_KIST_School_Comparison_v2.csv",
+    "kist_role": "3_KIST_Role_Comparison_v2.csv",
+    "zhanghu_overall": "Zhanghu_Overall_Stats.csv"
+}
+
+# 延伸分析的結果檔 (選用，找不到時該頁面顯示提示)
+OPTIONAL_FILES = {
+    "text_terms_school": "Text_Top_Terms_School.csv",
+    "text_terms_role": "Text_Top_Terms_Role.csv",
+    "text_keywords": "Text_Keyword_Coverage.csv",
+    "text_clusters": "Text_Goal_Clusters.csv",
+    "percentiles": "Teacher_Percentiles.csv",
+    "significance_omnibus": "Significance_Omnibus.csv",
+    "significance_pairwise": "Significance_Pairwise.csv",
+    "factor_loadings": "Factor_Loadings.csv",
+    "factor_summary": "Factor_Summary.csv",
+    "factor_scores": "Factor_Scores.csv",
+    "kist_teachers": "Analysis_KIST_Standard.csv"
+}
+
+# 側邊欄的頁面 (依顯示順序)
+PAGES = ("KIST 標準分析", "樟湖指標分析", "因素分析", "發展目標文字分析", "教師個人百分位")
+
+# 學校數超過這個數時，校際比較預設改用大型矩陣模式 (WebGL + 細節層級，見 lodheatmap.py)
+LARGE_MATRIX_SCHOOLS = 40
+# =========================================
+
+SAMPLE_ROW = '有效樣本數 (N)'
+SIGNIFICANCE_NOTE = ("★ = 組間差異經 Kruskal-Wallis 檢定 (多重比較校正後) 達顯著；"
+                     "未標記的差異可能只是抽樣誤差，小樣本的組別尤其需要注意。")
+
+
+# ================= 資料讀取 =================
+def read_data(folder='.'):
+    """
+    讀取主要結果檔 (記憶體映射，見 mmapcache)，第一欄設為 Index 並命名為 '指標'
+    回傳 (data, 找不到的檔案)；有檔案找不到時 data 為 None
+    """
+    data = {}
+    for key, filename in DATA_FILES.items():
+        filename = os.path.join(folder, filename)
+        if not os.path.exists(filename):
+            return None, filename
+        df = read_table(filename, index_col=0)
+        df.index.name = '指標'
+        data[key] = df
+    return data, None
+
+
+def read_optional_data(folder='.'):
+    """讀取延伸分析的結果檔 (找不到的略過)"""
+    optional = {}
+    for key, filename in OPTIONAL_FILES.items():
+        filename = os.path.join(folder, filename)
+        if os.path.exists(filename):
+            optional[key] = read_table(filename)
+    return optional
+
+
+# ================= 顯著性標記 =================
+def significant_indicators(optional_data, axis, system='KIST'):
+    """組間差異達顯著的指標 (尚未執行 significance.py 時回傳 None)"""
+    if 'significance_omnibus' not in optional_data:
+        return None
+    df = optional_data['significance_omnibus']
+    return set(df.loc[(df['體系'] == system) & (df['分組方式'] == axis) & df['顯著'], '指標'])
+
+
+def mark_significant(index, flags):
+    """在顯著的指標名稱前加上 ★"""
+    return [f"★ {name}" if flags and name in flags else name for name in index]
+
+
+def significant_pairs(optional_data, axis, system='KIST'):
+    """某分組方式達顯著的兩兩差異 (依效果量大小排序)；尚未執行 significance.py 時回傳 None"""
+    if 'significance_pairwise' not in optional_data:
+        return None
+    pairs = optional_data['significance_pairwise']
+    pairs = pairs[(pairs['體系'] == system) & (pairs['分組方式'] == axis) & pairs['顯著']]
+    cols = ['指標', '組別A', '組別B', 'n_A', 'n_B', '平均A', '平均B', '差異(A-B)', 'Hedges_g', 'Dunn_p_校正']
+    return pairs[cols].sort_values('Hedges_g', key=abs, ascending=False)
+
+
+def pairs_table(pairs):
+    return pairs.style.format({'平均A': '{:.2f}', '平均B': '{:.2f}', '差異(A-B)': '{:+.2f}',
+                               'Hedges_g': '{:+.2f}', 'Dunn_p_校正': '{:.4f}'})
+
+
+# ================= KIST 標準分析 =================
+def overall_bars(df_overall):
+    """平均分數最高與最低的 5 個指標"""
+    top5 = df_overall.sort_values(by='平均數', ascending=False).head(5)
+    fig_top = px.bar(top5, x='平均數', y=top5.index, orientation='h',
+                     text_auto='.2f', title="平均分數最高的指標",
+                     color='平均數', color_continuous_scale='Greens')
+    fig_top.update_layout(yaxis={'categoryorder': 'total ascending'})
+
+    bot5 = df_overall.sort_values(by='平均數', ascending=True).head(5)
+    fig_bot = px.bar(bot5, x='平均數', y=bot5.index, orientation='h',
+                     text_auto='.2f', title="平均分數較低的指標",
+                     color='平均數', color_continuous_scale='Reds_r')
+    fig_bot.update_layout(yaxis={'categoryorder': 'total descending'})
+    return fig_top, fig_bot
+
+
+def school_comparison(df_school, flags):
+    """
+    校際比較：回傳 (樣本數說明, 指標熱力圖, 面向/總分熱力圖或 None)
+    組間差異達顯著的指標標上 ★
+    """
+    # 分離樣本數列與數據列
+    sample_sizes = df_school.loc[[SAMPLE_ROW]]
+    metrics_data = df_school.drop([SAMPLE_ROW], errors='ignore')
+
+    # 面向/框架列 (由 KSanalyze 彙整) 與一般指標列分開顯示
+    is_rollup = metrics_data.index.str.startswith((DIMENSION_PREFIX, FRAMEWORK_PREFIX))
+    dimension_data = metrics_data[is_rollup]
+    metrics_data = metrics_data[~is_rollup]
+
+    sample_text = "各校有效樣本數 (N)：" + ", ".join([f"{col}: {int(val)}" for col, val in sample_sizes.iloc[0].items()])
+
+    metrics_data = metrics_data.set_axis(mark_significant(metrics_data.index, flags))
+    dimension_data = dimension_data.set_axis(mark_significant(dimension_data.index, flags))
+    fig_heatmap = px.imshow(metrics_data,
+                            text_auto='.1f',
+                            aspect="auto",
+                            color_continuous_scale="RdYlGn",
+                            title="各校教學力指標熱力圖 (數值越高越綠)")
+
+    fig_dim = None
+    if not dimension_data.empty:
+        fig_dim = px.imshow(dimension_data,
+                            text_auto='.2f',
+                            aspect="auto",
+                            color_continuous_scale="RdYlGn",
+                            title="各校面向與總分熱力圖")
+    return sample_text, fig_heatmap, fig_dim
+
+
+def school_lod(df_school, flags):
+    """
+    大型矩陣模式的校際比較：學校 × 指標 (面向/總分排在指標之後) 的 LodMatrix
+    分群、教育階段與區段的平均以各校有效樣本數加權
+    """
+    weights = df_school.loc[SAMPLE_ROW] if SAMPLE_ROW in df_school.index else None
+    metrics = df_school.drop([SAMPLE_ROW], errors='ignore')
+    is_rollup = metrics.index.str.startswith((DIMENSION_PREFIX, FRAMEWORK_PREFIX))
+    metrics = pd.concat([metrics[~is_rollup], metrics[is_rollup]])
+    values = metrics.T.astype(np.float64)
+    values.columns = mark_significant(metrics.index, flags)
+    with stage('figures.school_lod') as s:
+        s.input(values)
+        return LodMatrix(values, values.index.map(SCHOOL_LEVEL_MAP), weights=weights, unit='校')
+
+
+def teacher_lod(df_teachers):
+    """大型矩陣模式的教師層級矩陣：教師 × 指標 (列名稱為「學校 姓名」)"""
+    indicators = [c for c in df_teachers.columns
+                  if c not in META_COLS and pd.api.types.is_numeric_dtype(df_teachers[c])]
+    schools = df_teachers['School_Name'].astype(str)
+    labels = schools + ' ' + df_teachers['教師姓名'].astype(str)
+    values = pd.DataFrame(df_teachers[indicators].to_numpy(dtype=np.float64),
+                          index=labels.to_numpy(), columns=indicators)
+    with stage('figures.teacher_lod') as s:
+        s.input(values)
+        return LodMatrix(values, schools.map(SCHOOL_LEVEL_MAP).to_numpy(), unit='位')
+
+
+def role_metrics(df_role, flags):
+    """身份比較的指標列 (去除樣本數與面向/框架列，顯著的指標標上 ★)"""
+    metrics = df_role.drop([SAMPLE_ROW], errors='ignore')
+    metrics = metrics[~metrics.index.str.startswith((DIMENSION_PREFIX, FRAMEWORK_PREFIX))]
+    metrics.index = pd.Index(mark_significant(metrics.index, flags), name='指標')
+    return metrics
+
+
+def role_comparison(metrics, selected_roles):
+    """
+    選定身份在差異最大的前 10 個指標上的分組長條圖，以及完整數據表
+    (指標太多時雷達圖會很亂，改用分組長條圖)
+    """
+    # 計算選定角色的差異 (變異數)
+    variance = metrics[selected_roles].var(axis=1)
+    top_diff_metrics = variance.sort_values(ascending=False).head(10).index
+
+    df_plot = metrics.loc[top_diff_metrics, selected_roles].reset_index().melt(id_vars='指標', var_name='身份', value_name='分數')
+    fig_group = px.bar(df_plot, x='指標', y='分數', color='身份', barmode='group',
+                       title="不同身份在關鍵指標上的差異 (差異最大的前10項)", text_auto='.1f')
+    table = metrics[selected_roles].style.highlight_max(axis=1, color='lightgreen')
+    return fig_group, table
+
+
+# ================= 樟湖指標分析 =================
+def zhanghu_overall(df_zh):
+    """樟湖體系：(教師人數, 指標總表, 指標排序長條圖)"""
+    table = df_zh[['平均數', '標準差']].style.background_gradient(cmap='Greens')
+    fig_zh = px.bar(df_zh.sort_values('平均數'), x='平均數', y=df_zh.index, orientation='h',
+                    text_auto='.2f', color='平均數', color_continuous_scale='Teal')
+    fig_zh.update_layout(height=600)
+    return int(df_zh.iloc[0]['有效樣本數']), table, fig_zh
+
+
+# ================= 因素分析 =================
+def factor_systems(optional_data):
+    return list(dict.fromkeys(optional_data['factor_summary']['體系']))
+
+
+def factor_overview(optional_data, system):
+    """某體系的因素：(因素清單, 說明文字, 因素概況表, 負荷量熱力圖)"""
+    df_fs = optional_data['factor_summary']
+    summary = df_fs[df_fs['體系'] == system]
+    factors = list(summary['因素'])
+
+    caption = (f"{len(factors)} 個因素共解釋 {summary['累積解釋比例'].iloc[-1]:.0%} 的指標變異；"
+               "因素名稱請依「代表指標」解讀。")
+    table = summary[['因素', '解釋變異比例', '代表指標', '主要面向']].style.format({'解釋變異比例': '{:.1%}'})
+
+    df_fl = optional_data['factor_loadings']
+    loadings = df_fl[df_fl['體系'] == system].set_index('指標')[factors]
+    fig_load = px.imshow(loadings, text_auto='.2f', aspect="auto", zmin=-1, zmax=1,
+                         color_continuous_scale="RdBu", title="指標在各因素上的負荷量 (|值| 越大關聯越強)")
+    fig_load.update_layout(height=max(400, 28 * len(loadings)))
+    return factors, caption, table, fig_load
+
+
+def factor_group_scores(optional_data, system, factors, group_label):
+    """各學校 / 各身份的平均因素分數熱力圖"""
+    df_scores = optional_data['factor_scores']
+    df_scores = df_scores[df_scores['體系'] == system]
+    group_col = 'School_Name' if group_label == "學校" else 'Role_Tag'
+    group_means = df_scores.groupby(group_col, observed=True)[factors].mean()
+    return px.imshow(group_means, text_auto='.2f', aspect="auto", color_continuous_scale="RdYlGn",
+                     title=f"各{group_label}的平均因素分數 (0 = 全體平均)")
+
+
+# ================= 發展目標文字分析 =================
+def keyword_terms(df_kw):
+    return [c for c in df_kw.columns if c not in ['組別', '分組方式', '教師人數']]
+
+
+def keyword_overall(df_kw):
+    """全聯盟各關鍵詞的提及人數"""
+    term_cols = keyword_terms(df_kw)
+    overall_kw = df_kw[df_kw['分組方式'] == '全聯盟'].iloc[0]
+    df_overall_kw = pd.DataFrame({'關鍵詞': term_cols, '提及人數': overall_kw[term_cols].astype(int).values})
+    return px.bar(df_overall_kw.sort_values('提及人數'), x='提及人數', y='關鍵詞', orientation='h',
+                  text_auto=True, title=f"全聯盟提及人數 (共 {int(overall_kw['教師人數'])} 位教師)",
+                  color='提及人數', color_continuous_scale='Blues')
+
+
+def keyword_groups(df_kw, group_label):
+    """各學校 / 各身份的關鍵詞提及人數熱力圖"""
+    term_cols = keyword_terms(df_kw)
+    group_key = 'School_Name' if group_label == "學校" else 'Role_Tag'
+    df_group_kw = df_kw[df_kw['分組方式'] == group_key].set_index('組別')
+    return px.imshow(df_group_kw[term_cols].astype(int), text_auto=True, aspect="auto",
+                     color_continuous_scale="Blues", title=f"各{group_label}提及人數")
+
+
+def top_terms(df_terms, group_col, choice):
+    return df_terms[df_terms[group_col] == choice][['排名', '詞彙', '平均權重']]
+
+
+# ================= 教師個人百分位 =================
+def percentile_axes(df_pct):
+    return [c.replace('_百分位', '') for c in df_pct.columns if c.endswith('_百分位')]
+
+
+def percentile_chart(df_teacher, axis, teacher):
+    """教師在某比較群組中各指標的百分位 (df_teacher 需已依該群組的百分位排序)"""
+    fig_pct = px.bar(df_teacher, x=f'{axis}_百分位', y='指標', orientation='h',
+                     text_auto='.0f', range_x=[0, 100], color=f'{axis}_百分位',
+                     color_continuous_scale='RdYlGn', range_color=[0, 100],
+                     hover_data=['分數', f'{axis}_名次', f'{axis}_人數'],
+                     title=f"{teacher} 在「{axis}」中的百分位 (越高代表相對表現越好)")
+    fig_pct.update_layout(height=max(400, 28 * len(df_teacher)))
+    return fig_pct
+
+
+def percentile_columns(axes):
+    return ['指標', '分數'] + [c for a in axes for c in (f'{a}_百分位', f'{a}_名次', f'{a}_人數')]
@@ -4,6 +4,9 @@ import seaborn as sns
 import matplotlib.font_manager as fm
 import os
 
+from dimension import rollup
+from instrument import stage, instrumented
+
 # ================= 設定區 =================
 # 輸入檔案 (來自上一步分流的結果)
 FILE_ZHANGHU = 'Analysis_Zhanghu_Teachers.csv'
@@ -54,46 +57,56 @@ def draw_beautiful_heatmap(data_df, index_col, title, output_filename):
     if plot_data.index.duplicated().any():
          plot_data = plot_data.groupby(level=0).mean()
          
-    # 2. 動態計算畫布大小
-    n_rows, n_cols = plot_data.shape
-    # 樟湖的指標較多，我們可以把寬度係數調大一點
-    figsize_w = max(12, 6 + n_cols * 0.8) 
-    figsize_h = max(8, 4 + n_rows * 0.6)
+    with stage('heatmap.render', figure=output_filename) as s:
+        s.input(plot_data)
+        # 2. 動態計算畫布大小
+        n_rows, n_cols = plot_data.shape
+        # 樟湖的指標較多，我們可以把寬度係數調大一點
+        figsize_w = max(12, 6 + n_cols * 0.8) 
+        figsize_h = max(8, 4 + n_rows * 0.6)
     
-    plt.figure(figsize=(figsize_w, figsize_h))
-
-    # 3. 設定配色
-    cmap = sns.diverging_palette(15, 145, as_cmap=True, sep=2, s=85, l=60, center='light')
-
-    # 4. 繪製熱力圖
-    ax = sns.heatmap(plot_data, 
-                     cmap=cmap, 
-                     annot=True,       
-                     fmt='.1f',        
-                     linewidths=1.5,   
-                     linecolor='white',
-                     cbar_kws={'label': '平均分數 (1-5)', 'shrink': 0.8}, 
-                     vmin=1.0, vmax=5.0,
-                     center=3.0        
-                    )
-
-    # 5. 調整標籤與標題 (確保字體大小適中)
-    # X軸標籤旋轉 45 度並靠右對齊
-    plt.xticks(rotation=45, ha='right', fontsize=12, fontweight='medium')
-    plt.yticks(fontsize=12)
+        plt.figure(figsize=(figsize_w, figsize_h))
+
+        # 3. 設定配色
+        cmap = sns.diverging_palette(15, 145, as_cmap=True, sep=2, s=85, l=60, center='light')
+
+        # 4. 繪製熱力圖
+        ax = sns.heatmap(plot_data, 
+                         cmap=cmap, 
+                         annot=True,       
+                         fmt='.1f',        
+                         linewidths=1.5,   
+                         linecolor='white',
+                         cbar_kws={'label': '平均分數 (1-5)', 'shrink': 0.8}, 
+                         vmin=1.0, vmax=5.0,
+                         center=3.0        
+                        )
+
+        # 5. 調整標籤與標題 (確保字體大小適中)
+        # X軸標籤旋轉 45 度並靠右對齊
+        plt.xticks(rotation=45, ha='right', fontsize=12, fontweight='medium')
+        plt.yticks(fontsize=12)
     
-    plt.title(title, fontsize=20, pad=30, fontweight='bold')
-    plt.xlabel('', fontsize=12) 
-    plt.ylabel(index_col, fontsize=14, fontweight='bold')
+        plt.title(title, fontsize=20, pad=30, fontweight='bold')
+        plt.xlabel('', fontsize=12) 
+        plt.ylabel(index_col, fontsize=14, fontweight='bold')
     
-    # 調整佈局
-    plt.tight_layout()
+        # 調整佈局
+        plt.tight_layout()
     
-    # 儲存圖片
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-    print(f"✅ 優化圖表已輸出: {output_filename}")
+        # 儲存圖片
+        plt.savefig(output_filename, dpi=300, bbox_inches='tight')
+        print(f"✅ 優化圖表已輸出: {output_filename}")
     plt.close() 
 
+def dimension_frame(data_df, index_col):
+    """
+    把教師 × 指標的資料彙整成教師 × 面向/框架分數 (保留索引欄位，移除全空的面向)
+    """
+    scores = rollup(data_df).dropna(axis=1, how='all')
+    return pd.concat([data_df[[index_col]], scores], axis=1)
+
+@instrumented('heatmap')
 def main():
     # 設定字體
     set_chinese_font()
@@ -113,6 +126,14 @@ def main():
             title='KIST 標準體系 - 各校教學力平均表現',
             output_filename='Beautiful_Heatmap_KIST.png'
         )
+
+        # 面向/框架層級 (指標彙整後欄位較少，適合快速比較)
+        draw_beautiful_heatmap(
+            data_df=dimension_frame(df_kist, 'School_Name'),
+            index_col='School_Name',
+            title='KIST 標準體系 - 各校教學力面向表現',
+            output_filename='Beautiful_Heatmap_KIST_Dimension.png'
+        )
     except FileNotFoundError:
         print(f"找不到 {FILE_KIST}，請先執行分流腳本。")
 
@@ -130,6 +151,13 @@ def main():
             title='樟湖實驗中學 - 教師教學力指標表現',
             output_filename='Beautiful_Heatmap_Zhanghu.png'
         )
+
+        draw_beautiful_heatmap(
+            data_df=dimension_frame(df_zh, '教師姓名'),
+            index_col='教師姓名',
+            title='樟湖實驗中學 - 教師教學力面向表現',
+            output_filename='Beautiful_Heatmap_Zhanghu_Dimension.png'
+        )
     except FileNotFoundError:
         print(f"找不到 {FILE_ZHANGHU}，請先執行分流腳本。")
 
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import argparse
+import importlib
+import importlib.util
+
+# 這個檔案刻意不在最上方匯入 pandas/matplotlib 等套件：
+# 每個子指令只載入自己需要的腳本，非繪圖的指令不會付出繪圖套件的啟動成本
+
+# ================= 設定區 =================
+# 預設設定檔 (存在時自動讀取；JSON 格式，鍵名同下方 DEFAULT_PATHS)
+CONFIG_FILE = 'idp_config.json'
+
+# 各步驟的預設路徑 (相對於 --workdir)；命令列參數 > 設定檔 > 這裡的預設值
+DEFAULT_PATHS = {
+    'source_folder': '.',
+    'merged_file': '114_IDP_Master_Merged.csv',
+    'quantified_file': '_Teaching_Ability_Quantified.csv',
+    'kist_file': 'Analysis_KIST_Standard.csv',
+    'zhanghu_file': 'Analysis_Zhanghu_Teachers.csv',
+    'report_file': '114_IDP_Demographics_Report_v2.xlsx',
+    # None 代表沿用各腳本設定區的字體路徑 (找不到時會改用系統字體)
+    'font_path': None,
+    # 收件匣模式 (inbox) 的收件匣與版本化總表庫
+    'inbox_folder': 'inbox',
+    'store_folder': 'master_store',
+    # 靜態儀表板 (export) 的輸出資料夾
+    'static_folder': 'dashboard_static',
+}
+# =========================================
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 檔名不是合法模組名稱 (或與標準函式庫同名) 的腳本，改以檔案路徑載入
+SCRIPT_FILES = {
+    'test': 'test.py',
+    'Data Refinement Script': 'Data Refinement Script.py',
+}
+
+# 設定鍵 -> 要覆寫的 (腳本, 設定區變數)
+PATH_TARGETS = {
+    'source_folder': [('datamapping', 'SOURCE_FOLDER')],
+    'merged_file': [('datamapping', 'OUTPUT_FILENAME'), ('TAQ', 'INPUT_FILENAME'),
+                    ('test', 'FILE_PATH'), ('Data Refinement Script', 'INPUT_FILE'), ('inbox', 'PUBLISH_FILE')],
+    'quantified_file': [('TAQ', 'OUTPUT_FILENAME'), ('TA_analyze', 'INPUT_FILENAME'),
+                        ('Zhanghuanalyze', 'FILE_QUANTIFIED')],
+    'kist_file': [('TA_analyze', 'OUTPUT_KIST'), ('KSanalyze', 'FILE_QUANTIFIED'), ('heatmap', 'FILE_KIST'),
+                  ('significance', 'FILE_KIST'), ('factor', 'FILE_KIST'), ('api', 'FILE_KIST')],
+    'zhanghu_file': [('TA_analyze', 'OUTPUT_ZHANGHU'), ('Zhanghuanalyze', 'FILE_ZHANGHU_SPLIT'),
+                     ('heatmap', 'FILE_ZHANGHU'), ('significance', 'FILE_ZHANGHU'),
+                     ('factor', 'FILE_ZHANGHU'), ('api', 'FILE_ZHANGHU')],
+    'report_file': [('Data Refinement Script', 'OUTPUT_STATS_FILE')],
+    'font_path': [('heatmap', 'FONT_PATH'), ('Data Refinement Script', 'FONT_PATH')],
+    'inbox_folder': [('inbox', 'INBOX_FOLDER')],
+    'store_folder': [('inbox', 'STORE_FOLDER')],
+    'static_folder': [('export', 'OUTPUT_FOLDER')],
+}
+
+# 流程輸出檔的設定鍵；來源資料夾預設就是工作資料夾，合併時這些檔案 (即使設定檔改過檔名) 都不可被當成來源讀入
+OUTPUT_KEYS = ['merged_file', 'quantified_file', 'kist_file', 'zhanghu_file', 'report_file']
+
+
+def load_script(name, paths):
+    """載入腳本 (第一次使用時才匯入) 並把路徑設定寫入它的設定區變數"""
+    if name in SCRIPT_FILES:
+        module_name = '_idp_' + name.replace(' ', '_')
+        module = sys.modules.get(module_name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(module_name, os.path.join(PACKAGE_DIR, SCRIPT_FILES[name]))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(name)
+
+    for key, targets in PATH_TARGETS.items():
+        if paths.get(key) is None:
+            continue
+        for script, attr in targets:
+            if script == name:
+                setattr(module, attr, paths[key])
+    return module
+
+
+# ================= 子指令 =================
+def cmd_merge(paths, args):
+    datamapping = load_script('datamapping', paths)
+    datamapping.GENERATED_FILES = datamapping.GENERATED_FILES + [
+        os.path.basename(paths[key]) for key in OUTPUT_KEYS if paths.get(key)]
+    datamapping.main()
+
+
+def cmd_submit(paths, args):
+    inbox = load_script('inbox', paths)
+    for path in args.files:
+        print(f"已放入收件匣: {inbox.submit(path, args.school)}")
+
+
+def cmd_ingest(paths, args):
+    load_script('inbox', paths).run_ingest(args.workers, not args.no_rebuild, args.watch)
+
+
+def cmd_status(paths, args):
+    load_script('inbox', paths).show_status()
+
+
+def cmd_quantify(paths, args):
+    load_script('TAQ', paths).main()
+
+
+def cmd_split(paths, args):
+    ta = load_script('TA_analyze', paths)
+    if args.no_plot:
+        ta.PLOT_HEATMAPS = False
+    ta.main()
+
+
+def cmd_stats(paths, args):
+    if args.system in ('all', 'kist'):
+        load_script('KSanalyze', paths).main()
+    if args.system in ('all', 'zhanghu'):
+        if args.system == 'all':
+            print()
+        load_script('Zhanghuanalyze', paths).main()
+    if not args.no_tests:
+        print()
+        load_script('significance', paths).main()
+
+
+def cmd_factors(paths, args):
+    factor = load_script('factor', paths)
+    if args.n_factors is not None:
+        factor.N_FACTORS = args.n_factors
+    factor.main()
+
+
+def cmd_serve(paths, args):
+    # 先套用總表庫位置，API 才會跟隨正確的版本資料夾
+    load_script('inbox', paths)
+    load_script('api', paths).serve(args.host, args.port, args.folder)
+
+
+def cmd_export(paths, args):
+    # 先套用總表庫位置，匯出的才會是目前的版本
+    load_script('inbox', paths)
+    load_script('export', paths).export(folder=args.folder, force=args.force)
+
+
+def cmd_heatmap(paths, args):
+    load_script('heatmap', paths).main()
+
+
+def cmd_check(paths, args):
+    load_script('test', paths).main()
+
+
+def cmd_report(paths, args):
+    refine = load_script('Data Refinement Script', paths)
+    # 指紋檔跟著報表檔名走
+    refine.FINGERPRINT_FILE = os.path.splitext(refine.OUTPUT_STATS_FILE)[0] + '.fingerprint'
+    if args.no_excel_cache and os.path.exists(refine.FINGERPRINT_FILE):
+        os.remove(refine.FINGERPRINT_FILE)
+
+    from instrument import stage
+    with stage('refine'):
+        plot_data = refine.process_data(plot=not args.no_plot)
+        if not args.no_plot:
+            with stage('refine.heatmap'):
+                refine.draw_heatmap(plot_data)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='idp', description='114 IDP 教學力分析流程 (merge → quantify → split → stats / heatmap / report)')
+    parser.add_argument('--config', default=None,
+                        help=f'JSON 設定檔 (預設讀取 {CONFIG_FILE}，存在時才使用)')
+    parser.add_argument('--workdir', default=None, help='執行前切換到這個資料夾 (相對路徑皆以此為準)')
+    sub = parser.add_subparsers(dest='command', metavar='指令', required=True)
+
+    def add(name, func, help_text, path_args):
+        p = sub.add_parser(name, help=help_text, description=help_text)
+        for key, flag, desc in path_args:
+            p.add_argument(flag, dest=key, default=None, help=desc)
+        p.set_defaults(func=func)
+        return p
+
+    add('merge', cmd_merge, '合併各校原始 CSV (datamapping)', [
+        ('source_folder', '--source', '原始 CSV 所在資料夾'),
+        ('merged_file', '--output', '合併後的總表')])
+    p = add('submit', cmd_submit, '把匯出檔放進收件匣 (可多人同時上傳)', [
+        ('inbox_folder', '--inbox', '收件匣資料夾')])
+    p.add_argument('files', nargs='+', help='CSV / CSV.GZ / XLSX / ZIP 匯出檔')
+    p.add_argument('--school', default=None, help='上傳的學校 (檔名中沒有學校名稱時請指定)')
+    p = add('ingest', cmd_ingest, '平行讀取收件匣並原子地提交新版本總表 (inbox)', [
+        ('inbox_folder', '--inbox', '收件匣資料夾'),
+        ('store_folder', '--store', '版本化總表庫'),
+        ('merged_file', '--output', '同步更新的合併總表')])
+    p.add_argument('--workers', type=int, default=4, help='工作行程數')
+    p.add_argument('--no-rebuild', action='store_true', help='只更新總表，不重新計算分析結果')
+    p.add_argument('--watch', action='store_true', help='持續監看收件匣')
+    add('status', cmd_status, '顯示總表庫目前版本與收件匣狀態 (inbox)', [
+        ('inbox_folder', '--inbox', '收件匣資料夾'),
+        ('store_folder', '--store', '版本化總表庫')])
+    add('quantify', cmd_quantify, '把教學力文字描述轉成 1-5 分 (TAQ)', [
+        ('merged_file', '--input', '合併後的總表'),
+        ('quantified_file', '--output', '量化後的檔案')])
+    p = add('split', cmd_split, '分流為 KIST 標準體系與樟湖體系 (TA_analyze)', [
+        ('quantified_file', '--input', '量化後的檔案'),
+        ('kist_file', '--kist', 'KIST 分流檔'),
+        ('zhanghu_file', '--zhanghu', '樟湖分流檔')])
+    p.add_argument('--no-plot', action='store_true', help='不繪製熱力圖 (不載入繪圖套件)')
+    p = add('stats', cmd_stats, '描述統計、校際與身份比較與顯著性檢定 (KSanalyze / Zhanghuanalyze / significance)', [
+        ('kist_file', '--kist', 'KIST 分流檔'),
+        ('zhanghu_file', '--zhanghu', '樟湖分流檔'),
+        ('quantified_file', '--quantified', '找不到樟湖分流檔時改用的量化檔')])
+    p.add_argument('--system', choices=['all', 'kist', 'zhanghu'], default='all', help='只分析某個體系')
+    p.add_argument('--no-tests', action='store_true', help='不執行組間差異顯著性檢定 (significance)')
+    p = add('factors', cmd_factors, '指標矩陣的因素分析 (缺值 EM)，輸出負荷量與教師因素分數 (factor)', [
+        ('kist_file', '--kist', 'KIST 分流檔'),
+        ('zhanghu_file', '--zhanghu', '樟湖分流檔')])
+    p.add_argument('--n-factors', type=int, default=None, help='因素數 (預設依 Kaiser 準則自動決定)')
+    p = add('serve', cmd_serve, '以本機 JSON API 提供分析結果 (ETag / 條件請求 / gzip) (api)', [
+        ('store_folder', '--store', '版本化總表庫'),
+        ('kist_file', '--kist', 'KIST 分流檔'),
+        ('zhanghu_file', '--zhanghu', '樟湖分流檔')])
+    p.add_argument('--host', default=None, help='監聽位址 (預設只接受本機連線)')
+    p.add_argument('--port', type=int, default=None, help='連接埠')
+    p.add_argument('--folder', default=None, help='固定使用這個資料夾的分析結果 (預設跟隨總表庫目前的版本)')
+    p = add('export', cmd_export, '把儀表板預先產生成靜態網站 (HTML + JSON)，以任何靜態檔案伺服器提供 (export)', [
+        ('static_folder', '--output', '輸出資料夾'),
+        ('store_folder', '--store', '版本化總表庫')])
+    p.add_argument('--folder', default=None, help='分析結果所在的資料夾 (預設與儀表板相同)')
+    p.add_argument('--force', action='store_true', help='結果檔未變更也重新產生')
+    add('heatmap', cmd_heatmap, '繪製各校/各教師熱力圖 (heatmap)', [
+        ('kist_file', '--kist', 'KIST 分流檔'),
+        ('zhanghu_file', '--zhanghu', '樟湖分流檔'),
+        ('font_path', '--font', '中文字體檔')])
+    add('check', cmd_check, "掃描總表中的 '__TEMP__' 佔位符 (test)", [
+        ('merged_file', '--input', '合併後的總表')])
+    p = add('report', cmd_report, '人口統計 Excel 報表與教育階段熱力圖 (Data Refinement Script)', [
+        ('merged_file', '--input', '合併後的總表'),
+        ('report_file', '--output', 'Excel 報表'),
+        ('font_path', '--font', '中文字體檔')])
+    p.add_argument('--no-plot', action='store_true', help='不繪製熱力圖')
+    p.add_argument('--no-excel-cache', action='store_true', help='忽略指紋檔，強制重新輸出 Excel')
+    return parser
+
+
+def resolve_paths(args):
+    """預設值 <- 設定檔 <- 命令列參數"""
+    paths = dict(DEFAULT_PATHS)
+    config_file = args.config or CONFIG_FILE
+    if os.path.exists(config_file):
+        with open(config_file, encoding='utf-8') as f:
+            config = json.load(f)
+        unknown = sorted(set(config) - set(DEFAULT_PATHS))
+        if unknown:
+            raise SystemExit(f"錯誤：設定檔 {config_file} 有無法辨識的設定: {', '.join(unknown)}")
+        paths.update(config)
+    elif args.config:
+        raise SystemExit(f"錯誤：找不到設定檔 '{args.config}'")
+
+    for key in DEFAULT_PATHS:
+        value = getattr(args, key, None)
+        if value is not None:
+            paths[key] = value
+    return paths
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.config:
+        # 設定檔路徑以切換資料夾前的位置為準
+        args.config = os.path.abspath(args.config)
+    if args.workdir:
+        os.chdir(args.workdir)
+    paths = resolve_paths(args)
+    if PACKAGE_DIR not in sys.path:
+        sys.path.insert(0, PACKAGE_DIR)
+    args.func(paths, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import socket
+import threading
+import uuid
+import shutil
+import zipfile
+import tempfile
+import argparse
+import subprocess
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from datamapping import (source_kind, is_junk_member, iter_path_sources, read_source, tag_source,
+                         write_atomic)
+import instrument
+from instrument import stage, instrumented
+from mmapcache import build_folder
+
+# 收件匣模式：各校協調人同時上傳表單匯出檔，由工作行程平行讀取後一次提交到總表庫
+#
+#   inbox/incoming/    上傳的檔案 (submit 先寫成隱藏的 .part 檔，完成後才改名，讀取端不會看到半個檔案)
+#   inbox/processing/  已被某個 ingest 領取 (以 rename 領取，多個 ingest 同時執行也不會重複處理)
+#   inbox/done/        已提交到總表庫
+#   inbox/failed/      讀取失敗 (旁邊附上 .error.txt)
+#
+#   master_store/v000012/     每次提交一個不可變的版本資料夾 (總表 + 重新計算的分析結果)
+#   master_store/CURRENT.json 目前版本的指標；提交時最後才以原子方式換掉
+#
+# 讀取端 (dashboard) 只讀 CURRENT.json 指向的版本資料夾，不需要鎖，也不會被提交擋住
+
+# ================= 設定區 =================
+INBOX_FOLDER = 'inbox'
+STORE_FOLDER = 'master_store'
+
+# 版本資料夾中的總表檔名；另外也會原子地更新這個位置的總表 (供原本的逐步執行流程使用，設為 None 則不更新)
+MASTER_FILENAME = '114_IDP_Master_Merged.csv'
+PUBLISH_FILE = '114_IDP_Master_Merged.csv'
+
+# 平行讀取上傳檔的工作行程數
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# 提交時在版本資料夾內重新計算的腳本 (依序執行；dashboard 讀取的就是這些輸出)
+DERIVED_SCRIPTS = ['TAQ', 'TA_analyze', 'KSanalyze', 'Zhanghuanalyze', 'significance', 'percentile', 'factor']
+
+# 保留的版本數 (目前版本與目前的分析版本一定保留)
+KEEP_SNAPSHOTS = 10
+
+# --watch 模式的輪詢間隔 (秒)
+POLL_SECONDS = 10
+# 等待提交鎖的上限 (秒)；提交鎖在持有的行程結束時由作業系統自動釋放，不會因為提交跑得久而被搶走
+LOCK_TIMEOUT = 600
+# 處理中的 ingest 每隔 CLAIM_HEARTBEAT_SECONDS 更新它領取的檔案的修改時間；
+# 超過 STALE_CLAIM_SECONDS 沒有更新的檔案視為前一次 ingest 中斷，放回 incoming/ 重新處理
+CLAIM_HEARTBEAT_SECONDS = 30
+STALE_CLAIM_SECONDS = 600
+# =========================================
+
+CURRENT_FILE = 'CURRENT.json'
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.commit.lock'
+INBOX_SUBFOLDERS = ['incoming', 'processing', 'done', 'failed']
+# datamapping 由檔名判斷不出學校時的 School_Name
+UNKNOWN_SCHOOL = 'Unknown'
+
+
+# ================= 上傳 =================
+def inbox_path(sub, name=''):
+    return os.path.join(INBOX_FOLDER, sub, name)
+
+
+def ensure_inbox():
+    for sub in INBOX_SUBFOLDERS:
+        os.makedirs(inbox_path(sub), exist_ok=True)
+
+
+def is_supported(name):
+    return not is_junk_member(name) and (source_kind(name) is not None or name.lower().endswith('.zip'))
+
+
+def submit(path, school=None):
+    """
+    把一個匯出檔放進收件匣，回傳收件匣中的檔名
+    檔名前面加上時間與隨機碼，同名檔案同時上傳也不會互相覆蓋
+    school: 上傳的學校 (檔名中沒有學校名稱時指定；指定後這個檔案的資料都歸到該校)
+    """
+    basename = os.path.basename(path)
+    if not is_supported(basename):
+        raise ValueError(f"不支援的檔案格式: {basename}")
+    if school is not None and (not school.strip() or '__' in school or '/' in school or os.sep in school):
+        raise ValueError(f"不合法的學校名稱: {school!r}")
+    ensure_inbox()
+    # 時間記到奈秒，同一秒內的上傳也依上傳順序排序 (同一學校重新上傳時以較晚的為準)
+    ns = time.time_ns()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(ns // 10**9)) + f'.{ns % 10**9:09d}'
+    prefix = f"{stamp}_{uuid.uuid4().hex[:8]}"
+    name = f"{prefix}@{school.strip()}__{basename}" if school else f"{prefix}__{basename}"
+    part = inbox_path('incoming', f'.{name}.part')
+    shutil.copyfile(path, part)
+    os.replace(part, inbox_path('incoming', name))
+    return name
+
+
+def original_name(name):
+    """收件匣檔名 -> 上傳時的原始檔名"""
+    return name.split('__', 1)[1] if '__' in name else name
+
+
+def submitted_school(name):
+    """收件匣檔名 -> 上傳時指定的學校 (沒有指定時為 None)"""
+    prefix = name.split('__', 1)[0] if '__' in name else ''
+    return prefix.split('@', 1)[1] if '@' in prefix else None
+
+
+# ================= 領取與讀取 =================
+def requeue_stale_claims():
+    """把前一次中斷的 ingest 留在 processing/ 的檔案放回 incoming/"""
+    now = time.time()
+    for name in os.listdir(inbox_path('processing')):
+        path = inbox_path('processing', name)
+        if now - os.path.getmtime(path) > STALE_CLAIM_SECONDS:
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(path, inbox_path('incoming', name))
+                print(f"放回收件匣 (前一次處理中斷): {original_name(name)}")
+
+
+@contextlib.contextmanager
+def claim_heartbeat(names):
+    """
+    處理期間在背景定期更新領取的檔案的修改時間，表示這次 ingest 還在進行
+    (讀取或重新計算分析結果再久，也不會被其他 ingest 當成中斷的領取放回收件匣)
+    路徑在開始時就轉成絕對路徑，處理期間目前目錄改變也不影響
+    """
+    stop = threading.Event()
+    paths = [os.path.abspath(inbox_path('processing', name)) for name in names]
+
+    def beat():
+        while not stop.wait(CLAIM_HEARTBEAT_SECONDS):
+            for path in paths:
+                # 檔案已移到 done/ 或 failed/ 時不必再更新
+                with contextlib.suppress(FileNotFoundError):
+                    os.utime(path)
+
+    thread = threading.Thread(target=beat, name='inbox-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def claim_pending():
+    """
+    領取 incoming/ 中所有待處理的檔案 (依上傳時間排序)
+    以 rename 搬到 processing/，搬移失敗代表已被另一個 ingest 領走
+    """
+    claimed = []
+    for name in sorted(os.listdir(inbox_path('incoming'))):
+        if not is_supported(name):
+            continue
+        try:
+            os.replace(inbox_path('incoming', name), inbox_path('processing', name))
+        except FileNotFoundError:
+            continue
+        # 更新修改時間，作為判斷領取是否過期的依據
+        os.utime(inbox_path('processing', name))
+        claimed.append(name)
+    return claimed
+
+
+def parse_submission(path, display_name, school=None):
+    """
+    (在工作行程中執行) 讀取一個上傳檔，回傳已加上 Metadata、清洗過欄名的 DataFrame 清單
+    壓縮檔中任何一個檔案讀取失敗，整個上傳檔都視為失敗 (不會只提交一部分)
+    school: 上傳時指定的學校，取代由檔名判斷的學校
+    """
+    if path.lower().endswith('.zip') and not zipfile.is_zipfile(path):
+        raise ValueError('壓縮檔損毀，無法開啟')
+    frames = []
+    for source_name, archive, opener in iter_path_sources(path, display_name):
+        df, _ = read_source(source_name, opener)
+        tag_source(df, source_name, archive)
+        if school:
+            df['School_Name'] = school
+        frames.append(df)
+    if not frames:
+        raise ValueError('壓縮檔中沒有可讀取的表單')
+    return frames
+
+
+def read_claimed(names, workers=MAX_WORKERS):
+    """以工作行程池平行讀取已領取的檔案，回傳 ({收件匣檔名: DataFrame 清單}, {收件匣檔名: 錯誤訊息})"""
+    results, errors = {}, {}
+    if not names:
+        return results, errors
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(names)))) as pool:
+        futures = {name: pool.submit(parse_submission, inbox_path('processing', name), original_name(name),
+                                     submitted_school(name))
+                   for name in names}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = f'{type(e).__name__}: {e}'
+    return results, errors
+
+
+# ================= 總表庫 =================
+def read_current(store=None):
+    """目前版本的資訊 (CURRENT.json)；總表庫尚未建立時回傳 None"""
+    path = os.path.join(store or STORE_FOLDER, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def snapshot_folder(info, key='snapshot', store=None):
+    """某個版本的資料夾路徑 (key='analysis_snapshot' 為最新一個含分析結果的版本)"""
+    if not info or not info.get(key):
+        return None
+    return os.path.join(store or STORE_FOLDER, info[key])
+
+
+def load_master(store=None):
+    """讀取目前版本的總表 (一致的快照，讀取期間有新的提交也不受影響)"""
+    folder = snapshot_folder(read_current(store), store=store)
+    return None if folder is None else pd.read_csv(os.path.join(folder, MASTER_FILENAME))
+
+
+@contextlib.contextmanager
+def commit_lock():
+    """
+    提交鎖 (只有寫入端使用，讀取端不需要)
+    以 flock 鎖住鎖檔：同時只會有一個行程取得；持有的行程結束 (包括異常結束) 時由作業系統釋放，
+    不必以時間判斷鎖是否過期，也沒有「刪除過期鎖檔再建立」之間被別人搶先的問題
+    鎖檔本身不刪除 (只記錄目前持有者的主機與 pid，方便排查)
+    """
+    path = os.path.join(STORE_FOLDER, LOCK_FILE)
+    deadline = time.time() + LOCK_TIMEOUT
+    with open(path, 'a+', encoding='utf-8') as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() > deadline:
+                    f.seek(0)
+                    raise TimeoutError(f"等待提交鎖逾時 ({LOCK_TIMEOUT} 秒): {path}，持有者: {f.read().strip()}")
+                time.sleep(0.2)
+        try:
+            f.seek(0)
+            f.truncate()
+            f.write(f'{socket.gethostname()} {os.getpid()}\n')
+            f.flush()
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def frame_key(name, df):
+    """
+    一份讀入的表單在總表中的取代範圍：(學校, 上傳時的原始檔名)
+    不同學校上傳同名的檔案 (例如都叫 IDP.csv) 是不同的範圍，不會互相取代；沒有資料列的表單為 None
+    """
+    return (str(df['School_Name'].iloc[0]), original_name(name)) if len(df) else None
+
+
+def base_keys(base):
+    """總表中每一列的取代範圍 (學校, 原始檔名)；壓縮檔內的來源以「壓縮檔名/」之前的部分為檔名"""
+    source = base['Source_File'].astype(str).str.split('/', n=1).str[0]
+    return pd.MultiIndex.from_arrays([base['School_Name'].astype(str), source])
+
+
+def plan_merge(base, submissions):
+    """
+    決定這批上傳檔的哪些表單要併入總表，回傳 (各取代範圍最後上傳的檔名, 被取代的上傳檔, 退回的上傳檔)
+      - 同一學校重新上傳同名檔案時，以最後上傳的為準；較早的上傳檔記錄在「被取代」中 ({檔名: [取代它的檔名]})
+      - 無法判斷學校 (Unknown) 的表單與同批或總表中的同名檔案重疊時，無法確定是不是同一個來源，
+        整個上傳檔退回 ({檔名: 原因})，請以 submit --school 指定學校後重新上傳
+    """
+    keys = {name: {frame_key(name, df) for df in submissions[name]} - {None} for name in sorted(submissions)}
+    existing = set(base_keys(base)) if base is not None and not base.empty else set()
+
+    owners = {}
+    for name, name_keys in keys.items():
+        for key in name_keys:
+            owners.setdefault(key, []).append(name)
+    rejected = {}
+    for (school, filename), names in owners.items():
+        if school != UNKNOWN_SCHOOL or (len(names) == 1 and (school, filename) not in existing):
+            continue
+        where = '同一批的其他上傳檔' if len(names) > 1 else '總表中已有的資料'
+        for name in names:
+            rejected[name] = (f"無法由檔名判斷學校，且與{where}同名 ({filename})，無法確定是否為同一來源；"
+                              f"請以 submit --school 指定學校後重新上傳")
+
+    winners = {}
+    for name, name_keys in keys.items():
+        if name not in rejected:
+            for key in name_keys:
+                winners[key] = name
+    superseded = {}
+    for name, name_keys in keys.items():
+        later = sorted({winners[key] for key in name_keys if name not in rejected and winners[key] != name})
+        if later:
+            superseded[name] = later
+    return winners, superseded, rejected
+
+
+def merge_into_master(base, submissions, winners):
+    """
+    把這批上傳檔併入總表：每個取代範圍 (學校, 原始檔名) 只併入最後上傳的那一份，
+    並移除總表中同一範圍先前上傳的資料 (壓縮檔以「壓縮檔名/」開頭的所有來源一起取代)
+    """
+    frames = [df for name in sorted(submissions) for df in submissions[name]
+              if frame_key(name, df) is not None and winners.get(frame_key(name, df)) == name]
+    if base is not None and not base.empty:
+        frames.insert(0, base[~base_keys(base).isin(list(winners))])
+    if not frames:
+        return base
+    return pd.concat(frames, axis=0, ignore_index=True, sort=False)
+
+
+def rebuild_derived(folder):
+    """
+    在版本資料夾中重新執行下游的分析腳本 (不繪圖)
+    以子行程 (目前目錄為版本資料夾) 執行：不改變 ingest 行程的目前目錄 (領取檔的心跳與相對路徑不受影響)，
+    各腳本設定區變數的修改也不會留在 ingest 行程中
+    """
+    env = dict(os.environ)
+    # 量測紀錄與剖析結果仍寫到 ingest 所在的位置，不寫進版本資料夾
+    env['IDP_LOG_FILE'] = os.path.abspath(instrument.LOG_FILE) if instrument.LOG_FILE else ''
+    env['IDP_PROFILE_FOLDER'] = os.path.abspath(instrument.PROFILE_FOLDER)
+    with stage('inbox.rebuild', folder=os.path.basename(folder)):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), 'rebuild'], cwd=folder, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f'分析腳本以結束代碼 {result.returncode} 中止')
+
+
+def rebuild_here():
+    """(在 rebuild_derived 的子行程中執行) 在目前目錄依序執行 DERIVED_SCRIPTS"""
+    import idp
+
+    paths = dict(idp.DEFAULT_PATHS, source_folder=None)
+    for name in DERIVED_SCRIPTS:
+        with stage(f'inbox.rebuild.{name}'):
+            module = idp.load_script(name, paths)
+            if name == 'TA_analyze':
+                module.PLOT_HEATMAPS = False
+            module.main()
+
+
+def commit(submissions, rebuild=True):
+    """
+    把讀取成功的上傳檔提交成新版本 (持有提交鎖)：
+    1. 在隱藏的暫存資料夾中寫出新總表 (與分析結果)
+    2. 暫存資料夾改名為 vNNNNNN (不可變的版本)
+    3. 原子地換掉 CURRENT.json —— 讀取端在這一刻之前看到舊版本，之後看到新版本
+    回傳 (新版本的 CURRENT 資訊, 被取代的上傳檔, 退回的上傳檔)，見 plan_merge；
+    全部上傳檔都被退回時不建立新版本，CURRENT 資訊為 None
+    """
+    os.makedirs(STORE_FOLDER, exist_ok=True)
+    with commit_lock():
+        info = read_current()
+        version = (info['version'] if info else 0) + 1
+        snapshot = f'v{version:06d}'
+
+        if info:
+            base = pd.read_csv(os.path.join(snapshot_folder(info), MASTER_FILENAME))
+        elif PUBLISH_FILE and os.path.exists(PUBLISH_FILE):
+            # 第一次使用總表庫時，以既有的合併總表作為起點
+            print(f"以既有的總表 {PUBLISH_FILE} 作為第一個版本的基礎")
+            base = pd.read_csv(PUBLISH_FILE)
+        else:
+            base = None
+
+        winners, superseded, rejected = plan_merge(base, submissions)
+        committed = sorted(set(submissions) - set(rejected))
+        if not committed:
+            return None, superseded, rejected
+        with stage('inbox.merge') as s:
+            master = s.output(merge_into_master(base, submissions, winners))
+
+        tmp_folder = tempfile.mkdtemp(dir=STORE_FOLDER, prefix=f'.{snapshot}.')
+        try:
+            os.chmod(tmp_folder, 0o755)
+            with stage('inbox.write') as s:
+                s.input(master)
+                master.to_csv(os.path.join(tmp_folder, MASTER_FILENAME), index=False, encoding='utf-8-sig')
+            derived_error = None
+            if rebuild:
+                try:
+                    rebuild_derived(tmp_folder)
+                except Exception as e:
+                    # 分析腳本失敗不影響總表的提交；dashboard 繼續讀取上一個完整的分析版本
+                    derived_error = f'{type(e).__name__}: {e}'
+                    print(f"警告: 重新計算分析結果失敗 ({derived_error})，本版本只更新總表")
+                else:
+                    # 預先建立記憶體映射快取，dashboard 的各個行程直接映射，不必各自解析 CSV
+                    build_folder(tmp_folder)
+            manifest = {
+                'version': version,
+                'snapshot': snapshot,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'parent': info['snapshot'] if info else None,
+                'submissions': [original_name(name) for name in committed],
+                'superseded': {original_name(name): [original_name(n) for n in later]
+                               for name, later in superseded.items()},
+                'rows': len(master),
+                'columns': len(master.columns),
+                'derived': rebuild and derived_error is None,
+                'derived_error': derived_error,
+            }
+            with open(os.path.join(tmp_folder, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.rename(tmp_folder, os.path.join(STORE_FOLDER, snapshot))
+        except BaseException:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            raise
+
+        current = dict(manifest)
+        # 沒有重新計算分析結果時，dashboard 繼續讀取上一個含分析結果的版本
+        current['analysis_snapshot'] = snapshot if manifest['derived'] else (info or {}).get('analysis_snapshot')
+        write_atomic(os.path.join(STORE_FOLDER, CURRENT_FILE),
+                     lambda path: _dump_json(current, path))
+
+        if PUBLISH_FILE:
+            write_atomic(PUBLISH_FILE, lambda path: shutil.copyfile(
+                os.path.join(STORE_FOLDER, snapshot, MASTER_FILENAME), path))
+
+        prune_snapshots(current)
+    return current, superseded, rejected
+
+
+def _dump_json(obj, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def prune_snapshots(current):
+    """只保留最近 KEEP_SNAPSHOTS 個版本 (目前版本與目前的分析版本除外)"""
+    keep = {current['snapshot'], current.get('analysis_snapshot')}
+    snapshots = sorted(name for name in os.listdir(STORE_FOLDER)
+                       if name.startswith('v') and os.path.isdir(os.path.join(STORE_FOLDER, name)))
+    for name in snapshots[:-KEEP_SNAPSHOTS] if KEEP_SNAPSHOTS > 0 else snapshots:
+        if name not in keep:
+            shutil.rmtree(os.path.join(STORE_FOLDER, name), ignore_errors=True)
+
+
+# ================= 主流程 =================
+def finish(names, folder):
+    for name in names:
+        with contextlib.suppress(FileNotFoundError):
+            os.replace(inbox_path('processing', name), inbox_path(folder, name))
+
+
+def process_claimed(names, workers, rebuild):
+    """讀取已領取的檔案並提交；讀取失敗與退回的移到 failed/，其餘移到 done/"""
+    print(f"領取 {len(names)} 個上傳檔，以 {min(workers, len(names))} 個工作行程讀取...")
+    with stage('inbox.read', files=len(names)) as s:
+        submissions, errors = read_claimed(names, workers)
+        for dfs in submissions.values():
+            for df in dfs:
+                s.output(df)
+        s.note(failed_files=len(errors))
+
+    for name, error in errors.items():
+        print(f"讀取失敗: {original_name(name)}, 原因: {error}")
+        with open(inbox_path('failed', name + '.error.txt'), 'w', encoding='utf-8') as f:
+            f.write(error + '\n')
+    finish(errors, 'failed')
+
+    if submissions:
+        try:
+            current, superseded, rejected = commit(submissions, rebuild=rebuild)
+        except BaseException:
+            # 提交失敗：放回收件匣，下次重新處理
+            finish(submissions, 'incoming')
+            raise
+        for name, reason in rejected.items():
+            print(f"退回: {original_name(name)}, 原因: {reason}")
+            with open(inbox_path('failed', name + '.error.txt'), 'w', encoding='utf-8') as f:
+                f.write(reason + '\n')
+        finish(rejected, 'failed')
+        for name, later in superseded.items():
+            print(f"注意: {original_name(name)} 的資料已被同一批較晚上傳的 "
+                  f"{', '.join(original_name(n) for n in later)} 取代")
+        committed = [name for name in submissions if name not in rejected]
+        finish(committed, 'done')
+        if current:
+            print(f"已提交版本 {current['snapshot']}：{len(committed)} 個上傳檔"
+                  f"{f' (其中 {len(superseded)} 個被同批較晚的上傳取代)' if superseded else ''}，"
+                  f"總表共 {current['rows']} 筆、{current['columns']} 欄")
+
+
+def ingest_once(workers=MAX_WORKERS, rebuild=True):
+    """處理收件匣中目前所有的上傳檔 (一批一次提交)，回傳處理的檔案數"""
+    ensure_inbox()
+    requeue_stale_claims()
+    names = claim_pending()
+    if not names:
+        return 0
+
+    # 領取後到處理完畢之間持續更新領取檔的修改時間 (含等待提交鎖與重新計算分析結果的時間)
+    with claim_heartbeat(names):
+        process_claimed(names, workers, rebuild)
+    return len(names)
+
+
+def show_status():
+    info = read_current()
+    if not info:
+        print(f"總表庫 '{STORE_FOLDER}' 尚未建立任何版本。")
+    else:
+        print(f"目前版本: {info['snapshot']} ({info['created']})，{info['rows']} 筆、{info['columns']} 欄")
+        print(f"分析結果版本: {info.get('analysis_snapshot') or '無'}")
+    if os.path.isdir(inbox_path('incoming')):
+        for sub in INBOX_SUBFOLDERS:
+            count = sum(is_supported(name) for name in os.listdir(inbox_path(sub)))
+            print(f"  {sub:<11} {count} 個檔案")
+
+
+@instrumented('inbox')
+def run_ingest(workers, rebuild, watch):
+    while True:
+        count = ingest_once(workers, rebuild)
+        if not watch:
+            if count == 0:
+                print(f"收件匣 '{inbox_path('incoming')}' 中沒有待處理的檔案。")
+            return
+        time.sleep(POLL_SECONDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='IDP 表單收件匣：同時上傳、平行讀取、原子提交到版本化的總表庫')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('submit', help='把匯出檔放進收件匣')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--school', default=None, help='上傳的學校 (檔名中沒有學校名稱時請指定)')
+    p = sub.add_parser('ingest', help='讀取收件匣中的檔案並提交新版本')
+    p.add_argument('--workers', type=int, default=MAX_WORKERS, help='工作行程數')
+    p.add_argument('--no-rebuild', action='store_true', help='只更新總表，不重新計算分析結果')
+    p.add_argument('--watch', action='store_true', help=f'持續監看收件匣 (每 {POLL_SECONDS} 秒)')
+    sub.add_parser('status', help='顯示目前版本與收件匣狀態')
+    sub.add_parser('rebuild', help='在目前目錄重新計算分析結果 (ingest 提交時以子行程執行)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'submit':
+        for path in args.files:
+            print(f"已放入收件匣: {submit(path, args.school)}")
+    elif args.command == 'ingest':
+        run_ingest(args.workers, not args.no_rebuild, args.watch)
+    elif args.command == 'rebuild':
+        rebuild_here()
+    else:
+        show_status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import cProfile
+import pstats
+import functools
+import tracemalloc
+
+# ================= 設定區 =================
+# 各階段的量測結果 (JSON Lines，每個階段一行)；設為空字串則不記錄
+# 可用環境變數覆寫，不必修改各腳本
+LOG_FILE = os.environ.get('IDP_LOG_FILE', 'pipeline_log.jsonl')
+# 同時把每一行 JSON 印到 stderr (方便排程系統收集)
+LOG_TO_STDERR = os.environ.get('IDP_LOG_STDERR', '0') == '1'
+
+# 以 tracemalloc 量測每個階段的 Python 記憶體峰值 (會讓程式變慢，預設關閉；
+# 關閉時仍會記錄行程的 RSS 高水位)
+TRACE_MEMORY = os.environ.get('IDP_TRACE_MEMORY', '0') == '1'
+
+# 要剖析的階段名稱 (逗號分隔，可用萬用字元，如 "TAQ.quantify" 或 "heatmap.*")
+# 符合的階段會輸出 cProfile (.prof) 與 tracemalloc 快照 (.tracemalloc)
+PROFILE_STAGES = [p for p in os.environ.get('IDP_PROFILE', '').split(',') if p.strip()]
+PROFILE_FOLDER = os.environ.get('IDP_PROFILE_FOLDER', 'profiles')
+# =========================================
+
+# 同一次執行的識別碼 (合併多個腳本的紀錄時用來分組)
+RUN_ID = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+_STACK = []
+
+
+def _rss_peak_mb():
+    """行程的 RSS 高水位 (MB)；不支援的平台回傳 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 計，macOS 以 bytes 計
+    return round(peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, 2)
+
+
+def _shape(obj):
+    """DataFrame / ndarray / 稀疏矩陣 -> (列數, 欄數)；其他物件以 len() 當列數"""
+    shape = getattr(obj, 'shape', None)
+    if shape is not None:
+        return (shape[0], shape[1] if len(shape) > 1 else 1)
+    return (len(obj), None)
+
+
+def _wants_profile(name):
+    return any(fnmatch.fnmatchcase(name, pattern.strip()) for pattern in PROFILE_STAGES)
+
+
+class Stage:
+    """
+    一個被量測的處理階段，以 with 使用：
+
+        with stage('TAQ.quantify') as s:
+            s.input(df)
+            ...
+            s.output(df_teaching)
+
+    結束時記錄 wall/CPU 時間、記憶體、輸入/輸出的列數與欄數、快取命中/未命中，
+    寫成一行 JSON。階段可以巢狀，紀錄中的 parent 為外層階段名稱。
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.rows_in = self.cols_in = None
+        self.rows_out = self.cols_out = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._profiler = None
+        self._started_tracing = False
+        self._saved_peak = 0
+        self._peak_floor = 0
+        self._discarded = False
+
+    # ---------- 量測資料 ----------
+    def input(self, obj):
+        """記錄輸入資料的大小 (可呼叫多次，列數累加、欄數取最大)；原樣回傳 obj"""
+        self.rows_in, self.cols_in = self._accumulate(self.rows_in, self.cols_in, obj)
+        return obj
+
+    def output(self, obj):
+        """記錄輸出資料的大小 (規則同 input)；原樣回傳 obj"""
+        self.rows_out, self.cols_out = self._accumulate(self.rows_out, self.cols_out, obj)
+        return obj
+
+    @staticmethod
+    def _accumulate(rows, cols, obj):
+        r, c = _shape(obj)
+        rows = r if rows is None else rows + r
+        if c is not None:
+            cols = c if cols is None else max(cols, c)
+        return rows, cols
+
+    def hit(self, n=1):
+        self.cache_hits += n
+
+    def miss(self, n=1):
+        self.cache_misses += n
+
+    def cached(self, func, *args, **kwargs):
+        """
+        呼叫有快取的函數 (如 st.cache_data)，並依函數本體是否執行判斷命中與否
+        函數本體需在開頭呼叫 current().miss()
+        """
+        before = self.cache_misses
+        result = func(*args, **kwargs)
+        if self.cache_misses == before:
+            self.hit()
+        return result
+
+    def note(self, **fields):
+        """附加任意欄位到這個階段的紀錄"""
+        self.fields.update(fields)
+
+    def discard(self):
+        """這個階段正常結束時不寫出紀錄 (如儀表板每次重新整理都命中快取的讀取)；發生錯誤時仍會記錄"""
+        self._discarded = True
+
+    # ---------- with 區塊 ----------
+    def __enter__(self):
+        self.parent = _STACK[-1].name if _STACK else None
+        _STACK.append(self)
+
+        profile = _wants_profile(self.name)
+        if (TRACE_MEMORY or profile) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if tracemalloc.is_tracing():
+            # 巢狀階段：先把外層目前為止的峰值存起來，再重設峰值給這個階段用
+            self._saved_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        if profile and not any(s._profiler for s in _STACK[:-1]):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        if self._profiler:
+            self._profiler.disable()
+
+        py_peak = None
+        if tracemalloc.is_tracing():
+            py_peak = max(tracemalloc.get_traced_memory()[1], self._peak_floor)
+            if len(_STACK) > 1:
+                # 外層階段的峰值 = max(進入本階段前的峰值, 本階段峰值)
+                outer = _STACK[-2]
+                outer._peak_floor = max(outer._peak_floor, self._saved_peak, py_peak)
+        profile_files = self._dump_profile() if self._profiler else None
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        _STACK.pop()
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'run_id': RUN_ID,
+            'stage': self.name,
+            'parent': self.parent,
+            'status': 'ok' if exc_type is None else 'error',
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'py_peak_mb': None if py_peak is None else round(py_peak / 2 ** 20, 2),
+            'rss_peak_mb': _rss_peak_mb(),
+            'rows_in': self.rows_in,
+            'cols_in': self.cols_in,
+            'rows_out': self.rows_out,
+            'cols_out': self.cols_out,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+        if exc_type is not None:
+            record['error'] = f'{exc_type.__name__}: {exc}'
+        if profile_files:
+            record['profile_files'] = profile_files
+        record.update(self.fields)
+        if not (self._discarded and exc_type is None):
+            emit(record)
+        return False
+
+    def _dump_profile(self):
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        base = os.path.join(PROFILE_FOLDER, f"{self.name}_{RUN_ID}")
+        self._profiler.dump_stats(base + '.prof')
+        files = [base + '.prof']
+        if tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(base + '.tracemalloc')
+            files.append(base + '.tracemalloc')
+        return files
+
+
+class _NullStage(Stage):
+    """沒有進行中的階段時 current() 回傳的替身，呼叫它的方法不會有任何效果"""
+
+    def __init__(self):
+        super().__init__('')
+
+
+def stage(name, **fields):
+    """建立一個量測階段 (以 with 使用)；fields 會附加到紀錄中"""
+    return Stage(name, **fields)
+
+
+def instrumented(name):
+    """把整個函數 (通常是各腳本的 main) 當成一個階段量測的裝飾器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current():
+    """目前最內層的階段 (沒有時回傳不作用的替身)"""
+    return _STACK[-1] if _STACK else _NullStage()
+
+
+def emit(record):
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    if LOG_FILE:
+        with open(LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    if LOG_TO_STDERR:
+        print(line, file=sys.stderr)
+
+
+def load_log(path=None):
+    path = LOG_FILE if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    """
+    python instrument.py            -> 最近一次執行 (各腳本) 的階段摘要
+    python instrument.py xxx.prof   -> 剖析檔中累計時間最高的 25 個函數
+    """
+    if len(sys.argv) > 1 and sys.argv[1].endswith('.prof'):
+        pstats.Stats(sys.argv[1]).sort_stats('cumulative').print_stats(25)
+        return
+
+    records = load_log(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not records:
+        print(f"找不到任何量測紀錄 ({LOG_FILE})，請先執行流程腳本。")
+        return
+
+    # 每個階段只顯示最新的一筆
+    latest = {}
+    for record in records:
+        latest[record['stage']] = record
+    print(f"{'階段':<28} {'wall(s)':>9} {'cpu(s)':>9} {'記憶體(MB)':>10} {'列數 入→出':>18} {'快取 命中/未命中':>14}  狀態")
+    for name, r in sorted(latest.items(), key=lambda item: item[1]['ts']):
+        rows = f"{r['rows_in'] if r['rows_in'] is not None else '-'}→{r['rows_out'] if r['rows_out'] is not None else '-'}"
+        cache = f"{r['cache_hits']}/{r['cache_misses']}"
+        # 有 tracemalloc 峰值時優先顯示，否則顯示行程 RSS 高水位
+        memory = r['py_peak_mb'] if r['py_peak_mb'] is not None else r['rss_peak_mb']
+        memory = '-' if memory is None else f'{memory:.1f}'
+        indent = '  ' if r['parent'] else ''
+        print(f"{indent + name:<28} {r['wall_s']:>9.3f} {r['cpu_s']:>9.3f} {memory:>10} {rows:>18} {cache:>14}  {r['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# 大型矩陣熱力圖 (數百所學校的校際比較、或教師層級的「教師 × 指標」矩陣)
+#
+#   - 以 WebGL 繪製 (Scattergl 的方形標記)，不會為每一格產生 SVG 元素
+#   - 細節層級 (level of detail)：列先依教育階段排序，同一階段內再以 MiniBatchKMeans 分成相似的列群組
+#     (群組內的列在排序後是連續的一段)。全覽時顯示教育階段或列群組的平均；放大後範圍內的列數
+#     仍超過 MAX_VISIBLE_ROWS 時顯示連續區段的平均，範圍夠小時才顯示個別的列
+#   - 只有目前範圍內要顯示的格子會送到瀏覽器；格子夠少、夠大時才在格子上標示數值
+#
+# 不論有多少學校或教師，每次繪圖的格子數都不超過 MAX_VISIBLE_ROWS × 指標數
+
+# ================= 設定區 =================
+# 一次最多顯示的列數 (範圍內的列更多時改用較粗的層級)
+MAX_VISIBLE_ROWS = 200
+# 全覽時的列群組總數 (依各教育階段的列數比例分配，每個階段至少一群)
+ROW_GROUPS = 24
+# 格子數不超過這個數，且格子高度至少 TEXT_MIN_CELL_PX 像素時，才在格子上顯示數值
+TEXT_MAX_CELLS = 600
+TEXT_MIN_CELL_PX = 16
+# 繪圖區的目標高度與格子高度範圍 (像素)
+PLOT_HEIGHT = 640
+MIN_CELL_PX = 3
+MAX_CELL_PX = 32
+COLOR_SCALE = 'RdYlGn'
+RANDOM_SEED = 42
+# =========================================
+
+# 全覽時可選的摘要層級
+SUMMARIES = ['分群平均', '教育階段平均']
+
+
+def _segment_means(values, weights, starts):
+    """
+    依排序後連續的區段 (starts 為各段起點) 計算忽略缺值的加權平均
+    以 np.add.reduceat 一次算出所有區段的加權總和與有效權重
+    """
+    observed = ~np.isnan(values)
+    w = weights[:, None] * observed
+    total = np.add.reduceat(np.where(observed, values, 0.0) * w, starts, axis=0)
+    count = np.add.reduceat(w, starts, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _cluster_rows(values, k):
+    """把列分成 k 群 (缺值以欄平均補上後分群)，回傳群組編號"""
+    if k <= 1 or len(values) <= k:
+        return np.zeros(len(values), dtype=int) if k <= 1 else np.arange(len(values))
+    from sklearn.cluster import MiniBatchKMeans
+
+    observed = (~np.isnan(values)).sum(axis=0)
+    col_means = np.nansum(values, axis=0) / np.maximum(observed, 1)
+    filled = np.where(np.isnan(values), col_means[None, :], values)
+    model = MiniBatchKMeans(n_clusters=k, random_state=RANDOM_SEED, n_init=3,
+                            batch_size=min(1024, len(values)))
+    return model.fit_predict(filled)
+
+
+class LodMatrix:
+    """
+    有細節層級的大型矩陣：列依教育階段 → 分群排序，兩種摘要 (教育階段平均、分群平均) 預先算好；
+    顯示的每一列都記錄它涵蓋的原始列區段 [start, end)，框選後可放大到該區段
+    """
+
+    def __init__(self, values, levels, weights=None, unit='列', row_groups=ROW_GROUPS):
+        """
+        values: 列 × 指標的 DataFrame (index 為列名稱)
+        levels: 每一列的教育階段；weights: 每一列的權重 (例如學校的樣本數，預設皆為 1)
+        """
+        matrix = values.to_numpy(dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        level_codes, level_names = pd.factorize(pd.Series(levels, index=values.index).fillna('4.其他'), sort=True)
+        # 列平均 (全為缺值的列排在最後)
+        observed = (~np.isnan(matrix)).sum(axis=1)
+        row_mean = np.where(observed > 0, np.nansum(matrix, axis=1) / np.maximum(observed, 1), -np.inf)
+
+        # 各教育階段依列數比例分配群組數，階段內分群
+        group_ids = np.zeros(len(values), dtype=int)
+        next_id = 0
+        for code in range(len(level_names)):
+            members = np.flatnonzero(level_codes == code)
+            k = max(1, min(len(members), round(row_groups * len(members) / max(len(values), 1))))
+            labels = _cluster_rows(matrix[members], k)
+            group_ids[members] = labels + next_id
+            next_id += labels.max() + 1 if len(labels) else 0
+
+        # 排序：教育階段 → 群組 (平均分數高的在前，同分時依群組編號，讓每個群組保持連續) → 列 (平均分數高的在前)
+        group_score = pd.Series(row_mean).groupby(group_ids).mean()
+        order = np.lexsort((-row_mean, group_ids, -group_score.reindex(group_ids).to_numpy(), level_codes))
+
+        self.unit = unit
+        self.columns = list(values.columns)
+        self.values = matrix[order]
+        self.weights = weights[order]
+        level_codes, group_ids = level_codes[order], group_ids[order]
+        finite = self.values[~np.isnan(self.values)]
+        self.value_range = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 1.0)
+        self.n_rows = len(order)
+        self.row_labels = np.asarray(values.index.astype(str))[order]
+
+        # 摘要層級：每一段是排序後連續的原始列 [start, end)，名稱為教育階段 (+ 階段內的群組序號)
+        self.summaries = {}
+        for name, ids in [('分群平均', group_ids), ('教育階段平均', level_codes)]:
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if self.n_rows else np.zeros(0, dtype=int)
+            ends = np.r_[starts[1:], self.n_rows].astype(int)
+            names, counter = [], {}
+            for start in starts:
+                level = str(level_names[level_codes[start]])
+                counter[level] = counter.get(level, 0) + 1
+                names.append(f"{level} 群組{counter[level]}" if name == '分群平均' else level)
+            self.summaries[name] = {
+                'names': np.asarray(names, dtype=object), 'starts': starts, 'ends': ends,
+                'values': _segment_means(self.values, self.weights, starts) if self.n_rows else self.values,
+            }
+
+    def view(self, start=0, end=None, summary='分群平均'):
+        """
+        [start, end) 範圍 (以排序後原始列的位置計) 要顯示的列：
+          - 全覽 (整個矩陣) 時顯示摘要層級 (分群平均或教育階段平均)
+          - 放大後範圍內的列不超過 MAX_VISIBLE_ROWS 時顯示個別資料
+          - 否則把範圍切成不超過 MAX_VISIBLE_ROWS 個連續區段 (區段不跨越分群) 顯示區段平均
+        """
+        end = self.n_rows if end is None else end
+        start, end = max(0, int(start)), min(self.n_rows, int(end))
+        if start == 0 and end == self.n_rows and self.n_rows > MAX_VISIBLE_ROWS:
+            layer = self.summaries[summary]
+            return self._view(summary, start, end, layer['starts'], layer['ends'],
+                              [f"{n} ({e - s} {self.unit})" for n, s, e in zip(layer['names'], layer['starts'], layer['ends'])],
+                              layer['values'])
+        if end - start <= MAX_VISIBLE_ROWS:
+            return self._view('個別資料', start, end, np.arange(start, end), np.arange(start + 1, end + 1),
+                              self.row_labels[start:end], self.values[start:end])
+
+        # 與範圍重疊的分群 (分群依位置排序，以 searchsorted 找出頭尾)，裁切到範圍內後再切成等長的區段
+        groups = self.summaries['分群平均']
+        first = np.searchsorted(groups['ends'], start, side='right')
+        last = np.searchsorted(groups['starts'], end, side='left')
+        group_starts = np.clip(groups['starts'][first:last], start, end)
+        group_ends = np.clip(groups['ends'][first:last], start, end)
+        size = -(-(end - start) // max(MAX_VISIBLE_ROWS - (last - first), 1))
+        starts, labels = [], []
+        for name, group_start, g_start, g_end in zip(groups['names'][first:last], groups['starts'][first:last],
+                                                     group_starts, group_ends):
+            for s in range(g_start, g_end, size):
+                e = min(s + size, g_end)
+                starts.append(s)
+                labels.append(f"{name} 第 {s - group_start + 1}–{e - group_start} {self.unit}")
+        starts = np.asarray(starts, dtype=int)
+        ends = np.r_[starts[1:], end]
+        values = _segment_means(self.values[start:end], self.weights[start:end], starts - start)
+        return self._view('區段平均', start, end, starts, ends, labels, values)
+
+    @staticmethod
+    def _view(level, start, end, starts, ends, labels, values):
+        return {'level': level, 'start': start, 'end': end, 'starts': np.asarray(starts), 'ends': np.asarray(ends),
+                'labels': np.asarray(labels, dtype=object), 'values': values}
+
+    def figure(self, view, title=None):
+        """以 WebGL 繪製範圍內的格子 (缺值的格子不畫)"""
+        values = view['values']
+        k, d = values.shape
+        cell_px = int(np.clip(PLOT_HEIGHT / max(k, 1), MIN_CELL_PX, MAX_CELL_PX))
+        rows, cols = np.nonzero(~np.isnan(values))
+        cell_values = values[rows, cols]
+        show_text = len(cell_values) <= TEXT_MAX_CELLS and cell_px >= TEXT_MIN_CELL_PX
+
+        columns = np.asarray(self.columns, dtype=object)
+        trace = go.Scattergl(
+            x=cols, y=rows, mode='markers+text' if show_text else 'markers',
+            marker=dict(symbol='square', size=cell_px, color=cell_values, colorscale=COLOR_SCALE,
+                        cmin=self.value_range[0], cmax=self.value_range[1], colorbar=dict(title='分數')),
+            text=[f'{v:.1f}' for v in cell_values] if show_text else None,
+            textfont=dict(size=max(9, min(12, cell_px - 6))),
+            customdata=np.column_stack([view['labels'][rows], columns[cols]]),
+            hovertemplate='%{customdata[0]}<br>%{customdata[1]}: %{marker.color:.2f}<extra></extra>',
+        )
+        fig = go.Figure(trace)
+        fig.update_layout(
+            title=title, height=k * cell_px + 220, margin=dict(l=10, r=10, t=160, b=10),
+            dragmode='select', plot_bgcolor='white',
+            xaxis=dict(tickmode='array', tickvals=list(range(d)), ticktext=self.columns, side='top',
+                       tickangle=-45, range=[-0.5, d - 0.5], showgrid=False, zeroline=False),
+            yaxis=dict(tickmode='array', tickvals=list(range(k)), ticktext=list(view['labels']),
+                       range=[k - 0.5, -0.5], showgrid=False, zeroline=False,
+                       showticklabels=k <= MAX_VISIBLE_ROWS // 2),
+        )
+        return fig
+
+    def zoom_range(self, view, rows):
+        """圖上選取的列 (view 中的位置) -> 它們涵蓋的原始列範圍 [start, end)"""
+        rows = [r for r in rows if 0 <= r < len(view['starts'])]
+        if not rows:
+            return view['start'], view['end']
+        return int(view['starts'][min(rows)]), int(view['ends'][max(rows)])
+
@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import glob
+import json
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+
+# 把 CSV 轉成可記憶體映射 (np.load(mmap_mode='r')) 的二進位格式：
+#
+#   .npcache/<檔名>-<大小>-<修改時間>/meta.json   欄名、列數、文字欄的類別清單
+#   .npcache/<檔名>-<大小>-<修改時間>/c0.npy ...  每欄一個檔案；數值欄存原值，文字欄存類別代碼
+#
+# 多個 dashboard 行程映射同一批唯讀檔案時，資料分頁由作業系統共用 (只佔一份記憶體)，
+# 新行程也不必重新解析 CSV。快取資料夾名稱含來源檔的大小與修改時間，
+# CSV 更新後自動改用新的快取，舊快取不會被原地改寫 (正在映射它的行程不受影響)
+
+# ================= 設定區 =================
+# 快取資料夾 (建立在 CSV 所在的資料夾下)
+CACHE_FOLDER = '.npcache'
+# 預先建立快取時處理的檔案 (build_folder / 命令列)
+CACHE_PATTERNS = ['*.csv']
+# =========================================
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def cache_dir(path):
+    """CSV 對應的快取資料夾 (名稱含來源檔的大小與修改時間)"""
+    info = os.stat(path)
+    folder, basename = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, CACHE_FOLDER, f'{basename}-{info.st_size}-{info.st_mtime_ns}')
+
+
+def write_cache(df, folder):
+    """
+    把 DataFrame 逐欄寫成 .npy
+    數值/布林欄直接存；其他欄 (文字) 存成類別代碼 + 類別清單，代碼的整數型別與 pandas 相同，
+    讀回時 Categorical 可以直接使用映射的代碼，不必複製
+    """
+    columns = []
+    for i, (name, col) in enumerate(df.items()):
+        entry = {'name': name, 'file': f'c{i}.npy'}
+        if isinstance(col.dtype, np.dtype) and col.dtype.kind in 'biuf':
+            values = col.to_numpy()
+        else:
+            cat = pd.Categorical(col)
+            values = cat.codes
+            entry['categories'] = [str(c) for c in cat.categories]
+        np.save(os.path.join(folder, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+
+    meta = {'format': FORMAT_VERSION, 'rows': len(df), 'columns': columns}
+    with open(os.path.join(folder, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def load_cache(folder):
+    """以唯讀映射載入快取 (資料欄不複製到行程記憶體)"""
+    with open(os.path.join(folder, META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f"快取格式版本不符: {folder}")
+
+    columns = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(folder, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(entry['categories']),
+                                               validate=False)
+        columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def build_cache(path):
+    """
+    解析 CSV 並建立快取，回傳快取資料夾
+    先寫到隱藏的暫存資料夾再改名；多個行程同時建立同一份快取時，以先完成的為準
+    """
+    folder = cache_dir(path)
+    root = os.path.dirname(folder)
+    os.makedirs(root, exist_ok=True)
+
+    with stage('mmapcache.build', source=os.path.basename(path)) as s:
+        df = s.input(pd.read_csv(path))
+        tmp_folder = tempfile.mkdtemp(dir=root, prefix='.build-')
+        try:
+            os.chmod(tmp_folder, 0o755)
+            write_cache(df, tmp_folder)
+            os.rename(tmp_folder, folder)
+        except OSError:
+            # 另一個行程已經建好 (改名目標已存在)
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            if not os.path.isdir(folder):
+                raise
+
+    # 清除同一個 CSV 較舊的快取 (已映射的行程在 POSIX 上仍可繼續使用；無法刪除時略過)
+    pattern = re.compile(re.escape(os.path.basename(path)) + r'-\d+-\d+$')
+    for name in os.listdir(root):
+        if pattern.match(name) and os.path.join(root, name) != folder:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return folder
+
+
+def read_table(path, index_col=None):
+    """
+    讀取 CSV (取代 pd.read_csv)：有最新的快取時直接映射，否則先建立快取
+    index_col 為欄位位置，與 read_csv 相同；索引會複製成一般的 Index (只適合較小的彙整表)
+    快取資料夾無法寫入時退回直接解析 CSV
+    """
+    try:
+        folder = cache_dir(path)
+        if not os.path.isdir(folder):
+            folder = build_cache(path)
+        df = load_cache(folder)
+    except (OSError, ValueError) as e:
+        print(f"警告: 無法使用 {path} 的映射快取 ({e})，改為直接讀取 CSV", file=sys.stderr)
+        return pd.read_csv(path, index_col=index_col)
+
+    if index_col is not None:
+        name = df.columns[index_col]
+        # 與 read_csv 相同：沒有欄名的索引欄 (Unnamed: 0) 不帶名稱
+        index = pd.Index(np.asarray(df[name]), name=None if str(name).startswith('Unnamed: ') else name)
+        df = df.drop(columns=name)
+        df.index = index
+    return df
+
+
+def build_folder(folder='.'):
+    """預先為資料夾中的 CSV 建立快取 (已是最新的會略過)，回傳新建的數量"""
+    paths = sorted({p for pattern in CACHE_PATTERNS for p in glob.glob(os.path.join(folder, pattern))})
+    built = 0
+    for path in paths:
+        if not os.path.isdir(cache_dir(path)):
+            build_cache(path)
+            built += 1
+    return built
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else '.'
+    print(f"正在為 '{folder}' 中的 CSV 建立記憶體映射快取...")
+    built = build_folder(folder)
+    print(f"完成！新建 {built} 份快取，存放於 {os.path.join(folder, CACHE_FOLDER)}")
+
+
+if __name__ == "__main__":
+    main()
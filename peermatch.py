@@ -0,0 +1,305 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import time
+
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (TA_analyze 分流後的 KIST 量化資料：教師 × 指標)
+FILE_QUANTIFIED = 'Analysis_KIST_Standard.csv'
+
+# 輸出檔名
+OUTPUT_FILE = 'Peer_Mentor_Suggestions.csv'
+
+# 每位教師建議的夥伴人數
+TOP_K = 5
+# 每位教師自動挑選的「待加強指標」數量 (取分數最低的幾項)
+N_WEAK_INDICATORS = 2
+# 是否只在相同教育階段 (School_Level) 內配對
+SAME_LEVEL_ONLY = True
+# 相同進步幅度時，以整體輪廓相似度作為次要排序 (距離 × 此係數會從分數中扣除)
+TIEBREAK_WEIGHT = 0.01
+# 計算相似度時，雙方至少要有幾個共同填答的指標 (指定指標較少時以指定數為準)
+MIN_COMMON_INDICATORS = 3
+# 批次查詢時每次處理的教師數 (控制 n × chunk 暫存矩陣的記憶體用量)
+QUERY_CHUNK = 512
+
+# 學校層級定義 (與 Data Refinement Script 相同)
+SCHOOL_LEVEL_MAP = {
+    '三民國小': '1.國小',
+    '仙草實小': '1.國小',
+    '老梅實小': '1.國小',
+    '拯民國小': '1.國小',
+    '樟湖生態國中小': '2.國中小',
+    '三民國中': '3.國中',
+    '坪林實中': '3.國中',
+    '峨眉國中': '3.國中'
+}
+
+META_COLS = ['School_Name', 'Role_Tag', '教師姓名', '職位', '科目', 'Source_File', 'School_Level']
+# =========================================
+
+
+class PeerIndex:
+    """
+    教師 × 指標分數矩陣的配對索引
+
+    建立時預先計算：填答遮罩、補零後的分數與其平方 (範數)，
+    之後所有查詢都只是 (n × d) @ (d × 查詢數) 的矩陣乘法，並自動忽略缺值。
+    """
+
+    def __init__(self, df, indicator_cols=None):
+        df = df.reset_index(drop=True)
+        if 'School_Level' not in df.columns and 'School_Name' in df.columns:
+            df = df.assign(School_Level=df['School_Name'].map(SCHOOL_LEVEL_MAP).fillna('4.其他'))
+        if indicator_cols is None:
+            indicator_cols = [c for c in df.columns
+                              if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+
+        self.indicators = list(indicator_cols)
+        self.col_index = {c: i for i, c in enumerate(self.indicators)}
+        self.meta = df[[c for c in META_COLS if c in df.columns]]
+
+        X = df[self.indicators].to_numpy(dtype=np.float32)
+        self.mask = (~np.isnan(X)).astype(np.float32)
+        self.values = np.nan_to_num(X, nan=0.0)
+        self.squares = self.values ** 2
+
+        level = self.meta['School_Level'] if 'School_Level' in self.meta else pd.Series(['全部'] * len(df))
+        self.level_codes, self.levels = pd.factorize(level.fillna('4.其他'))
+
+        names = self.meta['教師姓名'] if '教師姓名' in self.meta else pd.Series(dtype=str)
+        # 同名時以第一筆為準；需要精確指定時請直接傳入列號
+        self.name_index = {n: i for i, n in reversed(list(enumerate(names)))}
+
+    def __len__(self):
+        return len(self.values)
+
+    # ---------- 內部工具 ----------
+    def _row(self, teacher):
+        """教師姓名或列號 -> 列號"""
+        if isinstance(teacher, (int, np.integer)):
+            return int(teacher)
+        if teacher not in self.name_index:
+            raise KeyError(f"找不到教師: {teacher}")
+        return self.name_index[teacher]
+
+    def _weights(self, indicators):
+        """指標名稱清單 -> (d,) 的 0/1 權重向量；None 代表全部指標"""
+        if indicators is None:
+            return np.ones(len(self.indicators), dtype=np.float32)
+        w = np.zeros(len(self.indicators), dtype=np.float32)
+        for name in indicators:
+            if name not in self.col_index:
+                raise KeyError(f"找不到指標: {name}")
+            w[self.col_index[name]] = 1.0
+        return w
+
+    def _candidate_mask(self, rows, same_level):
+        """(n × 查詢數) 的可配對遮罩：排除自己，並可限制相同教育階段"""
+        allowed = np.ones((len(self), len(rows)), dtype=bool)
+        allowed[rows, np.arange(len(rows))] = False
+        if same_level:
+            allowed &= self.level_codes[:, None] == self.level_codes[rows][None, :]
+        return allowed
+
+    # ---------- 批次計算 (矩陣乘法) ----------
+    def distances(self, rows, W):
+        """
+        缺值感知的 RMS 距離：只比較雙方都有填答的指標
+        rows: 查詢教師列號 (B,)；W: (B × d) 指標權重
+        回傳 (n × B)，共同指標不足時為 inf
+        """
+        q, mq = self.values[rows], self.mask[rows]
+        Wq = W * mq
+        # Σ m_i m_q (x_i - q)^2 = x_i^2·(m_q) - 2 x_i·q + m_i·q^2
+        sq_dist = self.squares @ Wq.T - 2.0 * (self.values @ (Wq * q).T) + self.mask @ (Wq * q * q).T
+        common = self.mask @ Wq.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist = np.sqrt(np.maximum(sq_dist, 0.0) / common)
+        min_common = np.maximum(np.minimum(Wq.sum(axis=1), MIN_COMMON_INDICATORS), 1)
+        dist[common < min_common[None, :]] = np.inf
+        return dist
+
+    def gains(self, rows, W):
+        """
+        每位候選夥伴在指定指標上比查詢教師高出多少 (平均分差)
+        候選人必須在查詢教師有填答的所有目標指標上都有分數，否則為 -inf
+        回傳 (n × B)
+        """
+        t, mt = self.values[rows], self.mask[rows]
+        Wt = W * mt
+        total = self.values @ Wt.T - self.mask @ (Wt * t).T
+        covered = self.mask @ Wt.T
+        needed = Wt.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain = total / covered
+        gain[(covered < needed[None, :]) | (needed[None, :] == 0)] = -np.inf
+        return gain
+
+    # ---------- 查詢介面 ----------
+    def nearest(self, teacher, k=TOP_K, indicators=None, same_level=False):
+        """找出整體分數輪廓最相似的 k 位教師"""
+        row = self._row(teacher)
+        W = self._weights(indicators)[None, :]
+        dist = self.distances([row], W)[:, 0]
+        dist[~self._candidate_mask([row], same_level)[:, 0]] = np.inf
+        return self._result(-dist, k, {'距離': dist})
+
+    def mentors(self, teacher, indicators, k=TOP_K, same_level=SAME_LEVEL_ONLY):
+        """
+        找出在指定指標上最能帶領此教師的 k 位夥伴
+        例如: index.mentors('王小明', ['善用提問的力量', '引導討論和對話'])
+        """
+        row = self._row(teacher)
+        W = self._weights(indicators)[None, :]
+        scores, gain, dist = self._mentor_scores([row], W, same_level)
+        return self._result(scores[:, 0], k, {'平均差距': gain[:, 0], '距離': dist[:, 0]})
+
+    def complements(self, teacher, k=TOP_K, same_level=SAME_LEVEL_ONLY):
+        """
+        互補配對：雙方各自有對方可學習的強項，取兩邊可學習幅度的較小值排序
+        """
+        row = self._row(teacher)
+        t, mt = self.values[row], self.mask[row]
+        both = self.mask * mt
+        diff = (self.values - t) * both
+        they_teach = np.maximum(diff, 0).sum(axis=1)
+        i_teach = np.maximum(-diff, 0).sum(axis=1)
+        mutual = np.minimum(they_teach, i_teach)
+        mutual[~self._candidate_mask([row], same_level)[:, 0]] = -np.inf
+        return self._result(mutual, k, {'對方可分享': they_teach, '我可分享': i_teach})
+
+    def _mentor_scores(self, rows, W, same_level):
+        gain = self.gains(rows, W)
+        dist = self.distances(rows, np.ones_like(W))
+        # 共同指標不足、無法比較輪廓的夥伴 (距離為 inf) 視為比任何可比較的夥伴都遠，同分時排在最後
+        finite = np.isfinite(dist)
+        worst = np.where(finite, dist, 0.0).max(axis=0, initial=0.0) + 1.0
+        scores = gain - TIEBREAK_WEIGHT * np.where(finite, dist, worst[None, :])
+        scores[~self._candidate_mask(rows, same_level) | (gain <= 0)] = -np.inf
+        return scores, gain, dist
+
+    def _result(self, scores, k, extra):
+        top = _top_k(scores[:, None], k)[:, 0]
+        top = top[np.isfinite(scores[top])]
+        result = self.meta.iloc[top].copy()
+        for name, values in extra.items():
+            result[name] = np.round(values[top], 3)
+        result.insert(0, '排名', np.arange(1, len(top) + 1))
+        return result.reset_index(drop=True)
+
+    def weakest_indicators(self, n=N_WEAK_INDICATORS):
+        """每位教師分數最低的 n 個指標 (忽略缺值)，回傳 (n_teachers × n) 的欄位索引，不足時為 -1"""
+        ranked = np.where(self.mask > 0, self.values, np.inf)
+        idx = np.argsort(ranked, axis=1, kind='stable')[:, :n]
+        idx[~np.isfinite(np.take_along_axis(ranked, idx, axis=1))] = -1
+        return idx
+
+    def batch_mentor_suggestions(self, k=TOP_K, n_weak=N_WEAK_INDICATORS,
+                                 same_level=SAME_LEVEL_ONLY, chunk=QUERY_CHUNK):
+        """
+        為所有教師一次產生「待加強指標 + 建議夥伴」清單
+        以 chunk 為單位批次做矩陣乘法，避免逐一查詢的 Python 迴圈
+        """
+        weak = self.weakest_indicators(n_weak)
+        W_all = np.zeros((len(self), len(self.indicators)), dtype=np.float32)
+        for j in range(weak.shape[1]):
+            valid = weak[:, j] >= 0
+            W_all[np.flatnonzero(valid), weak[valid, j]] = 1.0
+
+        # 每個 chunk 只收集 (教師列號, 排名, 夥伴列號, 差距, 距離) 的陣列，最後一次取出 Metadata 組成表格
+        parts = []
+        for start in range(0, len(self), chunk):
+            rows = np.arange(start, min(start + chunk, len(self)))
+            scores, gain, dist = self._mentor_scores(rows, W_all[rows], same_level)
+            top = _top_k(scores, k)
+            # (k × B) -> 依教師、再依排名攤平；分數為 -inf 的是不符合條件的夥伴
+            cols = np.broadcast_to(np.arange(len(rows)), top.shape)
+            ranks = np.broadcast_to(np.arange(1, top.shape[0] + 1)[:, None], top.shape)
+            keep = np.isfinite(scores[top, cols]).T.ravel()
+            peers, cols = top.T.ravel()[keep], cols.T.ravel()[keep]
+            parts.append((rows[cols], ranks.T.ravel()[keep], peers, gain[peers, cols], dist[peers, cols]))
+        teacher_rows, ranks, peers, gains, dists = (np.concatenate(arrays) for arrays in zip(*parts)) \
+            if parts else (np.empty(0, dtype=np.int64),) * 5
+
+        def meta(column, idx):
+            return self.meta[column].to_numpy()[idx] if column in self.meta else np.full(len(idx), None)
+
+        targets = np.array(['、'.join(self.indicators[j] for j in row if j >= 0) for row in weak], dtype=object)
+        return pd.DataFrame({
+            '教師列號': teacher_rows,
+            '教師姓名': meta('教師姓名', teacher_rows),
+            'School_Name': meta('School_Name', teacher_rows),
+            'School_Level': meta('School_Level', teacher_rows),
+            '待加強指標': targets[teacher_rows],
+            '建議排名': ranks,
+            '夥伴姓名': meta('教師姓名', peers),
+            '夥伴學校': meta('School_Name', peers),
+            '平均差距': np.round(gains.astype(np.float64), 3),
+            '整體距離': np.round(dists.astype(np.float64), 3),
+        })
+
+
+def _top_k(scores, k):
+    """
+    每一欄取分數最高的 k 列 (由高到低)，以 argpartition 避免完整排序
+    scores: (n × B)；回傳 (k × B) 的列號
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k == 0:
+        return np.empty((0, scores.shape[1]), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=0)[:k] if k < n else np.tile(np.arange(n)[:, None], (1, scores.shape[1]))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=0), axis=0, kind='stable')
+    return np.take_along_axis(part, order, axis=0)
+
+
+@instrumented('peermatch')
+def main():
+    # 1. 讀取量化資料
+    if not os.path.exists(FILE_QUANTIFIED):
+        print(f"錯誤：找不到檔案 '{FILE_QUANTIFIED}'，請先執行分流腳本。")
+        return
+
+    print(f"正在讀取 {FILE_QUANTIFIED} ...")
+    df = pd.read_csv(FILE_QUANTIFIED)
+
+    # 2. 建立索引
+    t0 = time.perf_counter()
+    with stage('peermatch.index') as s:
+        index = PeerIndex(s.input(df))
+    print(f"已建立配對索引：{len(index)} 位教師 × {len(index.indicators)} 個指標 "
+          f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+    # 3. 單次查詢：python peermatch.py <教師姓名> [指標一] [指標二] ...
+    if len(sys.argv) > 1:
+        teacher, indicators = sys.argv[1], sys.argv[2:]
+        t0 = time.perf_counter()
+        if indicators:
+            result = index.mentors(teacher, indicators)
+            title = f"{teacher} 在「{'、'.join(indicators)}」的建議夥伴"
+        else:
+            result = index.complements(teacher)
+            title = f"{teacher} 的互補配對夥伴"
+        print(f"\n【{title}】 (查詢耗時 {(time.perf_counter() - t0) * 1000:.2f} ms)")
+        if result.empty:
+            print("找不到符合條件的夥伴 (可能已是該指標的最高分，或同階段沒有其他教師)。")
+        else:
+            print(result.to_string(index=False))
+        return
+
+    # 4. 批次產生全部教師的建議清單
+    print("\n正在為所有教師產生夥伴建議...")
+    t0 = time.perf_counter()
+    with stage('peermatch.batch') as s:
+        suggestions = s.output(index.batch_mentor_suggestions())
+    suggestions.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUTPUT_FILE} ({len(suggestions)} 筆建議，"
+          f"耗時 {(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import pandas as pd
+import numpy as np
+import os
+
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (TA_analyze 分流後的量化資料，依序處理，找不到的會略過)
+INPUT_FILES = {
+    'KIST': 'Analysis_KIST_Standard.csv',
+    '樟湖': 'Analysis_Zhanghu_Teachers.csv'
+}
+
+# 輸出檔名 (長表：教師 × 指標，每一列附上各比較群組的百分位與名次)
+OUTPUT_FILE = 'Teacher_Percentiles.csv'
+
+# 比較群組：顯示名稱 -> 欄位 (None 代表全聯盟)
+PEER_AXES = {
+    '全聯盟': None,
+    '教育階段': 'School_Level',
+    '學校': 'School_Name',
+    '身份': 'Role_Tag'
+}
+
+# 學校層級定義 (與 Data Refinement Script 相同)
+SCHOOL_LEVEL_MAP = {
+    '三民國小': '1.國小',
+    '仙草實小': '1.國小',
+    '老梅實小': '1.國小',
+    '拯民國小': '1.國小',
+    '樟湖生態國中小': '2.國中小',
+    '三民國中': '3.國中',
+    '坪林實中': '3.國中',
+    '峨眉國中': '3.國中'
+}
+
+# 分段產生長表 (iter_long_table) 時每段的教師數
+LONG_TABLE_CHUNK = 2000
+
+META_COLS = ['School_Name', 'Role_Tag', '教師姓名', '職位', '科目', 'Source_File',
+             'School_Level', 'Standardized_Role', '教師信箱', '學校', '提交時間']
+# =========================================
+
+
+class PercentileService:
+    """
+    教師在各比較群組中的百分位與名次查詢
+
+    建立時把每個「群組 × 指標」的有效分數排序後串成一條遞增陣列
+    (以 (群組, 指標) 的區塊編號 × 分數跨距 做位移，區塊之間不會重疊)，
+    之後任意教師在所有指標上的名次都只需要一次 np.searchsorted。
+    """
+
+    def __init__(self, df, indicator_cols=None, axes=None):
+        df = df.reset_index(drop=True)
+        if 'School_Level' not in df.columns and 'School_Name' in df.columns:
+            df = df.assign(School_Level=df['School_Name'].map(SCHOOL_LEVEL_MAP).fillna('4.其他'))
+        if indicator_cols is None:
+            indicator_cols = [c for c in df.columns
+                              if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+        if axes is None:
+            axes = {name: col for name, col in PEER_AXES.items() if col is None or col in df.columns}
+
+        self.indicators = list(indicator_cols)
+        self.meta = df[[c for c in META_COLS if c in df.columns]]
+        self.values = df[self.indicators].to_numpy(dtype=np.float64)
+
+        valid = self.values[~np.isnan(self.values)]
+        self.base = valid.min() if valid.size else 0.0
+        # 分數跨距 (+1 讓相鄰區塊之間留有空隙)
+        self.span = (valid.max() - self.base + 1.0) if valid.size else 1.0
+
+        self.axes = {}
+        for name, col in axes.items():
+            labels = pd.Series(['全聯盟'] * len(df)) if col is None else df[col].fillna('未分類')
+            self.axes[name] = self._build_axis(labels)
+
+    def _build_axis(self, labels):
+        codes, groups = pd.factorize(labels, sort=True)
+        n_groups, d = len(groups), len(self.indicators)
+
+        block = codes[:, None] * d + np.arange(d)[None, :]
+        observed = ~np.isnan(self.values)
+        keys = np.sort((self.values - self.base + block * self.span)[observed])
+
+        counts = np.zeros(n_groups * d, dtype=np.int64)
+        np.add.at(counts, block[observed], 1)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        return {'codes': codes, 'groups': list(groups), 'keys': keys,
+                'counts': counts.reshape(n_groups, d), 'starts': starts.reshape(n_groups, d)}
+
+    def _lookup(self, axis, values, codes):
+        """
+        values: (n × d) 分數；codes: (n,) 群組編號
+        回傳 (百分位, 名次, 群組人數)，皆為 (n × d)，缺值處為 NaN
+        """
+        a = self.axes[axis]
+        d = len(self.indicators)
+        block = codes[:, None] * d + np.arange(d)[None, :]
+        # 超出已知分數範圍的值夾到區塊間的空隙，避免落入相鄰區塊
+        query = np.clip(values - self.base, -0.5, self.span - 0.5) + block * self.span
+
+        flat = query.ravel()
+        lo = np.searchsorted(a['keys'], flat, side='left').reshape(query.shape)
+        hi = np.searchsorted(a['keys'], flat, side='right').reshape(query.shape)
+
+        starts = a['starts'][codes]
+        n = a['counts'][codes].astype(np.float64)
+        below = lo - starts
+        equal = hi - lo
+        above = starts + n - hi
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = (below + 0.5 * equal) / n * 100.0
+        rank = above + 1.0
+        missing = np.isnan(values) | (n == 0)
+        pct[missing] = np.nan
+        rank[missing] = np.nan
+        return pct, rank, np.where(missing, np.nan, n)
+
+    def all_percentiles(self, axis):
+        """所有教師在某比較群組下的百分位矩陣 (教師 × 指標)"""
+        pct, _, _ = self._lookup(axis, self.values, self.axes[axis]['codes'])
+        return pd.DataFrame(pct, columns=self.indicators)
+
+    def teacher_report(self, row):
+        """單一教師 (列號) 在每個指標、每個比較群組下的百分位與名次"""
+        result = pd.DataFrame({'指標': self.indicators, '分數': self.values[row]})
+        for axis, a in self.axes.items():
+            pct, rank, n = self._lookup(axis, self.values[[row]], a['codes'][[row]])
+            result[f'{axis}_百分位'] = np.round(pct[0], 1)
+            result[f'{axis}_名次'] = rank[0]
+            result[f'{axis}_人數'] = n[0]
+        return result
+
+    def score_percentile(self, scores, axis='全聯盟', group='全聯盟'):
+        """
+        任意分數 (例如尚未入庫的新填答) 在指定群組中的百分位
+        scores: {指標: 分數}
+        """
+        a = self.axes[axis]
+        code = a['groups'].index(group)
+        values = np.array([[scores.get(c, np.nan) for c in self.indicators]], dtype=np.float64)
+        pct, _, _ = self._lookup(axis, values, np.array([code]))
+        return pd.Series(pct[0], index=self.indicators).dropna()
+
+    def long_table(self, rows=None):
+        """
+        所有教師 (或 rows 指定的教師列號) × 指標的長表 (只保留有分數的組合)，供報表與儀表板使用
+        """
+        rows = np.arange(len(self.values)) if rows is None else np.asarray(rows)
+        d = len(self.indicators)
+        values = self.values[rows]
+        table = self.meta.iloc[np.repeat(rows, d)].reset_index(drop=True)
+        table['指標'] = np.tile(self.indicators, len(rows))
+        table['分數'] = values.ravel()
+        for axis, a in self.axes.items():
+            pct, rank, count = self._lookup(axis, values, a['codes'][rows])
+            table[f'{axis}_百分位'] = np.round(pct.ravel(), 1)
+            table[f'{axis}_名次'] = rank.ravel()
+            table[f'{axis}_人數'] = count.ravel()
+        return table[~np.isnan(table['分數'])].reset_index(drop=True)
+
+    def iter_long_table(self, chunk=LONG_TABLE_CHUNK):
+        """依教師順序分段產生長表 (每段 chunk 位教師)，串流寫出時不必一次持有整張長表"""
+        for start in range(0, len(self.values), chunk):
+            yield self.long_table(np.arange(start, min(start + chunk, len(self.values))))
+
+
+@instrumented('percentile')
+def main():
+    frames = []
+    for system, filename in INPUT_FILES.items():
+        if not os.path.exists(filename):
+            print(f"找不到 {filename}，略過 {system} 體系。")
+            continue
+
+        print(f"正在讀取 {filename} ...")
+        df = pd.read_csv(filename)
+        service = PercentileService(df)
+        print(f"   {system}: {len(df)} 位教師 × {len(service.indicators)} 個指標，"
+              f"比較群組: {', '.join(service.axes)}")
+
+        with stage('percentile.long_table', system=system) as s:
+            s.input(service.values)
+            table = s.output(service.long_table())
+        table.insert(0, '體系', system)
+        frames.append(table)
+
+    if not frames:
+        print("錯誤：找不到任何可用的數據檔案，請先執行分流腳本。")
+        return
+
+    result = pd.concat(frames, ignore_index=True)
+    result.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print("-" * 30)
+    print(f"百分位計算完成！共 {len(result)} 筆 (教師 × 指標)")
+    print(f"已輸出至: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
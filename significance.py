@@ -0,0 +1,289 @@
+import pandas as pd
+import numpy as np
+import os
+from scipy import sparse, stats
+
+from dimension import rollup, build_weight_matrices, DIMENSION_PREFIX, FRAMEWORK_PREFIX
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (TA_analyze 分流後的量化資料，找不到的體系會略過)
+FILE_KIST = 'Analysis_KIST_Standard.csv'
+FILE_ZHANGHU = 'Analysis_Zhanghu_Teachers.csv'
+
+# 輸出檔名
+OUT_OMNIBUS = 'Significance_Omnibus.csv'    # 每個指標 × 分組方式一列 (ANOVA / Kruskal-Wallis)
+OUT_PAIRWISE = 'Significance_Pairwise.csv'  # 每個指標 × 兩兩組別一列 (效果量 / Dunn 事後檢定)
+
+# 比較的分組方式：顯示名稱 -> 欄位
+GROUP_AXES = {
+    '學校': 'School_Name',
+    '身份': 'Role_Tag',
+    '教育階段': 'School_Level'
+}
+
+# 身份合併 (與 KSanalyze 相同，讓檢定對應到報表上實際比較的組別)
+ROLE_MERGE = {'熟手教師': '熟手/資深教師', '資深教師(3y+)': '熟手/資深教師'}
+
+# 某組在某指標的有效樣本數少於此值時，該組不參與這個指標的檢定
+MIN_GROUP_N = 3
+# 顯著水準 (以校正後的 p 值判斷)
+ALPHA = 0.05
+# 多重比較校正：'fdr_bh' (Benjamini-Hochberg)、'holm' 或 'bonferroni'
+# 校正範圍為同一體系、同一分組方式下的所有指標 (兩兩比較則為所有指標 × 所有組別配對)
+P_ADJUST = 'fdr_bh'
+# 「顯著」標記採用的整體檢定：'kruskal' (等第資料較穩健) 或 'anova'
+FLAG_TEST = 'kruskal'
+
+# 學校層級定義 (與 Data Refinement Script 相同)
+SCHOOL_LEVEL_MAP = {
+    '三民國小': '1.國小',
+    '仙草實小': '1.國小',
+    '老梅實小': '1.國小',
+    '拯民國小': '1.國小',
+    '樟湖生態國中小': '2.國中小',
+    '三民國中': '3.國中',
+    '坪林實中': '3.國中',
+    '峨眉國中': '3.國中'
+}
+
+META_COLS = ['School_Name', 'Role_Tag', '教師姓名', '職位', '科目', 'Source_File', 'School_Level']
+# =========================================
+
+
+def group_indicator(codes, n_groups):
+    """(組別 × 教師) 的稀疏指示矩陣；codes 為 -1 的教師不屬於任何組"""
+    valid = codes >= 0
+    return sparse.csr_matrix((np.ones(valid.sum()), (codes[valid], np.flatnonzero(valid))),
+                             shape=(n_groups, len(codes)))
+
+
+def group_sums(G, values):
+    """各組的 (有效樣本數, 總和, 平方和)，皆為 (組別 × 指標)；缺值不計"""
+    observed = ~np.isnan(values)
+    filled = np.where(observed, values, 0.0)
+    return (np.asarray(G @ observed.astype(np.float64)),
+            np.asarray(G @ filled),
+            np.asarray(G @ (filled * filled)))
+
+
+def column_ranks(values):
+    """
+    每個指標 (欄) 各自排名，忽略缺值、同分取平均名次
+    回傳 (名次矩陣, 每欄的同分校正項 Σ(t³ - t))
+    所有欄一起排序，再以「連續相同值」的區段編號一次算出平均名次，不需要逐欄迴圈
+    """
+    n, d = values.shape
+    order = np.argsort(values, axis=0, kind='stable')   # 缺值排在最後
+    sorted_values = np.take_along_axis(values, order, axis=0)
+
+    new_run = np.ones((n, d), dtype=bool)
+    new_run[1:] = sorted_values[1:] != sorted_values[:-1]   # NaN != NaN，每個缺值自成一段
+    # 依欄展開 (每欄第一列必為新區段，所以區段不會跨欄)
+    run_id = np.cumsum(new_run.T.ravel()) - 1
+    rows = np.tile(np.arange(n, dtype=np.float64), d)
+    lengths = np.bincount(run_id)
+    mean_rank = np.bincount(run_id, weights=rows) / lengths + 1.0
+
+    ranks = np.empty((n, d))
+    np.put_along_axis(ranks, order, mean_rank[run_id].reshape(d, n).T, axis=0)
+    ranks[np.isnan(values)] = np.nan
+
+    valid_run = np.bincount(run_id, weights=~np.isnan(sorted_values.T.ravel())) > 0
+    run_col = (np.bincount(run_id, weights=np.repeat(np.arange(d), n)) / lengths).astype(np.int64)
+    ties = np.bincount(run_col, weights=np.where(valid_run, lengths ** 3 - lengths, 0.0), minlength=d)
+    return ranks, ties
+
+
+def adjust_pvalues(p, method=P_ADJUST):
+    """多重比較校正 (忽略 NaN)，回傳與 p 相同形狀的校正後 p 值"""
+    p = np.asarray(p, dtype=np.float64)
+    flat = p.ravel()
+    valid = np.flatnonzero(~np.isnan(flat))
+    m = len(valid)
+    adjusted = np.full(flat.shape, np.nan)
+    if m == 0:
+        return adjusted.reshape(p.shape)
+
+    order = valid[np.argsort(flat[valid], kind='stable')]
+    ranked = flat[order]
+    if method == 'bonferroni':
+        result = ranked * m
+    elif method == 'holm':
+        result = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    elif method == 'fdr_bh':
+        result = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"未知的校正方法: {method}")
+    adjusted[order] = np.minimum(result, 1.0)
+    return adjusted.reshape(p.shape)
+
+
+def test_groups(values, codes, groups, min_group_n=MIN_GROUP_N):
+    """
+    對所有指標同時做組間差異檢定
+    values: (教師 × 指標)，codes: (教師,) 組別編號 (-1 = 不分組)
+    回傳 (整體檢定 dict，兩兩比較 dict)，每個值都是陣列；沒有足夠資料的格子為 NaN
+    """
+    k = len(groups)
+    values = np.array(values, dtype=np.float64)
+    values[codes < 0] = np.nan
+    G = group_indicator(codes, k)
+
+    # 樣本數不足的 (組別, 指標) 先整格移除，之後的排名與統計量都不含它們
+    counts, _, _ = group_sums(G, values)
+    small = (counts < min_group_n)[np.maximum(codes, 0)]
+    values[small] = np.nan
+    counts, sums, squares = group_sums(G, values)
+
+    present = counts > 0
+    n_groups = present.sum(axis=0)
+    N = counts.sum(axis=0)
+    testable = n_groups >= 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # ---- 單因子變異數分析 ----
+        means = sums / counts
+        grand = sums.sum(axis=0) / N
+        ss_between = np.nansum(counts * (means - grand) ** 2, axis=0)
+        ss_within = np.nansum(squares - sums * means, axis=0)
+        df_between, df_within = n_groups - 1, N - n_groups
+        F = (ss_between / df_between) / (ss_within / df_within)
+        anova_p = stats.f.sf(F, df_between, df_within)
+        eta_sq = ss_between / (ss_between + ss_within)
+
+        # ---- Kruskal-Wallis (含同分校正) ----
+        ranks, ties = column_ranks(values)
+        _, rank_sums, _ = group_sums(G, ranks)
+        H = 12.0 / (N * (N + 1)) * np.nansum(rank_sums ** 2 / counts, axis=0) - 3 * (N + 1)
+        H = H / (1 - ties / (N ** 3 - N))
+        kruskal_p = stats.chi2.sf(H, df_between)
+        # Kruskal-Wallis 的效果量 epsilon²
+        epsilon_sq = H / (N - 1)
+
+    omnibus = {
+        '組數': n_groups, '有效樣本數': N,
+        'F': F, 'ANOVA_p': anova_p, 'eta²': eta_sq,
+        'H': H, 'Kruskal_p': kruskal_p, 'epsilon²': epsilon_sq,
+    }
+    for key in ['F', 'ANOVA_p', 'eta²', 'H', 'Kruskal_p', 'epsilon²']:
+        omnibus[key] = np.where(testable & (df_within > 0), omnibus[key], np.nan)
+
+    # ---- 兩兩比較：所有組別配對 × 所有指標一次算完 ----
+    a, b = np.triu_indices(k, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variances = (squares - sums * means) / (counts - 1)
+        n_a, n_b = counts[a], counts[b]
+        pooled_sd = np.sqrt(((n_a - 1) * variances[a] + (n_b - 1) * variances[b]) / (n_a + n_b - 2))
+        # Hedges' g (小樣本校正的標準化平均差)
+        correction = 1 - 3 / (4 * (n_a + n_b) - 9)
+        hedges_g = (means[a] - means[b]) / pooled_sd * correction
+
+        # Dunn 檢定 (使用 Kruskal-Wallis 的整體排名)
+        mean_ranks = rank_sums / counts
+        scale = N * (N + 1) / 12.0 - ties / (12.0 * (N - 1))
+        dunn_z = (mean_ranks[a] - mean_ranks[b]) / np.sqrt(scale * (1 / n_a + 1 / n_b))
+        dunn_p = 2 * stats.norm.sf(np.abs(dunn_z))
+
+    pair_ok = (n_a > 0) & (n_b > 0) & testable[None, :]
+    pairwise = {
+        'a': a, 'b': b, 'n_a': n_a, 'n_b': n_b,
+        'mean_a': means[a], 'mean_b': means[b],
+        'diff': means[a] - means[b], 'hedges_g': hedges_g,
+        'dunn_z': dunn_z, 'dunn_p': dunn_p, 'ok': pair_ok,
+    }
+    return omnibus, pairwise
+
+
+def analyze_axis(df, group_col, indicator_cols):
+    """單一分組方式下所有指標的檢定結果 (整體檢定表, 兩兩比較表)；p 值尚未校正"""
+    codes, groups = pd.factorize(df[group_col], sort=True)
+    values = df[indicator_cols].to_numpy(dtype=np.float64)
+    omnibus, pairwise = test_groups(values, codes, list(groups))
+
+    omnibus_table = pd.DataFrame({'指標': indicator_cols, **omnibus})
+    omnibus_table[['組數', '有效樣本數']] = omnibus_table[['組數', '有效樣本數']].astype(int)
+
+    d = len(indicator_cols)
+    n_pairs = len(pairwise['a'])
+    ok = pairwise['ok'].ravel()
+    pair_table = pd.DataFrame({
+        '指標': np.tile(indicator_cols, n_pairs),
+        '組別A': np.repeat(np.asarray(groups, dtype=object)[pairwise['a']], d),
+        '組別B': np.repeat(np.asarray(groups, dtype=object)[pairwise['b']], d),
+        'n_A': pairwise['n_a'].ravel(), 'n_B': pairwise['n_b'].ravel(),
+        '平均A': pairwise['mean_a'].ravel(), '平均B': pairwise['mean_b'].ravel(),
+        '差異(A-B)': pairwise['diff'].ravel(), 'Hedges_g': pairwise['hedges_g'].ravel(),
+        'Dunn_z': pairwise['dunn_z'].ravel(), 'Dunn_p': pairwise['dunn_p'].ravel(),
+    })[ok].reset_index(drop=True)
+    pair_table[['n_A', 'n_B']] = pair_table[['n_A', 'n_B']].astype(int)
+    return omnibus_table, pair_table
+
+
+def prepare(df, system=None):
+    """補上教育階段、合併身份，並把 (該體系的) 面向/框架分數一併當作可檢定的指標"""
+    df = df.reset_index(drop=True)
+    if 'School_Name' in df.columns:
+        df['School_Level'] = df['School_Name'].map(SCHOOL_LEVEL_MAP).fillna('4.其他')
+    if 'Role_Tag' in df.columns:
+        df['Role_Tag'] = df['Role_Tag'].replace(ROLE_MERGE)
+
+    indicator_cols = [c for c in df.columns if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+    W_dim, _ = build_weight_matrices(indicator_cols, system=system)
+    scores = rollup(df, indicator_cols, system=system).dropna(axis=1, how='all')
+    scores.columns = [(DIMENSION_PREFIX if c in W_dim.columns else FRAMEWORK_PREFIX) + c for c in scores.columns]
+    return pd.concat([df, scores], axis=1), indicator_cols + list(scores.columns)
+
+
+@instrumented('significance')
+def main():
+    omnibus_frames, pair_frames = [], []
+    for system, filename in [('KIST', FILE_KIST), ('樟湖', FILE_ZHANGHU)]:
+        if not os.path.exists(filename):
+            print(f"找不到 {filename}，略過 {system} 體系。")
+            continue
+
+        print(f"正在讀取 {filename} ...")
+        df, indicator_cols = prepare(pd.read_csv(filename), system)
+        print(f"   {system}: {len(df)} 位教師 × {len(indicator_cols)} 個指標/面向")
+
+        axes = {axis: col for axis, col in GROUP_AXES.items() if col in df.columns and df[col].nunique() >= 2}
+        if not axes:
+            print("   (只有單一組別，沒有可比較的分組)")
+        for axis, col in axes.items():
+            with stage('significance.axis', system=system, axis=axis) as s:
+                s.input(df[indicator_cols])
+                omnibus, pairs = analyze_axis(df, col, indicator_cols)
+
+                # 同一體系、同一分組方式為一個校正家族
+                omnibus['ANOVA_p_校正'] = adjust_pvalues(omnibus['ANOVA_p'])
+                omnibus['Kruskal_p_校正'] = adjust_pvalues(omnibus['Kruskal_p'])
+                flag_col = 'Kruskal_p_校正' if FLAG_TEST == 'kruskal' else 'ANOVA_p_校正'
+                omnibus['顯著'] = omnibus[flag_col] < ALPHA
+                pairs['Dunn_p_校正'] = adjust_pvalues(pairs['Dunn_p'])
+                # 兩兩差異只在整體檢定也顯著的指標上標記
+                significant = set(omnibus.loc[omnibus['顯著'], '指標'])
+                pairs['顯著'] = (pairs['Dunn_p_校正'] < ALPHA) & pairs['指標'].isin(significant)
+
+                for table in (omnibus, pairs):
+                    table.insert(0, '分組方式', axis)
+                    table.insert(0, '體系', system)
+                omnibus_frames.append(s.output(omnibus))
+                pair_frames.append(pairs)
+
+            print(f"   [{axis}] {int(omnibus['顯著'].sum())}/{omnibus['組數'].ge(2).sum()} 個指標組間差異顯著，"
+                  f"{int(pairs['顯著'].sum())} 組兩兩差異顯著")
+
+    if not omnibus_frames:
+        print("錯誤：找不到任何可用的數據檔案，請先執行分流腳本。")
+        return
+
+    pd.concat(omnibus_frames, ignore_index=True).to_csv(OUT_OMNIBUS, index=False, encoding='utf-8-sig')
+    pd.concat(pair_frames, ignore_index=True).to_csv(OUT_PAIRWISE, index=False, encoding='utf-8-sig')
+    print("-" * 30)
+    print(f"顯著性檢定完成！(校正方法: {P_ADJUST}，α = {ALPHA}，每組至少 {MIN_GROUP_N} 人)")
+    print(f"已輸出至: {OUT_OMNIBUS}, {OUT_PAIRWISE}")
+
+
+if __name__ == "__main__":
+    main()
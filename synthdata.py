@@ -0,0 +1,264 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import json
+
+# ================= 設定區 =================
+# 輸出資料夾 (產生的 CSV 可直接當作 datamapping 的 SOURCE_FOLDER)
+OUTPUT_FOLDER = 'synthetic_exports'
+
+# 資料規模
+N_SCHOOLS = 40
+N_TEACHERS = 2000
+# 使用樟湖版表單的學校比例
+ZHANGHU_SHARE = 0.15
+
+# 資料品質
+MISSING_RATE = 0.08   # 題目未作答的比例
+TEMP_RATE = 0.01      # 系統佔位符 __TEMP__ 的比例
+PLAN_TEXT_RATE = 0.6  # 發展計畫文字有填寫的比例
+
+RANDOM_SEED = 114
+# =========================================
+
+# 模擬學校的名稱 (寫在表單的「學校」欄，檔名不含學校關鍵字，datamapping 會改用「學校」欄)；
+# 名稱不可包含 datamapping.KNOWN_SCHOOLS 的完整校名，否則會被併成真實學校。
+# 樟湖體系以 School_Name 含「樟湖」分流，所以樟湖版表單的學校名稱保留這兩個字
+KIST_SCHOOL_NAME = '模擬學校{:04d}'
+ZHANGHU_SCHOOL_NAME = '樟湖模擬分校{:04d}'
+
+# 模擬學校的教育階段：KIST 學校依權重抽出，樟湖體系的學校與真實的樟湖生態國中小相同為國中小。
+# 各分析腳本以校名查 SCHOOL_LEVEL_MAP 決定教育階段，模擬校名不在其中，
+# 所以另外寫出 LEVELS_FILE ({校名: 教育階段})，由使用模擬資料的程式 (如 benchmark) 併入
+KIST_LEVEL_WEIGHTS = [('1.國小', 0.55), ('2.國中小', 0.1), ('3.國中', 0.35)]
+ZHANGHU_LEVEL = '2.國中小'
+LEVELS_FILE = 'school_levels.json'
+
+# KIST 標準版：(檔名角色關鍵字, 權重)；空字串代表檔名沒有角色 -> 一般教師
+KIST_ROLE_FILES = [('', 0.45), ('新進', 0.1), ('熟手', 0.1), ('行政', 0.1), ('領導人', 0.1),
+                   ('(3年以上教師)', 0.1), ('(1~3年教師)', 0.05)]
+ZHANGHU_ROLE_FILES = [('（教師_領導人）', 0.8), ('（行政人員）', 0.2)]
+
+CN_STAGE = {1: '一', 2: '二', 3: '三', 4: '四', 5: '五'}
+
+KIST_FACETS = [
+    ('班級社群和文化', ['給每一個學生機會和期待', '維護公平合理的學習狀態', '建立融合的學習氛圍',
+                  '創造學習的樂趣', '打造安心無畏的空間']),
+    ('重要學習內容', ['校準課程體驗和學習目標', '掌握課程節奏', '力求課程嚴謹', '進行差異化和個人化處遇']),
+    ('學生積極主動性', ['善用提問的力量', '引導討論和對話', '拉伸學生的思考和聲音',
+                  '激發學生對學習的主動性和責任感', '拉高學生對內容的概念化理解']),
+    ('呈現學習進度', ['提供嚴謹的學習任務', '收集學習數據', '做好數據驅動的教學決定',
+                 '給出有目的性的回饋', '設計差異化的課堂']),
+]
+
+ZHANGHU_FACETS = [
+    ('自我與他人的關係', ['以生態哲學建立「人文關懷」的基礎', '以正向溫暖進行溝通', '培養成長心態',
+                   '保持情緒穩定', '包容差異', '主動積極']),
+    ('班級社群和文化', ['給每一個學生機會和期待', '維護公平合理的學習狀態', '建立融合的學習氛圍',
+                  '創造學習的樂趣', '打造安心無畏的空間']),
+    ('重要學習內容', ['校準課程體驗和學習目標', '掌握課程節奏與教學方法', '力求課程嚴謹',
+                 '進行差異化和個人化處遇', '能蒐集學習數據，驅動教學改變', '培養學生主動積極性']),
+    ('知識', ['依照學生程度擬定教學計畫', '學科核心概念與學科地圖的熟捻',
+            '能有計畫的夯實學生基礎知識能力', '培養學生多元觀點']),
+]
+
+LEADERSHIP_5P = ['以終為始 Purpose', '關鍵路徑 Path', '要事第一 Priority', '以身作則 Pinnacle', '發展人才 People']
+ZHANGHU_5P = ['以終為始 Purpose【策略思維】', '關鍵路徑 Path【規劃執行力】', '要事第一 Priority【資源管理】',
+              '發展人才 People【團隊與發展】', '以身作則 Pinnacle【以身作則】']
+CORE_VALUES = ['願意對完整事件脈絡感到好奇', '核對與他人對事件和觀點的理解', '願意主動聆聽了解他人感受與想法',
+               '用雙贏思維創造溝通的共識', '保持空杯心態 學習教育新知識']
+CORE_VALUE_ANSWERS = np.array(['自己已做到', '自己想嘗試', '目前先閱讀'], dtype=object)
+
+PLAN_PHRASES = np.array([
+    '在課堂中設計差異化任務，照顧不同程度的學生', '練習提問技巧，提出不同層次的問題引導學生思考',
+    '建立小組討論的常規，讓學生互相傾聽與回應', '每週收集學習數據並調整下一堂課的教學',
+    '提供有目的性的回饋，協助學生了解下一步', '與學生共同訂定課堂常規，營造安心的學習氛圍',
+    '掌握課程節奏，讓每個環節都對應學習目標', '設計嚴謹的學習任務，培養學生主動學習的責任感',
+], dtype=object)
+
+
+def _stage_answers(style, indicator):
+    """分數 1~5 對應的作答文字 (索引 0 不使用)"""
+    if style == 'level':
+        return np.array([None] + [f"Level {s} - 老師在「{indicator}」的表現達到第 {s} 級描述。" for s in range(1, 6)],
+                        dtype=object)
+    return np.array([None] + [f"階段{CN_STAGE[s]}：老師在「{indicator}」的表現符合階段{CN_STAGE[s]}的描述。"
+                              for s in range(1, 6)], dtype=object)
+
+
+def _scores(rng, n, n_items):
+    """
+    以「教師整體能力 + 題目難度 + 雜訊」產生 1~5 分，讓指標之間有真實的相關性
+    """
+    ability = rng.normal(3.3, 0.6, size=(n, 1))
+    difficulty = rng.normal(0.0, 0.3, size=(1, n_items))
+    noise = rng.normal(0.0, 0.6, size=(n, n_items))
+    return np.clip(np.rint(ability - difficulty + noise), 1, 5).astype(int)
+
+
+def _apply_quality(rng, column):
+    """加入未作答 (NaN) 與 __TEMP__ 佔位符"""
+    u = rng.random(len(column))
+    column = column.copy()
+    column[u < MISSING_RATE] = None
+    column[(u >= MISSING_RATE) & (u < MISSING_RATE + TEMP_RATE)] = '__TEMP__'
+    return column
+
+
+def _plan_text(rng, n):
+    texts = rng.choice(PLAN_PHRASES, size=n)
+    texts[rng.random(n) > PLAN_TEXT_RATE] = None
+    return texts
+
+
+def _meta(rng, n, school_display, start_id):
+    ids = np.arange(start_id, start_id + n)
+    seconds = rng.integers(0, 60 * 60 * 24 * 30, size=n)
+    times = pd.Timestamp('2025-10-01') + pd.to_timedelta(seconds, unit='s')
+    return {
+        '教師姓名': [f'教師{i:06d}' for i in ids],
+        '教師信箱': [f'teacher{i:06d}@example.edu.tw' for i in ids],
+        '學校': [school_display] * n,
+        '職位': [None] * n,
+        '科目': [None] * n,
+        '提交時間': times.strftime('%Y/%m/%d %H:%M:%S'),
+    }
+
+
+def kist_export(rng, n, school_display, role_keyword, start_id):
+    """KIST 標準版表單：[步驟 ①：教學力自評] 1.1 ... 與 階段X：... 的作答格式"""
+    data = _meta(rng, n, school_display, start_id)
+    scores = _scores(rng, n, sum(len(names) for _, names in KIST_FACETS))
+
+    k = 0
+    for f, (facet, names) in enumerate(KIST_FACETS):
+        for i, name in enumerate(names):
+            answers = _stage_answers('stage', name)[scores[:, k]]
+            data[f'[步驟 ①：教學力自評] {f + 1}.{i + 1} {name}'] = _apply_quality(rng, answers)
+            k += 1
+        data[f'[步驟 ①：教學力自評] 面向 {f + 1}：{facet} - 補充說明'] = [None] * n
+
+    for p in range(1, 4):
+        data[f'[步驟 ②：教學力發展計畫] 計畫 {p} - 發展目標'] = _plan_text(rng, n)
+        data[f'[步驟 ②：教學力發展計畫] 計畫 {p} - 現況說明'] = _plan_text(rng, n)
+        data[f'[步驟 ②：教學力發展計畫] 計畫 {p} - 發展方法說明'] = _plan_text(rng, n)
+
+    if role_keyword in ('領導人', '行政'):
+        lead = _scores(rng, n, len(LEADERSHIP_5P))
+        for j, name in enumerate(LEADERSHIP_5P):
+            answers = _stage_answers('stage', name)[lead[:, j]]
+            data[f'[步驟 ③：領導力自評] {j + 1}. {name} '] = _apply_quality(rng, answers)
+        data['[步驟 ④：領導力發展計畫] 領導力 5P - 發展目標'] = _plan_text(rng, n)
+
+    data['[步驟 ③：領導力發展計畫] 核心價值 - 發展目標'] = [None] * n
+    data['[步驟 ③：領導力發展計畫] 職涯路徑 - 發展目標'] = _plan_text(rng, n)
+    return pd.DataFrame(data)
+
+
+def zhanghu_export(rng, n, school_display, start_id):
+    """樟湖版表單：[核心價值]、[教學力] 1.1 ... 與 Level X - ... 的作答格式"""
+    data = _meta(rng, n, school_display, start_id)
+    for name in CORE_VALUES:
+        data[f'[核心價值] {name}'] = _apply_quality(rng, rng.choice(CORE_VALUE_ANSWERS, size=n))
+
+    n_items = sum(len(names) for _, names in ZHANGHU_FACETS)
+    scores = _scores(rng, n, n_items)
+    k = 0
+    for f, (_, names) in enumerate(ZHANGHU_FACETS):
+        for i, name in enumerate(names):
+            answers = _stage_answers('level', name)[scores[:, k]]
+            data[f'[教學力] {f + 1}.{i + 1} {name}'] = _apply_quality(rng, answers)
+            k += 1
+
+    for j, name in enumerate(ZHANGHU_5P):
+        level = rng.integers(1, 4, size=n)
+        answers = np.array([None, '一 - 能以期望目標導引行動規劃的思維。', '二 - 能理解並闡述學校發展方向。',
+                            '三 - 能依循學校發展方向執行工作。'], dtype=object)[level]
+        data[f'[領導力] {name}'] = _apply_quality(rng, answers)
+
+    for label in ['一', '二', '三']:
+        facet = rng.integers(0, len(ZHANGHU_FACETS), size=n)
+        areas = np.array([f'教學力 >> {f + 1}. {ZHANGHU_FACETS[f][0]} >> {f + 1}.1 {ZHANGHU_FACETS[f][1][0]}'
+                          for f in range(len(ZHANGHU_FACETS))], dtype=object)[facet]
+        areas[rng.random(n) > PLAN_TEXT_RATE] = None
+        data[f'[百分百KIST教師的個人發展計畫] 待發展/強化領域{label}'] = areas
+        data[f'[百分百KIST教師的個人發展計畫] 規劃發展方法{label}'] = _plan_text(rng, n)
+    return pd.DataFrame(data)
+
+
+def _split(rng, total, weights):
+    """依權重把 total 隨機拆成多份 (總和等於 total)"""
+    weights = np.asarray(weights, dtype=float)
+    return rng.multinomial(total, weights / weights.sum())
+
+
+def generate(output_folder=OUTPUT_FOLDER, n_schools=N_SCHOOLS, n_teachers=N_TEACHERS, seed=RANDOM_SEED):
+    """
+    產生一組模擬的表單匯出 CSV，回傳產生的檔案清單
+    每所學校都有自己的名稱 (寫在「學校」欄，合併後就是 n_schools 個不同的 School_Name)，
+    檔名只帶角色關鍵字與學校編號；每所學校至少有一位教師 (教師人數不可少於學校數)
+    各校的教育階段寫在 output_folder/LEVELS_FILE
+    """
+    if n_teachers < n_schools:
+        raise ValueError(f"教師人數 ({n_teachers}) 不可少於學校數 ({n_schools})，每所學校至少要有一位教師")
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_folder, exist_ok=True)
+
+    n_zhanghu = int(round(n_schools * ZHANGHU_SHARE)) if n_schools > 1 else 0
+    per_school = 1 + _split(rng, n_teachers - n_schools, rng.uniform(0.5, 1.5, size=n_schools))
+    # 教育階段另用一個亂數產生器抽，不影響其他模擬資料
+    level_names = [name for name, _ in KIST_LEVEL_WEIGHTS]
+    level_weights = np.array([w for _, w in KIST_LEVEL_WEIGHTS])
+    drawn = np.random.default_rng([seed, 1]).choice(level_names, size=n_schools, p=level_weights / level_weights.sum())
+    levels = {}
+
+    files, next_id = [], 0
+    for s in range(n_schools):
+        is_zhanghu = s < n_zhanghu
+        school_display = (ZHANGHU_SCHOOL_NAME if is_zhanghu else KIST_SCHOOL_NAME).format(s)
+        levels[school_display] = ZHANGHU_LEVEL if is_zhanghu else str(drawn[s])
+        role_files = ZHANGHU_ROLE_FILES if is_zhanghu else KIST_ROLE_FILES
+        role_counts = _split(rng, per_school[s], [w for _, w in role_files])
+
+        for (role_keyword, _), n in zip(role_files, role_counts):
+            if n == 0:
+                continue
+            if is_zhanghu:
+                df = zhanghu_export(rng, n, school_display, next_id)
+                filename = f'S{s:04d} 114-1{role_keyword}_2025-11-21.csv'
+            else:
+                df = kist_export(rng, n, school_display, role_keyword, next_id)
+                filename = f'S{s:04d}{role_keyword}_2025-11-21.csv'
+            path = os.path.join(output_folder, filename)
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+            files.append(path)
+            next_id += n
+
+    with open(os.path.join(output_folder, LEVELS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(levels, f, ensure_ascii=False, indent=2)
+    return files
+
+
+def read_levels(folder):
+    """generate 寫出的 {校名: 教育階段}；沒有這個檔案時為空 dict"""
+    path = os.path.join(folder, LEVELS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    # 用法: python synthdata.py [教師人數] [學校數] [輸出資料夾]
+    n_teachers = int(sys.argv[1]) if len(sys.argv) > 1 else N_TEACHERS
+    n_schools = int(sys.argv[2]) if len(sys.argv) > 2 else N_SCHOOLS
+    output_folder = sys.argv[3] if len(sys.argv) > 3 else OUTPUT_FOLDER
+
+    print(f"正在產生模擬資料：{n_schools} 所學校、{n_teachers} 位教師 ...")
+    files = generate(output_folder, n_schools, n_teachers)
+    print(f"-> 已輸出 {len(files)} 個 CSV 檔案至: {output_folder}")
+
+
+if __name__ == "__main__":
+    main()
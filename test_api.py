@@ -0,0 +1,39 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+import api
+
+
+def test_teacher_ids_do_not_depend_on_row_order():
+    meta = pd.DataFrame({'School_Name': ['仙草實小', '三民國小', '仙草實小', '仙草實小'],
+                         '教師姓名': ['王小明', '王小明', '李大華', '王小明']})
+    ids = api.teacher_ids('KIST', meta)
+    # 同校同名的第二位加上序號；不同學校的同名教師不會相同
+    assert ids[3] == ids[0] + '-2'
+    assert len(set(ids)) == 4
+
+    shuffled = api.teacher_ids('KIST', meta.iloc[[2, 1, 0]].reset_index(drop=True))
+    assert shuffled == [ids[2], ids[1], ids[0]]
+
+
+def test_unexpected_error_returns_json_500(monkeypatch):
+    def broken(self):
+        raise ValueError('Out of range float values are not JSON compliant')
+
+    monkeypatch.setattr(api.ApiServer, 'current_dataset', broken)
+    server = api.ApiServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/api', timeout=10)
+    except urllib.error.HTTPError as e:
+        assert e.code == 500
+        assert 'error' in json.loads(e.read())
+    else:
+        raise AssertionError('應回應 500')
+    finally:
+        server.shutdown()
+        server.server_close()
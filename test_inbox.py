@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import subprocess
+
+import pandas as pd
+import pytest
+
+import inbox
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在暫存資料夾中使用獨立的收件匣與總表庫 (不更新合併總表、不重新計算分析結果)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(inbox, 'INBOX_FOLDER', 'inbox')
+    monkeypatch.setattr(inbox, 'STORE_FOLDER', 'store')
+    monkeypatch.setattr(inbox, 'PUBLISH_FILE', None)
+    return tmp_path
+
+
+def write_export(folder, names, filename='IDP.csv'):
+    """寫出一個表單匯出檔 (每位教師一列)，回傳路徑"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, filename)
+    pd.DataFrame({'教師姓名': names, '[步驟 ①：教學力自評] 1.1 給每一個學生機會和期待': '4'}).to_csv(
+        path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def school_counts():
+    return inbox.load_master().groupby('School_Name').size().to_dict()
+
+
+def test_same_name_uploads_from_different_schools_in_one_batch(workdir):
+    inbox.submit(write_export('a', [f'甲{i}' for i in range(19)]), school='仙草實小')
+    inbox.submit(write_export('b', [f'乙{i}' for i in range(7)]), school='三民國小')
+
+    assert inbox.ingest_once(workers=1, rebuild=False) == 2
+    assert school_counts() == {'仙草實小': 19, '三民國小': 7}
+    assert len(os.listdir(inbox.inbox_path('done'))) == 2
+
+
+def test_reupload_replaces_only_the_same_school(workdir):
+    inbox.submit(write_export('a', ['甲1', '甲2']), school='仙草實小')
+    inbox.submit(write_export('b', ['乙1']), school='三民國小')
+    inbox.ingest_once(workers=1, rebuild=False)
+
+    inbox.submit(write_export('c', ['甲3']), school='仙草實小')
+    inbox.ingest_once(workers=1, rebuild=False)
+    assert school_counts() == {'仙草實小': 1, '三民國小': 1}
+
+
+def test_reupload_in_one_batch_is_reported(workdir, capsys):
+    inbox.submit(write_export('a', ['甲1', '甲2']), school='仙草實小')
+    inbox.submit(write_export('b', ['甲3']), school='仙草實小')
+
+    inbox.ingest_once(workers=1, rebuild=False)
+    assert school_counts() == {'仙草實小': 1}
+    assert '取代' in capsys.readouterr().out
+    assert inbox.read_current()['superseded'] == {'IDP.csv': ['IDP.csv']}
+
+
+def test_ambiguous_same_name_uploads_are_rejected(workdir):
+    inbox.submit(write_export('a', ['甲1']))
+    inbox.submit(write_export('b', ['乙1', '乙2']))
+
+    assert inbox.ingest_once(workers=1, rebuild=False) == 2
+    assert inbox.read_current() is None
+    failed = os.listdir(inbox.inbox_path('failed'))
+    assert sum(name.endswith('.error.txt') for name in failed) == 2
+
+
+def test_commit_lock_is_released_when_holder_dies(workdir, monkeypatch):
+    os.makedirs(inbox.STORE_FOLDER)
+    holder = subprocess.Popen([sys.executable, '-c', (
+        "import inbox, time\n"
+        "inbox.STORE_FOLDER = 'store'\n"
+        "with inbox.commit_lock():\n"
+        "    print('locked', flush=True); time.sleep(60)\n")],
+        cwd=workdir, stdout=subprocess.PIPE, text=True,
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(inbox.__file__)))
+    assert holder.stdout.readline().strip() == 'locked'
+
+    monkeypatch.setattr(inbox, 'LOCK_TIMEOUT', 0.5)
+    with pytest.raises(TimeoutError):
+        with inbox.commit_lock():
+            pass
+    holder.kill()
+    holder.wait()
+    with inbox.commit_lock():
+        pass
+
+
+def test_claim_heartbeat_keeps_claims_fresh(workdir, monkeypatch):
+    monkeypatch.setattr(inbox, 'CLAIM_HEARTBEAT_SECONDS', 0.05)
+    inbox.submit(write_export('a', ['甲1']), school='仙草實小')
+    names = inbox.claim_pending()
+    path = inbox.inbox_path('processing', names[0])
+    os.utime(path, (0, 0))
+    with inbox.claim_heartbeat(names):
+        time.sleep(0.3)
+    assert time.time() - os.path.getmtime(path) < 5
+
+
+def test_claim_heartbeat_survives_cwd_change(workdir, monkeypatch):
+    monkeypatch.setattr(inbox, 'CLAIM_HEARTBEAT_SECONDS', 0.05)
+    inbox.submit(write_export('a', ['甲1']), school='仙草實小')
+    names = inbox.claim_pending()
+    path = os.path.abspath(inbox.inbox_path('processing', names[0]))
+    os.utime(path, (0, 0))
+    os.makedirs('elsewhere')
+    with inbox.claim_heartbeat(names):
+        monkeypatch.chdir('elsewhere')
+        time.sleep(0.3)
+    assert time.time() - os.path.getmtime(path) < 5
+
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from peermatch import PeerIndex
+
+
+def test_mentors_rank_non_comparable_peers_last():
+    # t5 在 a、b 需要加強；p1-p3 與 t5 只有 a、b 兩個共同指標 (無法比較輪廓)，
+    # q1-q3 填答完整，在 a、b 的進步幅度與 p1-p3 相同
+    nan = np.nan
+    rows = {'t5': [1, 1, 3, 3, 3]}
+    rows.update({f'p{i}': [3, 3, nan, nan, nan] for i in range(1, 4)})
+    rows.update({f'q{i}': [3, 3, 3, 3, 3 + i / 10] for i in range(1, 4)})
+    df = pd.DataFrame.from_dict(rows, orient='index', columns=list('abcde')).rename_axis('教師姓名').reset_index()
+    df['School_Name'] = '仙草實小'
+
+    result = PeerIndex(df).mentors('t5', ['a', 'b'], k=6)
+    assert list(result['教師姓名']) == ['q1', 'q2', 'q3', 'p1', 'p2', 'p3']
+    assert np.isinf(result['距離'].iloc[3:]).all()
@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import re
+import os
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.cluster import MiniBatchKMeans
+
+from instrument import stage, instrumented
+
+# ================= 設定區 =================
+# 來源檔案 (datamapping 合併後的總表，保留原始文字欄位)
+INPUT_FILENAME = '114_IDP_Master_Merged.csv'
+
+# 輸出檔名
+OUT_TERMS_SCHOOL = 'Text_Top_Terms_School.csv'
+OUT_TERMS_ROLE = 'Text_Top_Terms_Role.csv'
+OUT_KEYWORDS = 'Text_Keyword_Coverage.csv'
+OUT_CLUSTERS = 'Text_Goal_Clusters.csv'
+OUT_CLUSTER_DOCS = 'Text_Goal_Cluster_Members.csv'
+
+# 發展計畫/目標相關的文字欄位關鍵字 (欄位名稱包含任一關鍵字即納入)
+TEXT_KEYWORDS = ['發展目標', '發展方法', '現況說明', '發展項目', '待發展', '規劃發展']
+
+# 中文 n-gram 長度 (字元數)
+NGRAM_RANGE = (2, 4)
+# 詞彙至少出現在幾份文件中才保留
+MIN_DF = 2
+# 出現在超過此比例文件中的詞彙視為常用詞 (如「學生」) 而略過
+MAX_DF = 0.5
+# 每個學校/身份列出的關鍵詞數量
+TOP_N_TERMS = 15
+# 目標分群數 (文件數不足時自動縮小)
+N_CLUSTERS = 8
+
+# 想要追蹤「有多少老師設定此目標」的關鍵詞
+WATCH_TERMS = [
+    '差異化', '提問', '討論', '回饋', '數據', '常規', '主動', '思考',
+    '學習目標', '學習氛圍', '嚴謹', '個人化', '概念', '課程節奏'
+]
+# =========================================
+
+# 連續的中日韓文字片段 (n-gram 只在片段內切，不跨越標點或數字)
+CJK_RUN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+')
+
+
+def cjk_ngrams(text, ngram_range=NGRAM_RANGE):
+    """
+    將文字切成中文字元 n-gram
+    例如: "差異化教學" (2~3) -> 差異, 異化, 化教, 教學, 差異化, 異化教, 化教學
+    """
+    grams = []
+    lo, hi = ngram_range
+    for run in CJK_RUN.findall(text):
+        length = len(run)
+        for n in range(lo, min(hi, length) + 1):
+            grams.extend(run[i:i + n] for i in range(length - n + 1))
+    return grams
+
+
+def find_text_columns(df):
+    """找出所有發展計畫/目標相關的文字欄位"""
+    return [c for c in df.columns if any(k in c for k in TEXT_KEYWORDS)]
+
+
+def build_documents(df, text_cols):
+    """
+    將寬表轉為長表：每一個「教師 × 文字欄位」的非空儲存格即為一份文件
+    """
+    id_cols = [c for c in ['School_Name', 'Role_Tag', '教師姓名'] if c in df.columns]
+    base = df[id_cols].copy()
+    base['Teacher_ID'] = np.arange(len(df))
+
+    docs = base.join(df[text_cols]).melt(
+        id_vars=id_cols + ['Teacher_ID'], value_vars=text_cols,
+        var_name='Field', value_name='Text'
+    )
+    docs = docs.dropna(subset=['Text'])
+    docs['Text'] = docs['Text'].astype(str).str.strip()
+    docs = docs[(docs['Text'] != '') & (~docs['Text'].str.contains('__TEMP__', regex=False))]
+    return docs.reset_index(drop=True)
+
+
+def group_indicator(labels):
+    """
+    建立 (組別 × 文件) 的稀疏指示矩陣，讓分組加總變成一次稀疏矩陣乘法
+    """
+    codes, uniques = pd.factorize(labels, sort=True)
+    valid = codes >= 0
+    n_docs = len(codes)
+    G = sparse.csr_matrix(
+        (np.ones(valid.sum()), (codes[valid], np.arange(n_docs)[valid])),
+        shape=(len(uniques), n_docs)
+    )
+    return G, list(uniques)
+
+
+def top_terms_by_group(X, docs, group_col, vocab, top_n=TOP_N_TERMS):
+    """
+    計算每個組別 TF-IDF 權重最高的詞彙
+    X: (文件 × 詞彙) 的 TF-IDF 稀疏矩陣
+    """
+    G, groups = group_indicator(docs[group_col])
+    n_docs = np.asarray(G.sum(axis=1)).ravel()
+    # 一次算出所有組別的平均 TF-IDF 向量
+    scores = np.asarray((G @ X).todense()) / np.maximum(n_docs, 1)[:, None]
+
+    rows = []
+    k = min(top_n, scores.shape[1])
+    top_idx = np.argsort(-scores, axis=1)[:, :k]
+    for g, name in enumerate(groups):
+        for rank, j in enumerate(top_idx[g], start=1):
+            if scores[g, j] <= 0:
+                break
+            rows.append({group_col: name, '排名': rank, '詞彙': vocab[j],
+                         '平均權重': round(float(scores[g, j]), 4), '文件數': int(n_docs[g])})
+    return pd.DataFrame(rows)
+
+
+def keyword_coverage(docs, group_cols):
+    """
+    計算每個追蹤關鍵詞被多少位老師提及 (依學校與身份分組)
+    """
+    counter = CountVectorizer(analyzer=cjk_ngrams, vocabulary=WATCH_TERMS, binary=True)
+    B = counter.transform(docs['Text'])  # (文件 × 關鍵詞)
+
+    # 文件 -> 教師 的指示矩陣，彙整成 (教師 × 關鍵詞) 的是否提及
+    T, teacher_ids = group_indicator(docs['Teacher_ID'])
+    mentioned = ((T @ B) > 0).astype(np.int64)
+
+    teachers = docs.drop_duplicates('Teacher_ID').set_index('Teacher_ID').loc[teacher_ids]
+    frames = []
+    for col in group_cols:
+        G, groups = group_indicator(teachers[col].to_numpy())
+        counts = np.asarray((G @ mentioned).todense()).astype(int)
+        n_teachers = np.asarray(G.sum(axis=1)).ravel()
+        table = pd.DataFrame(counts, index=groups, columns=WATCH_TERMS)
+        table.insert(0, '教師人數', n_teachers.astype(int))
+        table.insert(0, '分組方式', col)
+        frames.append(table)
+
+    overall = pd.DataFrame([np.asarray(mentioned.sum(axis=0)).ravel()], index=['全聯盟'], columns=WATCH_TERMS)
+    overall.insert(0, '教師人數', len(teacher_ids))
+    overall.insert(0, '分組方式', '全聯盟')
+    frames.insert(0, overall)
+
+    result = pd.concat(frames)
+    result.index.name = '組別'
+    return result
+
+
+def cluster_goals(X, docs, vocab, n_clusters=N_CLUSTERS):
+    """
+    以 MiniBatchKMeans 對 (L2 正規化後的) TF-IDF 向量分群，找出相似的發展目標
+    """
+    k = max(1, min(n_clusters, X.shape[0]))
+    model = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3,
+                            batch_size=max(256, k * 32))
+    labels = model.fit_predict(X)
+
+    centers = model.cluster_centers_
+    top_idx = np.argsort(-centers, axis=1)[:, :8]
+    sizes = np.bincount(labels, minlength=k)
+
+    summary = []
+    for c in range(k):
+        members = docs[labels == c]
+        summary.append({
+            '群組': c,
+            '文件數': int(sizes[c]),
+            '教師人數': int(members['Teacher_ID'].nunique()),
+            '代表詞彙': '、'.join(vocab[j] for j in top_idx[c] if centers[c, j] > 0),
+            '涵蓋學校': '、'.join(sorted(members['School_Name'].dropna().unique())) if 'School_Name' in members else '',
+        })
+    summary = pd.DataFrame(summary).sort_values('文件數', ascending=False)
+
+    member_table = docs.drop(columns=['Text']).copy()
+    member_table['群組'] = labels
+    member_table['文字摘要'] = docs['Text'].str.replace(r'\s+', ' ', regex=True).str[:80]
+    return summary, member_table
+
+
+@instrumented('textanalyze')
+def main():
+    # 1. 讀取合併後的總表
+    if not os.path.exists(INPUT_FILENAME):
+        print(f"錯誤: 找不到檔案 '{INPUT_FILENAME}'，請先執行 datamapping 合併步驟。")
+        return
+
+    print(f"正在讀取 {INPUT_FILENAME} ...")
+    df = pd.read_csv(INPUT_FILENAME)
+
+    # 2. 整理文字欄位
+    text_cols = find_text_columns(df)
+    print(f"偵測到 {len(text_cols)} 個發展計畫/目標文字欄位。")
+    if not text_cols:
+        print("警告：找不到任何文字欄位，請檢查 TEXT_KEYWORDS 設定。")
+        return
+
+    docs = build_documents(df, text_cols)
+    print(f"共整理出 {len(docs)} 份文字 (來自 {docs['Teacher_ID'].nunique()} 位教師)。")
+    if docs.empty:
+        print("警告：所有文字欄位皆為空白。")
+        return
+
+    # 3. 一次建立整個語料的 TF-IDF 稀疏矩陣
+    print("\n[1/4] 建立 TF-IDF 稀疏矩陣 (中文 n-gram)...")
+    # 文件太少時放寬詞頻門檻，避免所有詞彙都被過濾掉
+    small_corpus = len(docs) < 10
+    vectorizer = TfidfVectorizer(analyzer=cjk_ngrams, sublinear_tf=True, dtype=np.float32,
+                                 min_df=1 if small_corpus else MIN_DF,
+                                 max_df=1.0 if small_corpus else MAX_DF)
+    with stage('textanalyze.tfidf') as s:
+        X = s.output(vectorizer.fit_transform(s.input(docs)['Text']))
+    vocab = vectorizer.get_feature_names_out()
+    print(f"   矩陣大小: {X.shape[0]} 份文件 × {X.shape[1]} 個詞彙 (非零元素 {X.nnz})")
+
+    # 4. 各校/各身份關鍵詞
+    print("\n[2/4] 計算各校與各身份的關鍵詞...")
+    top_terms_by_group(X, docs, 'School_Name', vocab).to_csv(OUT_TERMS_SCHOOL, index=False, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_TERMS_SCHOOL}")
+    top_terms_by_group(X, docs, 'Role_Tag', vocab).to_csv(OUT_TERMS_ROLE, index=False, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_TERMS_ROLE}")
+
+    # 5. 追蹤關鍵詞的提及人數
+    print("\n[3/4] 統計追蹤關鍵詞的提及人數...")
+    coverage = keyword_coverage(docs, ['School_Name', 'Role_Tag'])
+    coverage.to_csv(OUT_KEYWORDS, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_KEYWORDS}")
+    print("   全聯盟提及人數:")
+    print(coverage.loc[coverage['分組方式'] == '全聯盟', WATCH_TERMS].T.iloc[:, 0].sort_values(ascending=False).head(5))
+
+    # 6. 相似目標分群
+    print("\n[4/4] 對發展目標進行分群...")
+    with stage('textanalyze.cluster') as s:
+        summary, members = cluster_goals(s.input(X), docs, vocab)
+        s.output(members)
+    summary.to_csv(OUT_CLUSTERS, index=False, encoding='utf-8-sig')
+    members.to_csv(OUT_CLUSTER_DOCS, index=False, encoding='utf-8-sig')
+    print(f"-> 已輸出: {OUT_CLUSTERS}, {OUT_CLUSTER_DOCS}")
+
+    print("\n" + "=" * 30)
+    print("文字分析完成！")
+
+
+if __name__ == "__main__":
+    main()